@@ -0,0 +1,128 @@
+"""Event-driven achievements and daily challenges.
+
+A ``Rule`` is data: a name, a description and conditions on named stats,
+such as ``("score", ">=", 50)`` or ``("power_ups", "==", 0)``.  The games
+tell the engine when a stat changes (``set(score=12)``,
+``increment("purchases")``) instead of re-checking every rule every frame.
+The engine keeps, for each stat, the rules still locked that read it, and
+re-checks only those, only when the value actually changed.  A stat that has
+never been set fails every condition on it.
+
+Unlocks are emitted to the functions passed to ``subscribe()``, which is how
+the game's UI and save layer hear about them.  Rules that are already
+unlocked (from the save file) are restored without an event.
+
+A daily challenge is a rule too, with a reward.  Its target comes from the
+date (``daily_target()``), so everyone playing on a day gets the same one,
+and is stored as a number rather than read back out of the description.
+"""
+import operator
+import random
+from collections import defaultdict
+
+OPS = {">=": operator.ge, ">": operator.gt, "<=": operator.le, "<": operator.lt, "==": operator.eq,
+       "!=": operator.ne}
+_MISSING = object()
+
+
+class Rule:
+    def __init__(self, name, description, conditions, reward=0, kind="achievement"):
+        self.name = name
+        self.description = description
+        self.conditions = [(stat, OPS[op], value) for stat, op, value in conditions]
+        self.depends_on = {stat for stat, _, _ in self.conditions}
+        self.reward = reward
+        self.kind = kind
+
+    def met(self, values):
+        for stat, op, value in self.conditions:
+            if stat not in values or not op(values[stat], value):
+                return False
+        return True
+
+
+def daily_target(day):
+    # The daily challenge's target score on ``day`` (a date)
+    return random.Random(day.toordinal()).randint(10, 50)
+
+
+def daily_challenge(target):
+    # Score ``target`` points in one run without power-ups
+    return Rule("Daily challenge", f"Score {target} points without using power-ups",
+                [("score", ">=", target), ("power_ups", "==", 0)], reward=100, kind="challenge")
+
+
+class AchievementEngine:
+    def __init__(self, rules=()):
+        self.rules = {}
+        self.values = {}  # Current value of each stat
+        self.unlocked = set()
+        self._watching = defaultdict(set)  # Stat name -> names of locked rules that read it
+        self._listeners = []
+
+        # Stats
+        self.changes = 0
+        self.evaluations = 0
+
+        for rule in rules:
+            self.add(rule)
+
+    def add(self, rule):
+        # Start tracking ``rule`` (replacing one of the same name); unlocks it
+        # straight away if the stats already meet it
+        self.remove(rule.name)
+        self.rules[rule.name] = rule
+        for stat in rule.depends_on:
+            self._watching[stat].add(rule.name)
+        self._check([rule.name])
+
+    def remove(self, name):
+        rule = self.rules.pop(name, None)
+        if rule is not None:
+            for stat in rule.depends_on:
+                self._watching[stat].discard(name)
+            self.unlocked.discard(name)
+
+    def subscribe(self, listener):
+        # ``listener(rule)`` is called for every unlock
+        self._listeners.append(listener)
+
+    def restore(self, names):
+        # Mark rules unlocked (from a save) without emitting events
+        for name in names:
+            rule = self.rules.get(name)
+            if rule is not None and name not in self.unlocked:
+                self._unlock(rule)
+
+    def set(self, **stats):
+        # Update stats; re-check the locked rules that read any that changed
+        changed = set()
+        for stat, value in stats.items():
+            if self.values.get(stat, _MISSING) != value:
+                self.values[stat] = value
+                changed.update(self._watching.get(stat, ()))
+                self.changes += 1
+        if changed:
+            self._check(changed)
+
+    def increment(self, stat, amount=1):
+        self.set(**{stat: self.values.get(stat, 0) + amount})
+
+    def _check(self, names):
+        for name in sorted(names):  # Stable unlock order
+            rule = self.rules[name]
+            self.evaluations += 1
+            if name not in self.unlocked and rule.met(self.values):
+                self._unlock(rule)
+                for listener in self._listeners:
+                    listener(rule)
+
+    def _unlock(self, rule):
+        self.unlocked.add(rule.name)
+        for stat in rule.depends_on:
+            self._watching[stat].discard(rule.name)
+
+    def stats(self):
+        return {"rules": len(self.rules), "unlocked": len(self.unlocked), "changes": self.changes,
+                "evaluations": self.evaluations}
+
@@ -0,0 +1,116 @@
+"""Image loading with a prepared-surface disk cache.
+
+The source PNGs are far larger than what is drawn (the bird is 2343x1593 and
+is shown at 40x40), so decoding and scaling them dominates startup, and a
+surface that is never converted pays a pixel-format conversion on every
+blit.  ``AssetManager.image`` decodes and scales a source once, stores the
+raw scaled pixels under a key made from the source hash and target size,
+and returns a surface converted to the display format.  Small sprites can
+then be packed into one atlas with ``pack``.
+
+The display mode must be set before images are loaded, as with
+``Surface.convert``.  With a background_io.BackgroundTasks, cache writes
+after a miss happen in the background.
+"""
+import hashlib
+import os
+import struct
+import time
+
+import pygame
+
+CACHE_DIR = ".asset_cache"
+_HEADER = struct.Struct("<4sIIB")
+_MAGIC = b"FBA1"
+
+
+class AssetManager:
+    def __init__(self, cache_dir=CACHE_DIR, enabled=True, tasks=None):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self.tasks = tasks
+
+        # Stats
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.load_time = 0.0
+
+    def _cache_path(self, data, size, alpha):
+        key = hashlib.sha1(data).hexdigest()[:16]
+        width, height = size if size else ("src", "src")
+        return os.path.join(self.cache_dir, f"{key}_{width}x{height}_{'a' if alpha else 'o'}.raw")
+
+    def _read_cache(self, path):
+        try:
+            with open(path, "rb") as f:
+                magic, width, height, alpha = _HEADER.unpack(f.read(_HEADER.size))
+                pixels = f.read()
+        except (OSError, struct.error):
+            return None
+        if magic != _MAGIC or len(pixels) != width * height * (4 if alpha else 3):
+            return None
+        return pygame.image.frombytes(pixels, (width, height), "RGBA" if alpha else "RGB")
+
+    def _write_cache(self, path, surface, alpha):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        width, height = surface.get_size()
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, width, height, alpha))
+            f.write(pygame.image.tobytes(surface, "RGBA" if alpha else "RGB"))
+        os.replace(tmp_path, path)
+
+    def image(self, filename, size=None, alpha=None):
+        # Load ``filename`` scaled to ``size``, converted for fast blitting.
+        # ``alpha`` defaults to whether the source has per-pixel alpha.
+        start = time.perf_counter()
+        with open(filename, "rb") as f:
+            data = f.read()
+
+        surface = None
+        if self.enabled:
+            # The alpha flag is part of the key; try both if it is unknown.
+            for guess in ((True, False) if alpha is None else (alpha,)):
+                surface = self._read_cache(self._cache_path(data, size, guess))
+                if surface is not None:
+                    alpha = guess
+                    break
+
+        if surface is None:
+            self.cache_misses += 1
+            surface = pygame.image.load(filename)
+            if alpha is None:
+                alpha = bool(surface.get_flags() & pygame.SRCALPHA)
+            if size:
+                surface = pygame.transform.scale(surface, size)
+            if self.enabled and self.tasks is not None:
+                self.tasks.submit(self._write_cache, self._cache_path(data, size, alpha), surface, alpha)
+            elif self.enabled:
+                self._write_cache(self._cache_path(data, size, alpha), surface, alpha)
+        else:
+            self.cache_hits += 1
+
+        surface = surface.convert_alpha() if alpha else surface.convert()
+        self.load_time += time.perf_counter() - start
+        return surface
+
+    def pack(self, sprites, padding=1):
+        # Pack small sprites into one atlas surface (shelf packing, tallest
+        # first) and return {name: subsurface} sharing its pixels.
+        order = sorted(sprites, key=lambda name: sprites[name].get_height(), reverse=True)
+        width = max(256, max(sprite.get_width() for sprite in sprites.values()) + padding)
+        positions = {}
+        x = y = shelf = 0
+        for name in order:
+            w, h = sprites[name].get_size()
+            if x + w > width:
+                x, y, shelf = 0, y + shelf + padding, 0
+            positions[name] = (x, y, w, h)
+            x += w + padding
+            shelf = max(shelf, h)
+
+        atlas = pygame.Surface((width, y + shelf), pygame.SRCALPHA).convert_alpha()
+        atlas.fill((0, 0, 0, 0))
+        for name, rect in positions.items():
+            atlas.blit(sprites[name], rect[:2], special_flags=pygame.BLEND_RGBA_MAX)  # Copy, don't blend
+        return {name: atlas.subsurface(positions[name]) for name in sprites}
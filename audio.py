@@ -0,0 +1,182 @@
+"""Sound effects: deferred mixer start, background decoding, PCM disk cache.
+
+Decoding the MP3s is most of the work the games used to do before their
+first frame.  ``SoundBank`` hands out ``LazySound`` placeholders straight
+away; ``start()`` then brings up the mixer and decodes every registered file
+on a background thread.  Decoded samples are stored as raw PCM in
+``cache_dir`` (keyed by the MP3's hash and the mixer format), so later
+launches skip MP3 decoding altogether.  Until a sound is ready, playing it
+is a no-op.
+
+Playback goes through channels the bank reserves per category, so a burst
+of one effect cannot starve the others, and each sound has a voice cap:
+past it the sound either steals its own oldest voice or is dropped.  The
+mixer runs with a small buffer to keep output latency low.
+"""
+import hashlib
+import os
+import threading
+import time
+
+import pygame
+
+CACHE_DIR = ".audio_cache"
+
+# Reserved channels per category
+CATEGORIES = {"player": 2, "ui": 2, "boss": 2}
+
+
+class LazySound:
+    def __init__(self, bank, filename, category, max_voices, steal):
+        self.bank = bank
+        self.filename = filename
+        self.category = category
+        self.max_voices = max_voices
+        self.steal = steal
+
+    def play(self):
+        return self.bank.play(self)
+
+
+class SoundBank:
+    def __init__(self, cache_dir=CACHE_DIR, background=True, frequency=44100, buffer=256, categories=CATEGORIES):
+        self.cache_dir = cache_dir
+        self.background = background
+        self.frequency = frequency
+        self.buffer = buffer
+        self.categories = categories
+        self._files = []
+        self._sounds = {}  # filename -> pygame.mixer.Sound
+        self._channels = {}  # category -> [Channel], set once the mixer is up
+        self._voices = {}  # Channel -> (filename, start time)
+        self._lock = threading.Lock()
+        self._thread = None
+
+        # Stats
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.ready_time = None  # Seconds from start() until every sound decoded
+        self.plays = 0
+        self.drops = 0
+        self.steals = 0
+        self.play_time = 0.0
+        self.max_play_time = 0.0
+
+    def sound(self, filename, category="player", max_voices=1, steal=True):
+        self._files.append(filename)
+        return LazySound(self, filename, category, max_voices, steal)
+
+    def start(self, tasks=None):
+        # Bring up the mixer and decode everything, on a thread (or as a job
+        # on a background_io.BackgroundTasks) unless background loading is
+        # off (then sounds decode on first play).
+        if self.background and tasks is not None:
+            tasks.submit(self._load_all)
+        elif self.background:
+            self._thread = threading.Thread(target=self._load_all, name="sound-loader", daemon=True)
+            self._thread.start()
+
+    def wait(self):
+        if self._thread is not None:
+            self._thread.join()
+
+    def get(self, filename):
+        sound = self._sounds.get(filename)
+        if sound is None and not self.background:
+            sound = self._load(filename)
+        return sound
+
+    def play(self, lazy):
+        # Start ``lazy`` on a channel of its category, respecting its voice
+        # cap.  Returns the Channel, or None if the sound was dropped.
+        start = time.perf_counter()
+        sound = self.get(lazy.filename)
+        channels = self._channels.get(lazy.category)
+        if sound is None or not channels:
+            self.drops += 1
+            return None
+
+        voices = self._voices
+        free = None
+        own = []
+        for channel in channels:
+            if not channel.get_busy():
+                voices.pop(channel, None)
+                if free is None:
+                    free = channel
+            elif voices.get(channel, ("",))[0] == lazy.filename:
+                own.append(channel)
+
+        if len(own) >= lazy.max_voices:
+            if not lazy.steal:
+                self.drops += 1
+                return None
+            free = min(own, key=lambda channel: voices[channel][1])
+            self.steals += 1
+        elif free is None:
+            # Category full of other sounds: steal its oldest voice
+            free = min(channels, key=lambda channel: voices.get(channel, ("", 0.0))[1])
+            self.steals += 1
+
+        free.play(sound)
+        voices[free] = (lazy.filename, start)
+        elapsed = time.perf_counter() - start
+        self.plays += 1
+        self.play_time += elapsed
+        self.max_play_time = max(self.max_play_time, elapsed)
+        return free
+
+    def stats(self):
+        busy = sum(channel.get_busy() for channels in self._channels.values() for channel in channels)
+        return {"plays": self.plays, "drops": self.drops, "steals": self.steals, "voices": busy,
+                "mean_play_us": self.play_time / self.plays * 1e6 if self.plays else 0.0,
+                "max_play_us": self.max_play_time * 1e6,
+                "buffer_latency_ms": self.buffer / self.frequency * 1000,
+                "cache_hits": self.cache_hits, "cache_misses": self.cache_misses}
+
+    def _init_mixer(self):
+        if not pygame.mixer.get_init():
+            pygame.mixer.init(frequency=self.frequency, size=-16, channels=2, buffer=self.buffer)
+        total = sum(self.categories.values())
+        pygame.mixer.set_num_channels(max(total, pygame.mixer.get_num_channels()))
+        pygame.mixer.set_reserved(total)
+        channels = {}
+        index = 0
+        for category, count in self.categories.items():
+            channels[category] = [pygame.mixer.Channel(index + i) for i in range(count)]
+            index += count
+        self._channels = channels
+
+    def _load_all(self):
+        start = time.perf_counter()
+        for filename in self._files:
+            self._load(filename)
+        self.ready_time = time.perf_counter() - start
+
+    def _load(self, filename):
+        with self._lock:
+            if filename in self._sounds:
+                return self._sounds[filename]
+            if not self._channels:
+                self._init_mixer()
+
+            with open(filename, "rb") as f:
+                data = f.read()
+            frequency, size, channels = pygame.mixer.get_init()
+            key = hashlib.sha1(data).hexdigest()[:16]
+            path = os.path.join(self.cache_dir, f"{key}_{frequency}_{size}_{channels}.pcm")
+
+            try:
+                with open(path, "rb") as f:
+                    sound = pygame.mixer.Sound(buffer=f.read())
+                self.cache_hits += 1
+            except OSError:
+                sound = pygame.mixer.Sound(filename)
+                self.cache_misses += 1
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(path + ".tmp", "wb") as f:
+                    f.write(sound.get_raw())
+                os.replace(path + ".tmp", path)
+
+            self._sounds[filename] = sound
+            return sound
@@ -0,0 +1,235 @@
+"""Search-based autopilot and course feasibility checking.
+
+Both search the jump / no-jump decisions of flappy_sim, whose rules are the
+import_pygame.py rules.  A bird's state is quantized to ``quantum`` pixels
+and states that land in the same bucket are searched once.  Positions and
+velocity move in half pixels, so a quantum of 0.5 loses nothing; coarser
+ones search far fewer states but may miss a way through.
+
+``Planner`` looks ``horizon`` steps ahead every step with a depth-first
+search and picks the action that survives longest, trying first the one that
+heads for the middle of the gap.  The horizon has to reach past the next
+pipe, or the bird can commit to a height it cannot leave in time.  Results
+are memoized by quantized state and kept across steps, so each decision
+mostly re-checks the path chosen a step earlier.  Power-ups already held are
+modelled; ones not yet collected are not, as the search runs again next step
+anyway.
+
+``check()`` runs a breadth-first search over every state the bird can reach
+on a course, with no power-ups, one frame at a time in NumPy, and reports
+the first pipe that no reachable state gets past.  Every state it keeps is
+really reachable, so a course it clears is feasible at any quantum; a
+blocked course is checked again at 0.5 before it is reported.  From the
+command line:
+
+    python autopilot.py play 42          # autopilot one run of seed 42
+    python autopilot.py check 1000       # check seeds 0-999, all cores
+"""
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+import flappy_sim
+from course import Course, CLASSIC
+from flappy_sim import (PowerUp, WIDTH, HEIGHT, gravity, jump_strength, pipe_width, slow_motion_factor,
+                        collides)
+
+_NONE = PowerUp.NONE
+_IMMUNITY = PowerUp.IMMUNITY
+_SLOW_MOTION = PowerUp.SLOW_MOTION
+
+
+class Planner:
+    def __init__(self, horizon=90, quantum=0.5, max_cache=200000):
+        self.horizon = horizon  # Steps looked ahead
+        self.quantum = quantum
+        self.max_cache = max_cache
+        self._scale = 1.0 / quantum
+        self._course = None
+        self._pipes = {}  # Pipe index -> (height, gap)
+        self._cache = {}  # Quantized state -> (steps survived, depth searched)
+
+        # Stats
+        self.decisions = 0
+        self.expanded = 0
+        self.lookups = 0
+        self.hits = 0
+        self.search_time = 0.0
+
+    def decide(self, state):
+        # Whether to jump this step
+        start = time.perf_counter()
+        if self._course is None or self._course.seed != state.seed or self._course.preset is not state.course.preset:
+            self._course = Course(state.seed, state.course.preset)
+            self._pipes.clear()
+            self._cache.clear()
+        elif len(self._cache) > self.max_cache:
+            self._cache.clear()
+        for n in [n for n in self._pipes if n < state.pipe_index]:
+            del self._pipes[n]
+
+        node = (state.bird_y, state.bird_velocity, state.pipe_x, state.pipe_index,
+                state.current_power_up, state.power_up_duration)
+        action = self._best(node, self.horizon)[1]
+        self.decisions += 1
+        self.search_time += time.perf_counter() - start
+        return action
+
+    def _pipe(self, n):
+        pipe = self._pipes.get(n)
+        if pipe is None:
+            pipe = self._pipes[n] = self._course.pipe(n)[:2]
+        return pipe
+
+    def _advance(self, node, action):
+        # One flappy_sim.step() without power-up pickups; None if the bird dies
+        y, velocity, x, n, power_up, duration = node
+        velocity = (jump_strength if action else velocity) + gravity
+        y += velocity
+        speed = self._course.speed(n)
+        x -= speed * slow_motion_factor if power_up is _SLOW_MOTION else speed
+        if x < -pipe_width:
+            x = WIDTH
+            n += 1
+        if power_up is not _IMMUNITY and collides(y, x, *self._pipe(n)):
+            return None
+        if power_up is not _NONE:
+            duration -= 1
+            if duration <= 0:
+                power_up, duration = _NONE, 0
+        return y, velocity, x, n, power_up, duration
+
+    def _best(self, node, depth):
+        # (steps survived up to depth, first action of that line)
+        y, _, x, n, _, _ = node
+        if x + pipe_width < flappy_sim.bird_x - flappy_sim.bird_radius:
+            n += 1  # Already past this pipe; aim for the next
+        height, gap = self._pipe(n)
+        order = (True, False) if y > height + gap / 2 else (False, True)
+        best, best_action = -1, order[0]
+        for action in order:
+            child = self._advance(node, action)
+            steps = 0 if child is None else 1 if depth == 1 else 1 + self._survive(child, depth - 1)
+            if steps > best:
+                best, best_action = steps, action
+                if best == depth:
+                    break
+        return best, best_action
+
+    def _survive(self, node, depth):
+        # Most steps survivable from node, capped at depth.  A cached result
+        # below its depth is exact and answers any depth; one that reached
+        # its depth answers any depth up to it.
+        y, velocity, x, n, power_up, duration = node
+        scale = self._scale
+        key = (round(y * scale), round(velocity * scale), round(x * scale), n, power_up, duration)
+        self.lookups += 1
+        entry = self._cache.get(key)
+        if entry is not None and (entry[0] < entry[1] or entry[1] >= depth):
+            self.hits += 1
+            return min(entry[0], depth)
+        self.expanded += 1
+        steps = self._best(node, depth)[0]
+        self._cache[key] = (steps, depth)
+        return steps
+
+    def stats(self):
+        return {"decisions": self.decisions, "expanded": self.expanded,
+                "expanded_per_s": self.expanded / self.search_time if self.search_time else 0.0,
+                "ms_per_decision": self.search_time / self.decisions * 1000 if self.decisions else 0.0,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+                "cache_size": len(self._cache)}
+
+
+def check(seed, preset=CLASSIC, pipes=100, quantum=1.0):
+    # Can any sequence of jumps clear the first ``pipes`` pipes of this
+    # course without power-ups?  Steps every reachable (y, velocity) at
+    # once; pipe position depends only on the frame, so it is shared.
+    start = time.perf_counter()
+    course = Course(seed, preset)
+    height, gap, _ = course.pipe(0)
+    y = np.array([HEIGHT // 2], dtype=float)
+    velocity = np.zeros(1)
+    x, n = WIDTH, 0
+    frames = expanded = peak = 0
+    while n < pipes and y.size:
+        speed = course.speed(n)
+        x -= speed
+        if x < -pipe_width:
+            x = WIDTH
+            n += 1
+            height, gap, _ = course.pipe(n)
+            course.prefetch(n)
+
+        # Every state falls, or jumps: a jump sets the velocity, so jumps
+        # from states at the same height land on the same state
+        velocity = np.concatenate((velocity + gravity, np.full(y.size, jump_strength + gravity)))
+        y = np.concatenate((y, y)) + velocity
+        expanded += y.size
+        frames += 1
+
+        # Same test as flappy_sim.collides()
+        top = np.trunc(y) - flappy_sim.bird_radius
+        bottom = top + 2 * flappy_sim.bird_radius
+        alive = (top >= 0) & (bottom <= HEIGHT)
+        left = flappy_sim.bird_x - flappy_sim.bird_radius
+        if left + 2 * flappy_sim.bird_radius > x and left < x + pipe_width:
+            alive &= (top >= height) & (bottom <= height + gap)
+        y, velocity = y[alive], velocity[alive]
+
+        # One state per quantized (y, velocity)
+        keys = np.round(y / quantum).astype(np.int64) * 4096 + np.round(velocity / quantum).astype(np.int64)
+        _, first = np.unique(keys, return_index=True)
+        y, velocity = y[first], velocity[first]
+        peak = max(peak, y.size)
+
+    elapsed = time.perf_counter() - start
+    return {"seed": seed, "feasible": n >= pipes, "pipes_cleared": n,
+            "blocked_pipe": None if n >= pipes else n, "pipe_speed": course.speed(n),
+            "frames": frames, "states_expanded": expanded, "peak_states": peak,
+            "states_per_s": expanded / elapsed if elapsed else 0.0}
+
+
+def _check(args):
+    result = check(*args)
+    if not result["feasible"] and args[3] > 0.5:
+        result = check(*args[:3], 0.5)  # Blocked at a coarse quantum; make sure
+    return result
+
+
+def check_many(seeds, preset=CLASSIC, pipes=100, quantum=1.0, processes=None):
+    # check() for each seed across a process pool, a blocked course
+    # confirmed at the exact quantum; returns the results in seed order
+    with Pool(processes) as pool:
+        return pool.map(_check, [(seed, preset, pipes, quantum) for seed in seeds],
+                        chunksize=max(1, len(seeds) // 64))
+
+
+def play(seed, planner=None, max_steps=None):
+    # One autopiloted run; returns (state, planner)
+    planner = planner or Planner()
+    state = flappy_sim.SimState(seed)
+    flappy_sim.run(state, planner.decide, max_steps)
+    return state, planner
+
+
+if __name__ == "__main__":
+    command, target = sys.argv[1], int(sys.argv[2])
+    if command == "play":
+        state, planner = play(target, max_steps=60 * 60 * 10)
+        stats = planner.stats()
+        print(f"seed {target}: score {state.score} in {state.frame} steps ({'died' if not state.alive else 'alive'}), "
+              f"{stats['ms_per_decision']:.3f} ms per decision, {stats['expanded_per_s']:,.0f} states/s, "
+              f"cache hit rate {stats['hit_rate']:.1%}")
+    elif command == "check":
+        results = check_many(list(range(target)))
+        for result in results:
+            if not result["feasible"]:
+                print(f"seed {result['seed']}: pipe {result['blocked_pipe']} cannot be cleared "
+                      f"at pipe speed {result['pipe_speed']}")
+        expanded = sum(result["states_expanded"] for result in results)
+        print(f"{sum(result['feasible'] for result in results)}/{len(results)} courses feasible, "
+              f"{expanded:,} states expanded, peak {max(result['peak_states'] for result in results):,} per frame")
+        sys.exit(0 if all(result["feasible"] for result in results) else 1)
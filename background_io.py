@@ -0,0 +1,149 @@
+"""Background I/O for the asyncio game loop.
+
+The games run their main loop as a coroutine (which is what lets pygbag run
+them in a browser), so anything slow has to happen beside the frame rather
+than in it.  ``BackgroundTasks.submit()`` queues a blocking function (a save
+write, a cache write, sound decoding) and returns at once.  On the desktop
+the function runs on a small thread pool; under pygbag, where there are no
+threads, it runs on the event loop between frames.  Jobs submitted before
+the loop starts wait until ``start()``.  A job that fails is counted and
+printed, never raised into the frame.  ``drain()``, at quit, runs jobs
+still waiting out a delay (a debounced save) straight away.
+
+``ScoreUploader`` posts finished runs as JSON to a score server with the
+event loop's own non-blocking sockets; score_server.py is a local stand-in.
+Uploads that fail (no server running, say) are counted and dropped.
+"""
+import asyncio
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+THREADS = sys.platform != "emscripten"  # pygbag builds have no threads
+
+
+class BackgroundTasks:
+    def __init__(self, workers=2):
+        self.workers = workers
+        self._executor = None
+        self._loop = None
+        self._queued = []  # Submitted before start()
+        self._tasks = set()
+        self._hurry = asyncio.Event()  # Set by drain(): delayed jobs stop waiting
+
+        # Stats
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.busy_time = 0.0
+        self.max_job_time = 0.0
+
+    def start(self):
+        # Call from inside the running loop
+        self._loop = asyncio.get_running_loop()
+        if THREADS:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="background-io")
+        queued, self._queued = self._queued, []
+        for job in queued:
+            self._schedule(*job)
+
+    def submit(self, fn, *args, delay=0.0):
+        # Run fn(*args) off the frame, after ``delay`` seconds
+        self.submitted += 1
+        if self._loop is None:
+            self._queued.append((fn, args, delay))
+        else:
+            self._schedule(fn, args, delay)
+
+    def _schedule(self, fn, args, delay):
+        task = self._loop.create_task(self._run(fn, args, delay))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, fn, args, delay):
+        if delay > 0 and not self._hurry.is_set():
+            try:
+                await asyncio.wait_for(self._hurry.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+        start = time.perf_counter()
+        try:
+            if self._executor is not None:
+                await self._loop.run_in_executor(self._executor, fn, *args)
+            else:
+                fn(*args)
+        except Exception as e:
+            self.failed += 1
+            print(f"Background job {getattr(fn, '__name__', fn)} failed: {e}")
+        else:
+            self.completed += 1
+        elapsed = time.perf_counter() - start
+        self.busy_time += elapsed
+        self.max_job_time = max(self.max_job_time, elapsed)
+
+    async def drain(self):
+        # Run every job still waiting out its delay now, wait for all of
+        # them, then stop the workers
+        self._hurry.set()
+        while self._tasks:
+            await asyncio.gather(*self._tasks)
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def stats(self):
+        return {"submitted": self.submitted, "completed": self.completed, "failed": self.failed,
+                "pending": len(self._tasks) + len(self._queued),
+                "mean_job_ms": self.busy_time / self.completed * 1000 if self.completed else 0.0,
+                "max_job_ms": self.max_job_time * 1000}
+
+
+class ScoreUploader:
+    def __init__(self, host="127.0.0.1", port=8765, timeout=2.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._tasks = set()
+
+        # Stats
+        self.sent = 0
+        self.failed = 0
+        self.max_upload_time = 0.0
+
+    def submit(self, run):
+        # Post ``run`` (a JSON-able dict) in the background; needs the
+        # running loop
+        task = asyncio.get_running_loop().create_task(self._upload(run))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _upload(self, run):
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._post(json.dumps(run).encode()), self.timeout)
+        except (OSError, asyncio.TimeoutError, ValueError):
+            self.failed += 1
+        else:
+            self.sent += 1
+        self.max_upload_time = max(self.max_upload_time, time.perf_counter() - start)
+
+    async def _post(self, body):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write(f"POST /scores HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+            await writer.drain()
+            status = (await reader.readline()).split()
+            if len(status) < 2 or not status[1].startswith(b"2"):
+                raise ValueError(f"score server answered {status}")
+        finally:
+            writer.close()
+
+    async def drain(self):
+        while self._tasks:
+            await asyncio.gather(*self._tasks)
+
+    def stats(self):
+        return {"sent": self.sent, "failed": self.failed, "pending": len(self._tasks),
+                "max_upload_ms": self.max_upload_time * 1000}
@@ -0,0 +1,1160 @@
+"""Headless benchmarks.
+
+    python bench.py            # run everything
+    python bench.py sim        # run one benchmark by name
+
+``scenarios`` drives the two game scripts themselves through scripted input
+and writes its numbers to bench_scenarios.json, comparing against the
+previous file if there is one.
+"""
+import os
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import random
+
+import flappy_sim
+
+
+def bench_sim(steps=500000):
+    # Random-ish jumping bot over many episodes, auto-resetting on death
+    state = flappy_sim.SimState(seed=1)
+    step = flappy_sim.step
+    rng = random.Random(1)
+    episodes = 0
+    start = time.perf_counter()
+    for _ in range(steps):
+        if step(state, state.bird_y > state.pipe_height + 150 or rng.random() < 0.02) & flappy_sim.EVENT_DEATH:
+            episodes += 1
+            flappy_sim.reset(state, episodes)
+    elapsed = time.perf_counter() - start
+    print(f"sim: {steps / elapsed:,.0f} steps/s ({episodes} episodes, {elapsed:.2f}s)")
+
+
+def bench_batch(frames=300):
+    # Environment-steps per second as the batch grows
+    import numpy as np
+    import flappy_vec
+
+    for num_envs in (1, 16, 256, 4096, 65536):
+        env = flappy_vec.BatchEnv(num_envs, seed=1)
+        rng = np.random.default_rng(2)
+        actions = rng.random((frames, num_envs)) < 0.05
+        start = time.perf_counter()
+        for t in range(frames):
+            env.step(actions[t])
+        elapsed = time.perf_counter() - start
+        print(f"batch[{num_envs:>6}]: {num_envs * frames / elapsed:>14,.0f} env-steps/s")
+
+
+def _gameplay_scene(frames, seed=1):
+    # Sim states for a bot run, used to drive the rendering benchmarks
+    state = flappy_sim.SimState(seed=seed)
+    scenes = []
+    for _ in range(frames):
+        if flappy_sim.step(state, state.bird_y > state.pipe_height + 150) & flappy_sim.EVENT_DEATH:
+            flappy_sim.reset(state, state.seed + 1)
+        scenes.append((state.bird_y, state.bird_velocity, state.pipe_x, state.pipe_height, state.score,
+                       [list(p) for p in state.active_power_ups], state.pipe_gap))
+    return scenes
+
+
+def bench_render(frames=600):
+    # Frame time of the gameplay screen: full blit + flip vs dirty rects
+    import pygame
+    from dirty_render import DirtyRenderer
+    from flappy_sim import WIDTH, HEIGHT, bird_x, bird_radius, pipe_width
+
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    font = pygame.font.Font(None, 36)
+    background = pygame.transform.scale(pygame.image.load("bg_day.png"), (WIDTH, HEIGHT))
+    bird = pygame.transform.scale(pygame.image.load("bird_blue.png"), (bird_radius * 2, bird_radius * 2))
+    scenes = _gameplay_scene(frames)
+
+    results = {}
+    for enabled in (False, True):
+        renderer = DirtyRenderer(screen, enabled=enabled)
+        mark = renderer.mark
+        times = []
+        for bird_y, velocity, pipe_x, pipe_height, score, power_ups, pipe_gap in scenes:
+            start = time.perf_counter()
+            renderer.begin(background)
+            rotated = pygame.transform.rotate(bird, -velocity * 2)
+            mark(screen.blit(rotated, rotated.get_rect(center=(bird_x, int(bird_y)))))
+            mark(pygame.draw.rect(screen, (0, 255, 0), (pipe_x, 0, pipe_width, pipe_height)))
+            mark(pygame.draw.rect(screen, (0, 255, 0), (pipe_x, pipe_height + pipe_gap, pipe_width, HEIGHT - pipe_height - pipe_gap)))
+            for _, x, y in power_ups:
+                mark(pygame.draw.circle(screen, (255, 255, 0), (int(x), int(y)), 15))
+            mark(screen.blit(font.render(f"Score: {score}", True, (255, 255, 255)), (10, 10)))
+            renderer.present()
+            times.append(time.perf_counter() - start)
+        results[enabled] = (times, pygame.image.tostring(screen, "RGB"), renderer)
+
+    for enabled, label in ((False, "full flip"), (True, "dirty rects")):
+        times, _, renderer = results[enabled]
+        times = sorted(times)
+        pixels = renderer.pixels_updated / len(times)
+        print(f"render[{label:>11}]: mean {sum(times) / len(times) * 1000:.3f} ms  "
+              f"p95 {times[int(len(times) * 0.95)] * 1000:.3f} ms  {pixels:,.0f} px/frame")
+    print(f"render: final frames identical: {results[False][1] == results[True][1]}")
+    pygame.quit()
+
+
+def bench_text(frames=3000):
+    # HUD text per frame: font.render every call vs the TextCache
+    import pygame
+    from text_cache import TextCache
+
+    pygame.init()
+    font = pygame.font.Font(None, 36)
+    scenes = _gameplay_scene(frames)
+    cache = TextCache()
+
+    for label, render in (("font.render", lambda f, t, a, c: f.render(t, a, c)), ("TextCache", cache.render)):
+        start = time.perf_counter()
+        for scene in scenes:
+            score = scene[4]
+            render(font, f"Score: {score}", True, (255, 255, 255))
+            render(font, f"Coins: {score}", True, (255, 255, 0))
+            render(font, f"High Score: {max(score, 16)}", True, (255, 255, 255))
+        elapsed = time.perf_counter() - start
+        print(f"text[{label:>11}]: {elapsed / frames * 1e6:8.1f} us/frame")
+    stats = cache.stats()
+    print(f"text: hits {stats['hits']} misses {stats['misses']} evictions {stats['evictions']} "
+          f"({stats['hits'] / (stats['hits'] + stats['misses']):.1%} hit rate, {stats['bytes']:,} bytes)")
+    pygame.quit()
+
+
+def bench_rotate(frames=3000):
+    # Bird tilt per frame: transform.rotate vs the RotationCache
+    import pygame
+    from sprite_cache import RotationCache
+    from flappy_sim import bird_radius
+
+    pygame.init()
+    bird = pygame.transform.scale(pygame.image.load("bird_blue.png"), (bird_radius * 2, bird_radius * 2))
+    angles = [-scene[1] * 2 for scene in _gameplay_scene(frames)]
+
+    start = time.perf_counter()
+    cache = RotationCache(bird)
+    build = time.perf_counter() - start
+    for label, rotate in (("rotate", lambda a: pygame.transform.rotate(bird, a)), ("cache", cache.get)):
+        start = time.perf_counter()
+        for angle in angles:
+            rotate(angle)
+        elapsed = time.perf_counter() - start
+        print(f"rotate[{label:>6}]: {elapsed / frames * 1e6:8.2f} us/frame")
+    errors = [cache.error(angle) for angle in angles[::10]]
+    print(f"rotate: prefill {build * 1000:.1f} ms, hits {cache.hits} misses {cache.misses}, "
+          f"max mask error {max(errors):.2%}, mean {sum(errors) / len(errors):.2%}")
+    pygame.quit()
+
+
+def bench_assets(blits=2000):
+    # Startup image loading (plain load+scale vs cold/warm AssetManager) and
+    # per-blit cost of unconverted vs converted surfaces
+    import shutil
+    import tempfile
+    import pygame
+    from assets import AssetManager
+    from flappy_sim import WIDTH, HEIGHT, bird_radius
+
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    images = [("bg_day.png", (WIDTH, HEIGHT), False), ("bg_night.png", (WIDTH, HEIGHT), False),
+              ("bird_blue.png", (bird_radius * 2, bird_radius * 2), None),
+              ("pipe.png", (50, HEIGHT), None), ("boss.png", (100, 100), None)]
+
+    start = time.perf_counter()
+    plain = [pygame.transform.scale(pygame.image.load(name), size) for name, size, _ in images]
+    print(f"assets[      load+scale]: {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+    cache_dir = tempfile.mkdtemp()
+    try:
+        for label in ("cold cache", "warm cache"):
+            manager = AssetManager(cache_dir=cache_dir)
+            start = time.perf_counter()
+            prepared = [manager.image(name, size, alpha) for name, size, alpha in images]
+            print(f"assets[{label:>16}]: {(time.perf_counter() - start) * 1000:8.1f} ms")
+    finally:
+        shutil.rmtree(cache_dir)
+
+    for label, surfaces in (("unconverted", plain), ("converted", prepared)):
+        start = time.perf_counter()
+        for _ in range(blits):
+            for surface in surfaces:
+                screen.blit(surface, (0, 0))
+        print(f"assets[{label:>16} blit]: {(time.perf_counter() - start) / blits * 1e6:8.1f} us/frame "
+              f"({len(surfaces)} surfaces)")
+    pygame.quit()
+
+
+def bench_save(frames=3600):
+    # A minute of play: the old synchronous write every frame vs SaveStore
+    # updates on score events with write-behind flushing
+    import shutil
+    import tempfile
+    from save_data import SaveStore
+
+    scenes = _gameplay_scene(frames)
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "game_data.txt")
+        start = time.perf_counter()
+        for scene in scenes:
+            with open(path, "w") as f:
+                f.write(f"{scene[4]},{scene[4]}\n")
+        elapsed = time.perf_counter() - start
+        print(f"save[ every frame]: {frames} writes, {elapsed / frames * 1e6:8.1f} us/frame on the game thread")
+
+        store = SaveStore(path, debounce=0.05)
+        start = time.perf_counter()
+        last_score = 0
+        for scene in scenes:
+            if scene[4] != last_score:
+                last_score = scene[4]
+                store.update(high_score=last_score, coins=last_score)
+                store.flush()
+        elapsed = time.perf_counter() - start
+        store.close()
+        stats = store.stats()
+        print(f"save[write-behind]: {stats['writes']} writes, {elapsed / frames * 1e6:8.1f} us/frame on the game thread, "
+              f"write {stats['mean_write_ms']:.2f} ms mean / {stats['max_write_ms']:.2f} ms max")
+    finally:
+        shutil.rmtree(tmp)
+
+
+# Runs a game script and quits it on its first event pump after the first
+# frame; used by the startup benchmark.
+_FIRST_FRAME_RUNNER = """
+import runpy, sys
+import pygame
+_get = pygame.event.get
+_calls = [0]
+def get(*args, **kwargs):
+    _calls[0] += 1
+    events = _get(*args, **kwargs)
+    return events + [pygame.event.Event(pygame.QUIT)] if _calls[0] > 1 else events
+pygame.event.get = get
+runpy.run_path(sys.argv[1], run_name="__main__")
+"""
+
+
+def bench_startup(runs=3, script="import_pygame.py"):
+    # Launch-to-first-frame for a cold start (no asset/audio caches) and
+    # warm starts, each in a fresh interpreter
+    import glob
+    import re
+    import shutil
+    import subprocess
+    import tempfile
+
+    tmp = tempfile.mkdtemp()
+    try:
+        for pattern in ("*.py", "*.png", "*.mp3", "game_data.txt"):
+            for filename in glob.glob(pattern):
+                shutil.copy(filename, tmp)
+        for run in range(runs + 1):
+            start = time.perf_counter()
+            out = subprocess.run([sys.executable, "-c", _FIRST_FRAME_RUNNER, script], cwd=tmp,
+                                 capture_output=True, text=True, check=True).stdout
+            wall = time.perf_counter() - start
+            first_frame = re.search(r"Time to first frame: (\d+) ms", out).group(1)
+            label = "cold" if run == 0 else f"warm {run}"
+            print(f"startup[{label:>6}]: first frame {first_frame:>5} ms, process {wall * 1000:6.0f} ms")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def bench_audio(presses=600):
+    # Jump spam and boss-hit overlap through the channel manager (dummy
+    # audio driver): voices are capped instead of piling up
+    import shutil
+    import tempfile
+    import pygame
+    from audio import SoundBank
+
+    cache_dir = tempfile.mkdtemp()
+    try:
+        bank = SoundBank(cache_dir=cache_dir)
+        jump = bank.sound("jump.mp3", "player", max_voices=2)
+        score = bank.sound("score.mp3", "ui")
+        boss_hit = bank.sound("boss_hit.mp3", "boss", steal=False)
+        start = time.perf_counter()
+        bank.start()
+        bank.wait()
+        print(f"audio: mixer up and sounds decoded in {(time.perf_counter() - start) * 1000:.1f} ms")
+        for frame in range(presses):
+            jump.play()
+            boss_hit.play()
+            if frame % 30 == 0:
+                score.play()
+        stats = bank.stats()
+        print(f"audio: {stats['plays']} plays, {stats['drops']} drops, {stats['steals']} steals, "
+              f"{stats['voices']} voices busy; "
+              f"play {stats['mean_play_us']:.1f} us mean / {stats['max_play_us']:.1f} us max, "
+              f"buffer latency {stats['buffer_latency_ms']:.1f} ms")
+        pygame.mixer.quit()
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+def bench_particles(frames=120):
+    # Update + draw per frame with N live particles, held steady by
+    # re-emitting what dies, against the 16.7 ms frame budget
+    import pygame
+    from particles import ParticleSystem
+    from flappy_sim import WIDTH, HEIGHT
+
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    for live in (1000, 10000, 30000, 50000):
+        system = ParticleSystem(capacity=live, seed=1)
+        colors = [(0, 0, 255), (255, 0, 0)]
+        times = []
+        for frame in range(frames):
+            start = time.perf_counter()
+            missing = live - system.count
+            while missing > 0:
+                missing -= system.emit(WIDTH / 2, HEIGHT / 2, colors[frame % 2], count=min(missing, 500),
+                                       spread=180, size=5, shrink=0.05)
+            system.update()
+            system.draw(screen)
+            times.append(time.perf_counter() - start)
+        times.sort()
+        print(f"particles[{live:>6}]: {sum(times) / frames * 1000:6.2f} ms mean, "
+              f"p95 {times[int(frames * 0.95)] * 1000:6.2f} ms ({'within' if times[int(frames * 0.95)] < 1 / 60 else 'over'} 60 FPS budget)")
+
+    # The old list-of-lists system, for reference
+    particles = [[WIDTH / 2 + random.uniform(-180, 180), HEIGHT / 2, 5, (0, 0, 255), 0.05] for _ in range(10000)]
+    start = time.perf_counter()
+    for particle in particles:
+        particle[0] += random.uniform(-1, 1)
+        particle[1] += random.uniform(-1, 1)
+        particle[2] -= particle[4]
+        pygame.draw.circle(screen, particle[3], (int(particle[0]), int(particle[1])), int(particle[2]))
+    print(f"particles[ lists ]: {(time.perf_counter() - start) * 1000:6.2f} ms for 10000 (update + draw, no removal)")
+    pygame.quit()
+
+
+def bench_entities(frames=300, live=10000):
+    # Per-frame systems cost with 10k entities: move, cull + respawn, and a
+    # bird overlap query; against list-of-dict entities for reference
+    import numpy as np
+    from entities import EntityStore, PIPE, POWER_UP, CLOUD
+    from flappy_sim import WIDTH, HEIGHT
+
+    rng = np.random.default_rng(1)
+    world = EntityStore()
+    kinds = (PIPE, POWER_UP, CLOUD)
+    per_kind = live // len(kinds)
+    for kind in kinds:
+        world.spawn_many(kind, rng.uniform(0, WIDTH * 4, per_kind), rng.uniform(0, HEIGHT, per_kind),
+                         30, 30, vx=-rng.uniform(1, 5, per_kind))
+    start = time.perf_counter()
+    for _ in range(frames):
+        world.move()
+        culled = world.cull()
+        if culled.size:
+            world.spawn_many(CLOUD, np.full(culled.size, WIDTH * 4.0), rng.uniform(0, HEIGHT, culled.size),
+                             30, 30, vx=-2.0)
+        world.overlapping(30, 280, 40, 40, kind=POWER_UP)
+    elapsed = time.perf_counter() - start
+    print(f"entities[ store]: {elapsed / frames * 1000:6.3f} ms/frame with {world.count} alive")
+
+    items = [{"x": random.uniform(0, WIDTH * 4), "y": random.uniform(0, HEIGHT), "vx": -random.uniform(1, 5)}
+             for _ in range(live)]
+    start = time.perf_counter()
+    for _ in range(frames // 10):
+        for item in items[:]:
+            item["x"] += item["vx"]
+            if item["x"] + 30 < 0:
+                items.remove(item)
+                items.append({"x": WIDTH * 4.0, "y": random.uniform(0, HEIGHT), "vx": -2.0})
+        [item for item in items if abs(50 - item["x"]) < 20 and abs(300 - item["y"]) < 20]
+    elapsed = time.perf_counter() - start
+    print(f"entities[ dicts]: {elapsed / (frames // 10) * 1000:6.3f} ms/frame with {len(items)} alive")
+
+
+def bench_collision(queries=2000):
+    # Broad phase: brute-force box test over every obstacle vs the sweep
+    # index, as the obstacle count grows; then the pixel-mask narrow phase
+    import numpy as np
+    import pygame
+    from collision import MaskCache, SweepIndex, masks_overlap
+    from flappy_sim import WIDTH, HEIGHT, bird_radius
+
+    rng = np.random.default_rng(1)
+    for count in (10, 100, 1000, 10000, 100000):
+        left = rng.uniform(0, WIDTH * count / 10, count)  # Course length grows with obstacle count
+        top = rng.uniform(0, HEIGHT, count)
+        handles = np.arange(count)
+        index = SweepIndex()
+        start = time.perf_counter()
+        index.build(handles, left, top, 50, 50)
+        build = time.perf_counter() - start
+        probes = rng.uniform(0, WIDTH * count / 10, queries)
+        start = time.perf_counter()
+        for x in probes:
+            index.query(x, 280, 40, 40)
+        sweep = (time.perf_counter() - start) / queries
+        start = time.perf_counter()
+        for x in probes[:200]:
+            np.flatnonzero((left < x + 40) & (left + 50 > x) & (top < 320) & (top + 50 > 280))
+        brute = (time.perf_counter() - start) / 200
+        stats = index.stats()
+        print(f"collision[{count:>6}]: sweep {sweep * 1e6:7.1f} us/query ({stats['candidates_per_query']:.1f} candidates, "
+              f"build {build * 1000:.2f} ms), brute force {brute * 1e6:8.1f} us/query")
+
+    # Per frame, as the game runs it: every obstacle scrolls, one spawns and
+    # one leaves, then the bird asks once.  Rebuilding the index each frame
+    # (one build plus one query) vs keeping it sorted (scroll, insert,
+    # remove, query) vs the box test over every obstacle
+    from entities import EntityStore, PIPE
+    for count in (10, 100, 1000, 10000):
+        world = EntityStore()
+        kept = SweepIndex()
+        spacing = 60.0
+        for i in range(count):
+            handle = world.spawn(PIPE, i * spacing, rng.uniform(0, HEIGHT), 50, 50, vx=-3)
+            kept.insert(handle, world.x[handle], world.y[handle], 50, 50)
+        rebuilt = SweepIndex()
+        times = {"rebuild": 0.0, "kept sorted": 0.0, "brute force": 0.0}
+        frames = 300
+        for frame in range(frames):
+            world.move(kind=PIPE)
+            gone = world.cull(kind=PIPE)
+            handle = world.spawn(PIPE, count * spacing - 3 * frame, rng.uniform(0, HEIGHT), 50, 50, vx=-3)
+            bird = (30, 280 + frame % 40, 40, 40)
+            start = time.perf_counter()
+            rebuilt.build_from(world)
+            rebuilt.query(*bird)
+            times["rebuild"] += time.perf_counter() - start
+            start = time.perf_counter()
+            kept.scroll(-3)
+            if gone.size:
+                kept.remove(gone)
+            kept.insert(handle, world.x[handle], world.y[handle], 50, 50)
+            kept.query(*bird)
+            times["kept sorted"] += time.perf_counter() - start
+            start = time.perf_counter()
+            world.overlapping(*bird)
+            times["brute force"] += time.perf_counter() - start
+        print(f"collision[{count:>6} per frame]: " +
+              ", ".join(f"{label} {elapsed / frames * 1e6:7.1f} us" for label, elapsed in times.items()))
+
+    pygame.init()
+    masks = MaskCache()
+    bird = pygame.transform.scale(pygame.image.load("bird_blue.png"), (bird_radius * 2, bird_radius * 2))
+    boss = pygame.transform.scale(pygame.image.load("boss.png"), (100, 100))
+    start = time.perf_counter()
+    for i in range(queries):
+        masks_overlap(masks.mask(bird), (30, 260 + i % 80), masks.mask(boss), (40, 300))
+    print(f"collision[  mask]: {(time.perf_counter() - start) / queries * 1e6:.1f} us per bird/boss pixel test")
+    pygame.quit()
+
+
+def bench_replay(runs=200):
+    # Record bot runs, then check size, playback speed against the 60 FPS
+    # loop, and serial vs process-pool verification of the directory
+    import tempfile
+    import replay
+
+    recorded = []
+    for seed in range(runs):
+        state = flappy_sim.SimState(seed)
+        recorder = replay.Recorder()
+        recorder.start(seed)
+        rng = random.Random(seed)  # Not the sim's rng, which playback must see untouched
+        while state.alive:
+            jump = state.bird_y > state.pipe_height + 150 or rng.random() < 0.004
+            recorder.record(jump)
+            flappy_sim.step(state, jump)
+        recorded.append(recorder.finish(state.score))
+    frames = sum(r.frames for r in recorded)
+    size = sum(len(replay.encode(r)) for r in recorded)
+    print(f"replay: {runs} runs, {frames / runs:.0f} frames and {size / runs:.0f} bytes per run on average")
+
+    start = time.perf_counter()
+    ok = all(replay.verify(r) for r in recorded)
+    elapsed = time.perf_counter() - start
+    print(f"replay: playback {frames / elapsed:,.0f} frames/s, {frames / 60 / elapsed:,.0f}x real time (all verified: {ok})")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for r in recorded:
+            replay.save(r, directory)
+        start = time.perf_counter()
+        serial = [replay._verify_file(os.path.join(directory, name)) for name in os.listdir(directory)]
+        serial_time = time.perf_counter() - start
+        start = time.perf_counter()
+        results = replay.verify_dir(directory)
+        pool_time = time.perf_counter() - start
+    print(f"replay: verify directory serial {serial_time * 1000:.0f} ms, pool of {os.cpu_count()} "
+          f"{pool_time * 1000:.0f} ms ({sum(results.values())}/{len(serial)} ok)")
+
+
+def bench_pacing(seconds=1.0):
+    # Fixed 60 Hz steps under different frame costs: a 144 Hz display, the
+    # usual 60, weak hardware at ~25 FPS, and 60 with one 250 ms hitch
+    from frame_clock import FixedStepClock
+
+    for name, render_fps, frame_cost, hitch in (("144hz", 144, 0.002, None), ("60hz", 60, 0.004, None),
+                                                ("weak", 0, 0.040, None), ("hitch", 60, 0.004, 0.25)):
+        clock = FixedStepClock(60, render_fps)
+        start = time.perf_counter()
+        frames = 0
+        while time.perf_counter() - start < seconds:
+            clock.tick()
+            time.sleep(hitch if hitch and frames == 20 else frame_cost)
+            frames += 1
+        stats = clock.stats()
+        elapsed = time.perf_counter() - start
+        print(f"pacing[{name:>5}]: {stats['fps']:5.0f} FPS, {stats['steps_per_frame']:.2f} steps/frame, "
+              f"{stats['steps'] / elapsed:.0f} steps/s, jitter {stats['jitter_ms']:.2f} ms, "
+              f"{stats['dropped_frames']} dropped frames, {stats['dropped_steps']} steps dropped")
+
+
+def bench_profiler(phases=200000):
+    # Cost of one timed phase, disabled and enabled, against a bare loop
+    from profiler import Profiler
+
+    start = time.perf_counter()
+    for _ in range(phases):
+        pass
+    bare = time.perf_counter() - start
+    for enabled in (False, True):
+        profiler = Profiler(enabled=enabled)
+        start = time.perf_counter()
+        for _ in range(phases):
+            with profiler.phase("phase"):
+                pass
+        cost = (time.perf_counter() - start - bare) / phases
+        print(f"profiler[{'on' if enabled else 'off':>3}]: {cost * 1e9:.0f} ns per phase")
+
+
+_SCENARIO_RUNNER = """
+import asyncio, json, random, resource, sys, time
+import pygame
+import frame_clock
+
+script, scenario, frames, warmup = sys.argv[1], sys.argv[2], int(sys.argv[3]), int(sys.argv[4])
+
+def tick(self):
+    # One simulation step per frame and no sleep: time the work, not the cap
+    self.alpha = 1.0
+    self.frames += 1
+    self.steps += 1
+    return 1
+frame_clock.FixedStepClock.tick = tick
+
+async def tick_async(self):
+    await asyncio.sleep(0)  # Still let background tasks run between frames
+    return tick(self)
+frame_clock.FixedStepClock.tick_async = tick_async
+
+game = {"__name__": "__main__", "__file__": script}
+presents = []
+marks = {}
+
+def timed(present):
+    def wrapper(*args):
+        result = present(*args)
+        presents.append(time.perf_counter())
+        if len(presents) == warmup:
+            marks["blocks"] = sys.getallocatedblocks()
+        return result
+    return wrapper
+pygame.display.flip = timed(pygame.display.flip)
+pygame.display.update = timed(pygame.display.update)
+
+def key(k):
+    return pygame.event.Event(pygame.KEYDOWN, key=k)
+
+def click(pos):
+    return pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=pos, button=1)
+
+def should_jump():
+    # Same rule as the sim bot: flap once below the middle of the gap
+    if "sim" in game:
+        return game["sim"].bird_y > game["sim"].pipe_height + 150
+    world = game["world"]
+    ahead = [h for h in world.handles(1)  # Top halves of the pipes still ahead
+             if world.y[h] == 0 and world.x[h] + world.w[h] > game["bird_x"] - game["bird_radius"]]
+    if not ahead:
+        return game["bird_y"] > game["HEIGHT"] // 2
+    pipe = min(ahead, key=lambda h: world.x[h])
+    return game["bird_y"] > world.h[pipe] + 150
+
+def play(frame):
+    state = game["game_state"].name
+    if state != "PLAYING":
+        return [key(pygame.K_SPACE)] if state in ("MENU", "GAME_OVER") else []
+    return [key(pygame.K_SPACE)] if should_jump() else []
+
+def boss(frame):
+    game["level"] = 5  # Pin a boss level (every fifth level)
+    return play(frame)
+
+rng = random.Random(1)
+def particles(frame):
+    if game["game_state"].name == "PLAYING":
+        for _ in range(6):
+            game["create_particles"](rng.uniform(0, 400), rng.uniform(0, 600), (0, 0, 255), 250, 30)
+    return play(frame)
+
+def shop(frame):
+    if frame == 0:
+        game["coins"] = 10 ** 6
+        return [key(pygame.K_s)]
+    if frame % 10:
+        return []
+    items = len(game["shop_items"])
+    return [click((game["WIDTH"] // 2, 120 + (frame // 10 % items) * 50))]
+
+def jump_spam(frame):
+    return [key(pygame.K_SPACE)]
+
+def autopilot(frame):
+    return [key(pygame.K_p)] if frame == 0 else []
+
+SCENARIOS = {"menu": lambda frame: [], "gameplay": play, "boss": boss, "particles": particles,
+             "shop": shop, "achievements": lambda frame: [key(pygame.K_a)] if frame == 0 else [],
+             "jump_spam": jump_spam, "autopilot": autopilot}
+
+_get = pygame.event.get
+def get(*args, **kwargs):
+    events = _get(*args, **kwargs)
+    frame = len(presents)
+    if frame >= warmup + frames:
+        return events + [pygame.event.Event(pygame.QUIT)]
+    return events + SCENARIOS[scenario](frame)
+pygame.event.get = get
+
+with open(script) as f:
+    exec(compile(f.read(), script, "exec"), game)
+
+times = [(b - a) * 1000 for a, b in zip(presents[warmup:], presents[warmup + 1:])]
+times.sort()
+mean = sum(times) / len(times)
+print("SCENARIO_RESULT " + json.dumps({
+    "frames": len(times), "fps": 1000 / mean, "mean_ms": mean,
+    "p50_ms": times[len(times) // 2], "p95_ms": times[int(len(times) * 0.95)],
+    "p99_ms": times[int(len(times) * 0.99)], "max_ms": times[-1],
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "allocated_blocks_growth": sys.getallocatedblocks() - marks["blocks"],
+}))
+"""
+
+SCENARIOS = {
+    "import_pygame.py": ["menu", "gameplay", "shop", "jump_spam", "autopilot"],
+    "flappy pygame 2.py": ["menu", "gameplay", "boss", "particles", "achievements", "jump_spam"],
+}
+
+
+def bench_scenarios(frames=600, warmup=60, out="bench_scenarios.json"):
+    # Each game script in a fresh interpreter on the dummy drivers, fed
+    # scripted input, one simulation step per frame and no frame cap.  Frame
+    # times are between presents; allocations are the net growth in live
+    # Python memory blocks over the measured frames.  Images a script loads
+    # that are missing from the tree get a placeholder in the temp copy.
+    import glob
+    import json
+    import platform
+    import re
+    import shutil
+    import subprocess
+    import tempfile
+    import pygame
+
+    previous = {}
+    if os.path.exists(out):
+        with open(out) as f:
+            previous = json.load(f).get("results", {})
+
+    results = {}
+    for script, scenarios in SCENARIOS.items():
+        tmp = tempfile.mkdtemp()
+        try:
+            for pattern in ("*.py", "*.png", "*.mp3"):
+                for filename in glob.glob(pattern):
+                    shutil.copy(filename, tmp)
+            with open(script) as f:
+                images = set(re.findall(r'"([\w .-]+\.png)"', f.read()))
+            placeholders = sorted(image for image in images if not os.path.exists(image))
+            for image in placeholders:
+                placeholder = pygame.Surface((64, 64))
+                placeholder.fill((128, 128, 128))
+                pygame.image.save(placeholder, os.path.join(tmp, image))
+            if placeholders:
+                print(f"scenario[{script}]: placeholder images for {', '.join(placeholders)}")
+            for scenario in scenarios:
+                name = f"{script}:{scenario}"
+                run = subprocess.run([sys.executable, "-c", _SCENARIO_RUNNER, script, scenario, str(frames), str(warmup)],
+                                     cwd=tmp, capture_output=True, text=True)
+                lines = [line for line in run.stdout.splitlines() if line.startswith("SCENARIO_RESULT ")]
+                if run.returncode or not lines:
+                    error = (run.stderr.strip().splitlines() or ["no result"])[-1]
+                    results[name] = {"error": error}
+                    print(f"scenario[{name}]: failed: {error}")
+                    continue
+                result = results[name] = json.loads(lines[-1][len("SCENARIO_RESULT "):])
+                if placeholders:
+                    result["placeholder_images"] = placeholders
+                change = ""
+                if "fps" in previous.get(name, {}):
+                    change = f", {(result['fps'] / previous[name]['fps'] - 1) * 100:+.0f}% FPS vs last run"
+                print(f"scenario[{name}]: {result['fps']:.0f} FPS, p50 {result['p50_ms']:.2f} / p95 {result['p95_ms']:.2f} / "
+                      f"p99 {result['p99_ms']:.2f} ms, peak RSS {result['peak_rss_mb']:.0f} MB, "
+                      f"{result['allocated_blocks_growth']:+} blocks{change}")
+        finally:
+            shutil.rmtree(tmp)
+
+    with open(out, "w") as f:
+        json.dump({"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                   "pygame": pygame.version.ver, "platform": platform.platform(),
+                   "frames": frames, "warmup": warmup, "results": results}, f, indent=1)
+    print(f"scenarios: results written to {out}")
+
+
+def bench_course(pipes=100000):
+    # Chunk generation time and the worst single pipe() / prefetch() call
+    # while streaming a long course, the per-frame cost a game would see
+    from course import Course, LEVELS
+
+    for name, preset in (("classic", None), ("levels", LEVELS)):
+        course = Course(1) if preset is None else Course(1, preset)
+        worst = 0.0
+        start = time.perf_counter()
+        for n in range(pipes):
+            t = time.perf_counter()
+            course.pipe(n)
+            course.prefetch(n)
+            worst = max(worst, time.perf_counter() - t)
+        elapsed = time.perf_counter() - start
+        print(f"course[{name:>7}]: {elapsed / course.chunks_generated * 1e6:.0f} us per chunk of "
+              f"{course.chunk_size}, {elapsed / pipes * 1e6:.2f} us per pipe, worst call {worst * 1e6:.0f} us")
+
+
+def bench_autopilot(steps=6000, seeds=8):
+    # Planner decisions against the 16.7 ms step budget, and the
+    # feasibility checker's state throughput
+    import autopilot
+
+    for horizon in (60, 90, 120):
+        planner = autopilot.Planner(horizon=horizon)
+        scores = []
+        for seed in range(seeds):
+            state, _ = autopilot.play(seed, planner, max_steps=steps)
+            scores.append(state.score if not state.alive else f"{state.score}+")
+        stats = planner.stats()
+        print(f"autopilot[h={horizon:>3}]: {stats['ms_per_decision']:.2f} ms per decision, "
+              f"{stats['expanded_per_s']:,.0f} states/s, cache hit rate {stats['hit_rate']:.1%}, scores {scores}")
+
+    for quantum in (2.0, 1.0):
+        start = time.perf_counter()
+        results = [autopilot.check(seed, pipes=50, quantum=quantum) for seed in range(seeds)]
+        elapsed = time.perf_counter() - start
+        expanded = sum(result["states_expanded"] for result in results)
+        print(f"autopilot[check q={quantum}]: {elapsed / seeds * 1000:.0f} ms per 50-pipe course, "
+              f"{expanded / elapsed:,.0f} states/s, peak {max(result['peak_states'] for result in results)} "
+              f"states, {sum(result['feasible'] for result in results)}/{seeds} feasible")
+
+
+def bench_evolve(population=256, episodes=4, max_steps=600):
+    # Wall time of one generation as the process pool grows
+    import evolve
+    import numpy as np
+
+    seeds = np.arange(episodes)
+    serial = None
+    for processes in sorted({1, 2, 4, os.cpu_count()}):
+        trainer = evolve.Trainer(population, episodes, max_steps=max_steps, seed=1, processes=processes)
+        trainer.evaluate(seeds)  # Start the pool
+        start = time.perf_counter()
+        trainer.evaluate(seeds)
+        elapsed = time.perf_counter() - start
+        trainer.close()
+        serial = serial or elapsed
+        print(f"evolve[{processes:>2} processes]: {elapsed * 1000:.0f} ms per generation of {population}, "
+              f"{serial / elapsed:.2f}x ({os.cpu_count()} cores)")
+
+
+def bench_parallax(frames=3000):
+    # Background cost per frame: the static full-screen blit, all three
+    # parallax bands (same pixel count, a moving window into wider strips),
+    # only the moving dune and ground bands (the game keeps the sky static),
+    # and the bands scaled from the source every frame.  Then whole gameplay
+    # frames through the dirty-rect renderer, without and with the moving
+    # bands.
+    import pygame
+    from dirty_render import DirtyRenderer
+    from parallax import Layer, ParallaxBackground, make_strip
+    from flappy_sim import WIDTH, HEIGHT, bird_x, bird_radius, pipe_width
+
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    day = pygame.transform.scale(pygame.image.load("bg_day.png"), (WIDTH, HEIGHT)).convert()
+    far = pygame.image.load("bg_far.png").convert()
+    ground = pygame.Surface((48, 60))
+    ground.fill((222, 184, 135))
+    parallax = ParallaxBackground(WIDTH, [Layer([make_strip(day, WIDTH, 380, (0, 0, WIDTH, 380))], 0, 0.05),
+                                          Layer([make_strip(far, WIDTH, 160, (0, 150, 438, 116))], 380, 0.25),
+                                          Layer([make_strip(ground, WIDTH, 60)], 540, 1.0)])
+    moving = ParallaxBackground(WIDTH, parallax.layers[1:])
+
+    def naive():
+        # Scale each source to its band and blit it twice, every frame
+        parallax.scroll(4.5)
+        for layer, source, area in ((parallax.layers[0], day, (0, 0, WIDTH, 380)),
+                                    (parallax.layers[1], far, (0, 150, 438, 116)), (parallax.layers[2], ground, None)):
+            band = pygame.transform.smoothscale(source.subsurface(area) if area else source,
+                                                (WIDTH, layer.strips[0].get_height()))
+            x = -int(layer.offset) % WIDTH
+            screen.blit(band, (x - WIDTH, layer.y))
+            screen.blit(band, (x, layer.y))
+
+    def scrolled(background):
+        def draw():
+            background.scroll(4.5)
+            background.draw(screen, 0.5)
+        return draw
+
+    for label, draw in (("static blit", lambda: screen.blit(day, (0, 0))), ("all bands", scrolled(parallax)),
+                        ("moving bands", scrolled(moving)), ("scaled/frame", naive)):
+        draw()
+        blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+        for _ in range(frames):
+            draw()
+        elapsed = time.perf_counter() - start
+        print(f"parallax[{label:>14}]: {elapsed / frames * 1e6:7.1f} us/frame "
+              f"({elapsed / frames * 60:.2%} of a 60 FPS frame), "
+              f"{sys.getallocatedblocks() - blocks:+d} live blocks after {frames} frames")
+
+    # Whole frames: restore, bands, bird and pipes, present
+    bird = pygame.transform.scale(pygame.image.load("bird_blue.png"), (bird_radius * 2, bird_radius * 2))
+    scenes = _gameplay_scene(frames)
+    for label, bands in (("static frame", None), ("parallax frame", moving)):
+        renderer = DirtyRenderer(screen)
+        mark = renderer.mark
+        start = time.perf_counter()
+        for bird_y, velocity, pipe_x, pipe_height, score, power_ups, pipe_gap in scenes:
+            renderer.begin(day)
+            if bands is not None:
+                bands.scroll(4.5)
+                for rect in bands.draw(screen, 0.5):
+                    mark(rect, restore=False)
+            rotated = pygame.transform.rotate(bird, -velocity * 2)
+            mark(screen.blit(rotated, rotated.get_rect(center=(bird_x, int(bird_y)))))
+            mark(pygame.draw.rect(screen, (0, 255, 0), (pipe_x, 0, pipe_width, pipe_height)))
+            mark(pygame.draw.rect(screen, (0, 255, 0), (pipe_x, pipe_height + pipe_gap, pipe_width, HEIGHT - pipe_height - pipe_gap)))
+            renderer.present()
+        elapsed = time.perf_counter() - start
+        print(f"parallax[{label:>14}]: {elapsed / frames * 1e6:7.1f} us/frame, "
+              f"{renderer.pixels_updated / frames:,.0f} px/frame presented "
+              f"({renderer.partial_frames} of {frames} frames partial)")
+    pygame.quit()
+
+
+def bench_async(seconds=2.0):
+    # Frame pacing of a 60 FPS coroutine loop (tick_async plus ~3 ms of
+    # simulation and drawing per frame) with no I/O, with heavy I/O as
+    # background tasks (a fsync'd 4 MB write every 10 frames, a save every
+    # frame, a score upload to a local server every 30), and with the same
+    # I/O done inline in the frame
+    import asyncio
+    import shutil
+    import tempfile
+    import pygame
+    from background_io import BackgroundTasks, ScoreUploader
+    from frame_clock import FixedStepClock
+    from save_data import SaveStore
+    from score_server import ScoreServer
+
+    blob = os.urandom(4 << 20)
+
+    def write_blob(path):
+        with open(path, "wb") as f:
+            f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def run(mode, tmp):
+        server = ScoreServer(os.path.join(tmp, "scores.json"))
+        port = await server.start(port=0)
+        tasks = BackgroundTasks()
+        tasks.start()
+        uploader = ScoreUploader(port=port)
+        store = SaveStore(os.path.join(tmp, "game_data.txt"), debounce=0.05, tasks=tasks)
+        clock = FixedStepClock(60, 60)
+        state = flappy_sim.SimState()
+        flappy_sim.reset(state, 1)
+        surface = pygame.Surface((400, 600))
+        start = time.perf_counter()
+        frame = 0
+        while time.perf_counter() - start < seconds:
+            await clock.tick_async()
+            work = time.perf_counter()
+            while time.perf_counter() - work < 0.003:
+                if flappy_sim.step(state, state.bird_y > state.pipe_height + 150) & flappy_sim.EVENT_DEATH:
+                    flappy_sim.reset(state, frame)
+                surface.fill((frame % 256, 0, 0))
+            if mode != "idle":
+                store.update(coins=frame)
+                path = os.path.join(tmp, f"blob{frame % 3}.bin")
+                if mode == "inline":
+                    store._write()
+                    if frame % 10 == 0:
+                        write_blob(path)
+                else:
+                    store.flush()
+                    if frame % 10 == 0:
+                        tasks.submit(write_blob, path)
+                if frame % 30 == 0:
+                    if mode == "inline":
+                        await uploader._upload({"score": frame})
+                    else:
+                        uploader.submit({"score": frame})
+            frame += 1
+        await uploader.drain()
+        await tasks.drain()
+        store.close()
+        await server.close()
+        return clock.stats(), tasks.stats(), uploader.stats()
+
+    for mode in ("idle", "background", "inline"):
+        tmp = tempfile.mkdtemp()
+        try:
+            pacing, jobs, uploads = asyncio.run(run(mode, tmp))
+        finally:
+            shutil.rmtree(tmp)
+        print(f"async[{mode:>10}]: {pacing['fps']:4.1f} FPS, jitter {pacing['jitter_ms']:5.2f} ms, "
+              f"max frame {pacing['max_frame_ms']:6.2f} ms, {pacing['dropped_frames']} dropped frames, "
+              f"{jobs['completed']} background jobs (max {jobs['max_job_ms']:.1f} ms), "
+              f"{uploads['sent']} uploads")
+
+
+def bench_voice(seconds=60.0, recordings=4):
+    # Onset detection on synthetic recordings (claps and "up"s over room
+    # noise, with slow swells that must not trigger) fed through the voice
+    # input thread: hits, false triggers per minute, and latency from the
+    # sound's start to the jump being posted, for each detector and with
+    # the keyword matcher keeping only claps
+    import shutil
+    import tempfile
+    import voice_input
+
+    tmp = tempfile.mkdtemp()
+    try:
+        paths = [os.path.join(tmp, f"test{seed}.wav") for seed in range(recordings)]
+        for seed, path in enumerate(paths):
+            voice_input.synthesize(path, seconds, seed)
+        claps = os.path.join(tmp, "claps.wav")
+        voice_input.synthesize(claps, 20.0, 100, kinds=("clap",))
+        for name, method, matcher in (("energy", "energy", None), ("flux", "flux", None),
+                                      ("claps only", "energy", voice_input.KeywordMatcher.from_wavs([claps]))):
+            results = [voice_input.evaluate(path, detector=voice_input.OnsetDetector(method), matcher=matcher)
+                       for path in paths]
+            hits = sum(r["hits"] for r in results)
+            events = sum(r["events"] for r in results)
+            false = sum(r["false_triggers"] for r in results)
+            mean = sum(r["mean_latency_ms"] * r["hits"] for r in results) / hits if hits else 0.0
+            print(f"voice[{name:>10}]: {hits}/{events} onsets, {false / (seconds * recordings) * 60:.2f} false "
+                  f"triggers/min, latency {mean:.1f} ms mean / {max(r['max_latency_ms'] for r in results):.1f} ms max, "
+                  f"{max(r['mean_frame_us'] for r in results):.0f} us/frame analysis")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def bench_history(runs=1000000, queries=200):
+    # Insert throughput through the writer thread (time spent in record()
+    # by the game, and until every row is committed), then query latency
+    # on the full table: leaderboards, a per-day leaderboard, percentiles
+    # from the score histogram, daily summaries, and a percentile by
+    # counting the runs table for comparison
+    import shutil
+    import tempfile
+    from run_history import RunHistory
+
+    rng = random.Random(1)
+    now = time.time()
+    rows = [(rng.choice(("import_pygame", "flappy pygame 2")), min(int(rng.expovariate(1 / 12)), 400),
+             now - rng.random() * 365 * 86400, rng.getrandbits(63)) for _ in range(runs)]
+    tmp = tempfile.mkdtemp()
+    try:
+        history = RunHistory(os.path.join(tmp, "history.db"), batch=4096)
+        start = time.perf_counter()
+        for game, score, started, seed in rows:
+            history.record(game, score, seed=seed, level=score + 1, duration=score * 1.5, cause="pipe",
+                           started=started)
+        queued = time.perf_counter() - start
+        history.close()
+        total = time.perf_counter() - start
+        stats = history.stats()
+        print(f"history[insert]: {runs} runs, record() {queued / runs * 1e6:.2f} us each on the game thread, "
+              f"{runs / total:,.0f} runs/s committed in {stats['batches']} batches "
+              f"({stats['max_batch_ms']:.0f} ms max), {stats['size_mb']:.0f} MB")
+
+        day = time.strftime("%Y-%m-%d", time.localtime(now - 30 * 86400))
+        connection = history._connection()
+        for name, query in (("leaderboard", lambda i: history.leaderboard("import_pygame")),
+                            ("day leaderboard", lambda i: history.leaderboard("import_pygame", day=day)),
+                            ("percentile", lambda i: history.percentile("import_pygame", i % 60)),
+                            ("score at p99", lambda i: history.score_at("import_pygame", 99)),
+                            ("daily summary", lambda i: history.days("import_pygame", 30)),
+                            ("percentile by count", lambda i: connection.execute(
+                                "SELECT count(*) FROM runs WHERE game = ? AND score < ?",
+                                ("import_pygame", i % 60)).fetchone())):
+            count = queries if name != "percentile by count" else max(1, queries // 20)
+            times = []
+            for i in range(count):
+                start = time.perf_counter()
+                query(i)
+                times.append((time.perf_counter() - start) * 1000)
+            times.sort()
+            print(f"history[{name:>19}]: {times[len(times) // 2]:7.3f} ms p50 / {times[-1]:7.3f} ms max")
+        history.close()
+    finally:
+        shutil.rmtree(tmp)
+
+
+def bench_achievements(rules=500, frames=36000):
+    # Ten minutes of play against ``rules`` achievements on score, coins,
+    # purchases, boss kills, power-ups and time of day: re-checking every
+    # locked rule each frame (the old update_achievements()) vs telling the
+    # engine about stat changes
+    from achievement_rules import AchievementEngine, Rule
+
+    rng = random.Random(1)
+    stats = ("score", "coins", "purchases", "boss_kills", "power_ups")
+    ruleset = []
+    for i in range(rules):
+        conditions = [(rng.choice(stats), ">=", rng.randint(1, 400))]
+        if i % 4 == 0:
+            conditions.append(("is_day", "==", bool(i % 8)))
+        ruleset.append(Rule(f"rule {i}", "", conditions))
+
+    def play(report):
+        values = dict.fromkeys(stats, 0)
+        values["is_day"] = True
+        report(**values)
+        for frame in range(frames):
+            changed = {}
+            if frame % 90 == 0:
+                changed["score"] = values["score"] + 1
+                changed["coins"] = values["coins"] + 1
+            if frame % 1800 == 0:
+                changed["is_day"] = not values["is_day"]
+            if frame % 3000 == 0:
+                changed["boss_kills"] = values["boss_kills"] + 1
+                changed["power_ups"] = values["power_ups"] + 1
+                changed["purchases"] = values["purchases"] + 1
+            values.update(changed)
+            report(frame=frame, **changed)
+
+    locked = list(ruleset)
+    polled = {}
+    def poll(frame=None, **changed):
+        # Every frame: every rule still locked against the current stats
+        polled.update(changed)
+        for rule in list(locked):
+            if rule.met(polled):
+                locked.remove(rule)
+    start = time.perf_counter()
+    play(poll)
+    elapsed = time.perf_counter() - start
+    print(f"achievements[  per-frame]: {elapsed / frames * 1e6:7.2f} us/frame, {rules - len(locked)} unlocked")
+
+    engine = AchievementEngine(ruleset)
+    def report(frame=None, **changed):
+        if changed:
+            engine.set(**changed)
+    start = time.perf_counter()
+    play(report)
+    elapsed = time.perf_counter() - start
+    stats = engine.stats()
+    print(f"achievements[event-driven]: {elapsed / frames * 1e6:7.2f} us/frame, {stats['unlocked']} unlocked, "
+          f"{stats['evaluations']} rule checks for {stats['changes']} stat changes")
+
+
+def bench_netplay(seconds=5.0, counts=(1, 2, 4, 8, 16, 32), links=((0.0, 0.0), (0.05, 0.05), (0.05, 0.3)),
+                  jitter=0.02):
+    # A race server on localhost with 1-32 bot clients (all in this process)
+    # over links that drop some of the packets each way and delay them by
+    # (loss, latency) plus up to ``jitter`` seconds: server tick time,
+    # snapshot bandwidth per client, and client corrections.  The last link
+    # is slower than the server waits for inputs.
+    import asyncio
+    from netplay import LinkSimulator, NetClient, NetServer
+
+    async def run(count, loss, latency):
+        server = NetServer(seed=1, countdown=30, link=LinkSimulator(loss, latency, jitter, seed=0))
+        port = await server.start(port=0)
+        clients = [NetClient(link=LinkSimulator(loss, latency, jitter, seed=i + 1)) for i in range(count)]
+        for client in clients:
+            await client.connect("127.0.0.1", port)
+        loop = asyncio.get_running_loop()
+        due = loop.time()
+        end = due + seconds
+        while loop.time() < end:
+            for client in clients:
+                sim = client.sim
+                client.step(sim.bird_y > sim.pipe_height + 150)
+                client.flush()
+            due += 1 / 60
+            await asyncio.sleep(max(0.0, due - loop.time()))
+        stats = server.stats()
+        for client in clients:
+            client.close()
+        server.close()
+        return stats, [client.stats() for client in clients]
+
+    for count in counts:
+        for loss, latency in links:
+            stats, clients = asyncio.run(run(count, loss, latency))
+            corrections = sum(client["corrections"] for client in clients) / count
+            print(f"netplay[{count:2} players, {loss:3.0%} loss, {latency * 1000:3.0f} ms]: "
+                  f"tick {stats['mean_tick_ms']:.3f} ms mean / {stats['max_tick_ms']:.3f} ms max, "
+                  f"{stats['out_bytes_per_client'] / 1024:5.1f} KB/s out / {stats['in_bytes_per_client'] / 1024:.1f} "
+                  f"KB/s in per client, deltas {stats['delta_ratio']:.0%} of full, "
+                  f"{corrections:.1f} corrections and {stats['forced_frames'] / count:.1f} forced frames per client")
+
+
+BENCHMARKS = {
+    "sim": bench_sim,
+    "batch": bench_batch,
+    "render": bench_render,
+    "text": bench_text,
+    "rotate": bench_rotate,
+    "assets": bench_assets,
+    "save": bench_save,
+    "startup": bench_startup,
+    "audio": bench_audio,
+    "particles": bench_particles,
+    "entities": bench_entities,
+    "collision": bench_collision,
+    "replay": bench_replay,
+    "pacing": bench_pacing,
+    "profiler": bench_profiler,
+    "scenarios": bench_scenarios,
+    "course": bench_course,
+    "autopilot": bench_autopilot,
+    "evolve": bench_evolve,
+    "parallax": bench_parallax,
+    "async": bench_async,
+    "voice": bench_voice,
+    "history": bench_history,
+    "achievements": bench_achievements,
+    "netplay": bench_netplay,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
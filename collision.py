@@ -0,0 +1,157 @@
+"""Broad-phase index and pixel-mask narrow phase for collisions.
+
+``SweepIndex`` is a sort-and-sweep broad phase: obstacle boxes are kept
+sorted by their left edge, and a query binary-searches the slice whose left
+edges could reach the query box, so its cost grows with the number of
+nearby obstacles rather than with all of them.  ``candidates`` counts what
+the broad phase handed on, for tuning.
+
+Boxes that scroll together never change order, so an index of them is not
+re-sorted per frame: ``scroll()`` moves them all by changing one shared
+offset, ``insert()`` appends a box spawned on the right (or places one
+elsewhere with a binary search) and ``remove()`` drops boxes culled off the
+left by moving the start of the live slice.  ``build()`` sorts a whole set
+at once.
+
+``MaskCache`` holds one ``pygame.mask.Mask`` per sprite surface, built the
+first time it is asked for.  Together with ``RotationCache`` that is one mask
+per rotation bucket.  A sprite drawn cropped (a pipe showing the top of a
+tall image) gets a mask per crop size, cut from the sprite's mask.
+"""
+import numpy as np
+import pygame
+
+
+class SweepIndex:
+    def __init__(self):
+        # The boxes live in slots _start:_end of growable buffers (handle,
+        # left, right, top, bottom), so appending on the right and culling
+        # on the left are cheap; ``handles``, ``left``... are views of them.
+        self._buffers = None
+        self._start = 0
+        self._end = 0
+        self.max_width = 0.0  # At least the widest box indexed
+        self.offset = 0.0  # Shared scroll, added to every stored left and right edge
+
+        # Stats
+        self.queries = 0
+        self.candidates = 0
+        self.hits = 0
+
+        self.clear()
+
+    def _store(self, columns):
+        # Replace the contents with ``columns`` (sorted), with room to grow
+        count = len(columns[0])
+        capacity = max(16, count * 2)
+        self._buffers = [np.zeros(capacity, dtype=np.intp)] + [np.zeros(capacity) for _ in range(4)]
+        for buffer, column in zip(self._buffers, columns):
+            buffer[:count] = column
+        self._start, self._end = 0, count
+        self._views()
+        self.max_width = float((self.right - self.left).max()) if count else 0.0
+
+    def _views(self):
+        start, end = self._start, self._end
+        self.handles, self.left, self.right, self.top, self.bottom = (buffer[start:end] for buffer in self._buffers)
+
+    def build(self, handles, left, top, width, height):
+        # Sizes may be scalars shared by every box
+        left = np.asarray(left, dtype=float)
+        width, top, height = (np.broadcast_to(np.asarray(a, dtype=float), left.shape) for a in (width, top, height))
+        order = np.argsort(left, kind="stable")
+        self.offset = 0.0
+        self._store([np.asarray(handles)[order], left[order], left[order] + width[order], top[order],
+                     top[order] + height[order]])
+
+    def build_from(self, store, kind=None):
+        # Index the live entities (of one kind) of an EntityStore
+        handles = store.handles(kind)
+        self.build(handles, store.x[handles], store.y[handles], store.w[handles], store.h[handles])
+
+    def clear(self):
+        self.build(np.zeros(0, dtype=np.intp), np.zeros(0), 0, 0, 0)
+
+    def insert(self, handle, left, top, width, height):
+        # Add one box where its left edge keeps the order.  A box spawned
+        # at the right of the others (the usual case) is appended.
+        left -= self.offset
+        row = (handle, left, left + width, top, top + height)
+        self.max_width = max(self.max_width, float(width))
+        if self._end > self._start and left < self.left[-1]:
+            i = np.searchsorted(self.left, left, side="right")
+            self._store([np.insert(column, i, value) for column, value in
+                         zip((self.handles, self.left, self.right, self.top, self.bottom), row)])
+            return
+        if self._end == len(self._buffers[0]):
+            self._store([self.handles, self.left, self.right, self.top, self.bottom])
+        for buffer, value in zip(self._buffers, row):
+            buffer[self._end] = value
+        self._end += 1
+        self._views()
+
+    def remove(self, handles):
+        # Drop the boxes of ``handles``.  Boxes culled off the left (the
+        # usual case) are the first ones, and are dropped without a copy.
+        handles = np.asarray(handles)
+        count = len(handles)
+        if count <= len(self.handles) and np.isin(self.handles[:count], handles).all():
+            self._start += count
+            self._views()
+        else:
+            keep = ~np.isin(self.handles, handles)
+            self._store([column[keep] for column in (self.handles, self.left, self.right, self.top, self.bottom)])
+
+    def scroll(self, dx):
+        # Move every box dx to the right
+        self.offset += dx
+
+    def query(self, left, top, width, height):
+        # Handles whose box overlaps the query box
+        left -= self.offset
+        start = np.searchsorted(self.left, left - self.max_width, side="right")
+        end = np.searchsorted(self.left, left + width, side="left")
+        self.queries += 1
+        self.candidates += int(end - start)
+        if end <= start:
+            return self.handles[:0]
+        hit = ((self.right[start:end] > left) &
+               (self.top[start:end] < top + height) & (self.bottom[start:end] > top))
+        found = self.handles[start:end][hit]
+        self.hits += int(found.size)
+        return found
+
+    def stats(self):
+        return {"queries": self.queries, "candidates": self.candidates, "hits": self.hits,
+                "candidates_per_query": self.candidates / self.queries if self.queries else 0.0}
+
+
+class MaskCache:
+    def __init__(self):
+        self._masks = {}  # id(surface) -> (surface, mask); the surface is kept alive
+        self._crops = {}  # (id(surface), w, h) -> mask of the surface's top-left w x h
+
+    def mask(self, surface):
+        entry = self._masks.get(id(surface))
+        if entry is None:
+            entry = (surface, pygame.mask.from_surface(surface))
+            self._masks[id(surface)] = entry
+        return entry[1]
+
+    def crop_mask(self, surface, width, height):
+        # Mask of the top-left width x height of ``surface``, as drawn with
+        # the source area (0, 0, width, height)
+        key = (id(surface), max(int(width), 0), max(int(height), 0))
+        mask = self._crops.get(key)
+        if mask is None:
+            mask = pygame.mask.Mask(key[1:])
+            mask.draw(self.mask(surface), (0, 0))
+            self._crops[key] = mask
+        return mask
+
+
+def masks_overlap(mask_a, pos_a, mask_b, pos_b):
+    # Pixel-accurate test of two masks drawn with top-left corners at pos_a
+    # and pos_b.
+    offset = (int(pos_b[0]) - int(pos_a[0]), int(pos_b[1]) - int(pos_a[1]))
+    return mask_a.overlap(mask_b, offset) is not None
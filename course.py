@@ -0,0 +1,177 @@
+"""Seeded, streamed course generation.
+
+A course is the run of pipes a game will meet: each pipe's height and gap
+and the power-up placed after it, if any.  Pipe ``n`` is a pure function of
+the seed and ``n``: its random draws are a splitmix64 hash of (seed, n, draw),
+computed with NumPy for many pipes at once by ``generate_many()``.  So a
+pipe comes out the same wherever and whenever it is generated, in either
+game, in flappy_sim, in a batch env or when a replay is checked.
+
+Pipes are generated ``chunk_size`` at a time into a ring buffer that
+``prefetch()`` tops up by one chunk once fewer than ``lookahead`` pipes are
+left ahead.  A chunk takes tens of microseconds, so no frame waits on
+generation.
+
+How hard a course gets is data rather than code: a preset maps a progress
+measure (the score in import_pygame.py, the level in flappy pygame 2.py) to
+pipe speed, gap, height range and power-up chance through ``Curve``s.
+"""
+from bisect import bisect_right
+from collections import deque
+
+import numpy as np
+
+_MASK = (1 << 64) - 1
+# Random draws per pipe, in hash slot order.  Pipe n uses slots n * _DRAWS
+# onwards; the stride leaves spare slots so a draw can be added later
+# without changing the pipes of existing seeds (and replays).
+_DRAWN = ("height", "power_up_roll", "power_up_kind", "power_up_offset", "power_up_y")
+_DRAWS = 8
+_U64 = [np.uint64(c) for c in (0x9E3779B97F4A7C15, 0xBF58476D1CE4E5B9, 0x94D049BB133111EB, 30, 27, 31, 11, _DRAWS)]
+_SLOTS = np.arange(len(_DRAWN), dtype=np.uint64)
+
+
+class Curve:
+    # Breakpoints (progress, value).  The value holds until the next
+    # breakpoint, or with ``linear`` ramps towards it; past the last
+    # breakpoint it holds.
+    def __init__(self, points, linear=False):
+        self.xs = [x for x, _ in points]
+        self.ys = [y for _, y in points]
+        self.linear = linear
+        self._xs = np.asarray(self.xs, dtype=float)
+        self._ys = np.asarray(self.ys, dtype=float)
+
+    def __call__(self, progress):
+        i = bisect_right(self.xs, progress) - 1
+        if i < 0:
+            return self.ys[0]
+        if not self.linear or i + 1 == len(self.xs):
+            return self.ys[i]
+        x0, x1, y0, y1 = self.xs[i], self.xs[i + 1], self.ys[i], self.ys[i + 1]
+        return (y1 - y0) / (x1 - x0) * (progress - x0) + y0  # Same rounding as np.interp
+
+    def many(self, progress):
+        # The curve over an array of progress values
+        if self.linear:
+            return np.interp(progress, self._xs, self._ys)
+        if len(self._xs) == 1:
+            return np.full(np.shape(progress), self._ys[0])
+        return self._ys[np.maximum(np.searchsorted(self._xs, progress, side="right") - 1, 0)]
+
+
+# import_pygame.py: one pipe speed step every 5 points, from 3 up to 10
+CLASSIC = {
+    "pipe_speed": Curve([(0, 3), (5, 4), (10, 4.5), (15, 5), (20, 5.5), (25, 6), (30, 6.5), (35, 7),
+                         (40, 7.5), (45, 8), (50, 8.5), (55, 9), (60, 9.5), (65, 10)]),
+    "pipe_gap": Curve([(0, 200)]),
+    "pipe_height_min": Curve([(0, 100)]),  # Top half, inclusive range
+    "pipe_height_max": Curve([(0, 400)]),
+    "power_up_chance": Curve([(0, 0.75)]),  # Per pipe
+    "power_up_kinds": 2,  # Immunity, slow motion
+    "power_up_offset": (75, 300),  # Distance behind the pipe
+    "power_up_height": (50, 550),
+    "boss_every": 0,
+    "boss_health": Curve([(0, 100)]),
+}
+
+# flappy pygame 2.py: speed 3 + level / 2, a boss every fifth level
+LEVELS = {
+    "pipe_speed": Curve([(0, 3), (100, 53)], linear=True),
+    "pipe_gap": Curve([(0, 200)]),
+    "pipe_height_min": Curve([(0, 100)]),
+    "pipe_height_max": Curve([(0, 400)]),
+    "power_up_chance": Curve([(0, 0.0)]),
+    "power_up_kinds": 2,
+    "power_up_offset": (75, 300),
+    "power_up_height": (50, 550),
+    "boss_every": 5,
+    "boss_health": Curve([(0, 100)]),
+}
+
+
+def _mix_many(x):
+    golden, mul1, mul2, s30, s27, s31 = _U64[:6]
+    x = x + golden
+    x = (x ^ (x >> s30)) * mul1
+    x = (x ^ (x >> s27)) * mul2
+    return x ^ (x >> s31)
+
+
+def generate_many(preset, seeds, n):
+    # Pipes n of the courses for ``seeds`` (arrays of equal length).  Returns
+    # arrays of height, gap, power-up kind index (-1 for none), distance
+    # behind the pipe and height of the power-up.  uint64 arrays wrap on
+    # overflow, as the hash wants.
+    key = _mix_many(np.asarray(seeds).astype(np.uint64))
+    n = np.asarray(n, dtype=np.int64)
+    slots = (n.astype(np.uint64) * _U64[7])[:, None] + _SLOTS
+    unit = (_mix_many(key[:, None] ^ slots) >> _U64[6]) * 2.0 ** -53
+    unit = unit.T
+
+    def pick(u, low, high):
+        return (low + np.floor(u * (high - low + 1))).astype(np.int64)
+
+    height = pick(unit[0], preset["pipe_height_min"].many(n).astype(np.int64),
+                  preset["pipe_height_max"].many(n).astype(np.int64))
+    gap = preset["pipe_gap"].many(n)
+    kind = np.where(unit[1] < preset["power_up_chance"].many(n), pick(unit[2], 0, preset["power_up_kinds"] - 1), -1)
+    offset = pick(unit[3], *preset["power_up_offset"])
+    y = pick(unit[4], *preset["power_up_height"])
+    return height, gap, kind, offset, y
+
+
+class Course:
+    def __init__(self, seed=0, preset=CLASSIC, chunk_size=16, lookahead=8):
+        self.preset = preset
+        self.chunk_size = chunk_size
+        self.lookahead = lookahead
+        self._speed = preset["pipe_speed"]
+
+        # Stats
+        self.chunks_generated = 0
+
+        self.reset(seed)
+
+    def reset(self, seed):
+        self.seed = seed
+        self._chunks = deque()  # Chunks _first, _first + 1, ...
+        self._first = 0
+
+    def _generate(self, chunk):
+        self.chunks_generated += 1
+        size = self.chunk_size
+        n = np.arange(chunk * size, (chunk + 1) * size)
+        columns = generate_many(self.preset, np.full(size, self.seed & _MASK, dtype=np.uint64), n)
+        return [(height, gap, None if kind < 0 else (kind, offset, y))
+                for height, gap, kind, offset, y in zip(*(column.tolist() for column in columns))]
+
+    def pipe(self, n):
+        # (height, gap, power_up) of pipe n; power_up is None or
+        # (kind index, x offset, y)
+        chunk, i = divmod(n, self.chunk_size)
+        if chunk < self._first:
+            return self._generate(chunk)[i]  # Behind the buffer; rare
+        while chunk > self._first and self._chunks:
+            self._chunks.popleft()
+            self._first += 1
+        if not self._chunks:
+            self._first = chunk
+        while len(self._chunks) <= chunk - self._first:
+            self._chunks.append(self._generate(self._first + len(self._chunks)))
+        return self._chunks[chunk - self._first][i]
+
+    def prefetch(self, n):
+        # With pipe n in play, generate the next chunk if fewer than
+        # ``lookahead`` pipes are buffered past it
+        end = (self._first + len(self._chunks)) * self.chunk_size
+        if end - n <= self.lookahead:
+            self._chunks.append(self._generate(self._first + len(self._chunks)))
+
+    def speed(self, progress):
+        return self._speed(progress)
+
+    def boss_health(self, level):
+        # Health of the boss wave at this level, 0 if there is none
+        every = self.preset["boss_every"]
+        return self.preset["boss_health"](level) if every and level % every == 0 else 0
@@ -0,0 +1,67 @@
+"""Dirty-rectangle presentation for the gameplay screen.
+
+Instead of blitting the whole background and flipping the whole display
+every frame, only the regions drawn last frame are restored from the cached
+background and only those plus this frame's regions are pushed with
+``pygame.display.update(rects)``.  A background swap (day/night), a screen
+change, or ``invalidate()`` falls back to one full blit and flip.
+
+Regions the caller redraws in full every frame (a scrolling band) are
+marked with ``restore=False``: they are presented but never restored from
+the background, which they would only be drawn over again.
+"""
+import pygame
+
+
+class DirtyRenderer:
+    def __init__(self, screen, enabled=True):
+        self.screen = screen
+        self.enabled = enabled
+        self.background = None
+        self._previous = []  # Regions drawn last frame, still on screen
+        self._current = []
+        self._redrawn = []  # Presented this frame, not restored next frame
+        self._full = True
+
+        # Stats
+        self.full_frames = 0
+        self.partial_frames = 0
+        self.pixels_updated = 0
+
+    def invalidate(self):
+        self._full = True
+
+    def begin(self, background):
+        # Clear the frame: the whole background after an invalidation,
+        # otherwise just what was drawn over it last frame.
+        if background is not self.background:
+            self.background = background
+            self._full = True
+        if self._full or not self.enabled:
+            self.screen.blit(background, (0, 0))
+        else:
+            for rect in self._previous:
+                self.screen.blit(background, rect, rect)
+        self._current = []
+        self._redrawn = []
+
+    def mark(self, rect, restore=True):
+        # Record a region drawn this frame; pass through the Rect returned by
+        # Surface.blit or pygame.draw.*.
+        (self._current if restore else self._redrawn).append(rect)
+        return rect
+
+    def present(self):
+        if self._full or not self.enabled:
+            pygame.display.flip()
+            self._full = False
+            self.full_frames += 1
+            self.pixels_updated += self.screen.get_width() * self.screen.get_height()
+        else:
+            dirty = self._previous + self._current + self._redrawn
+            pygame.display.update(dirty)
+            self.partial_frames += 1
+            self.pixels_updated += sum(rect.w * rect.h for rect in dirty)
+        self._previous = self._current
+        self._current = []
+        self._redrawn = []
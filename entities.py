@@ -0,0 +1,123 @@
+"""Array-backed entity storage for pipes, pickups, clouds and bosses.
+
+Each component (position, velocity, size, kind, a free integer ``data``
+slot) is one NumPy array indexed by entity handle.  Handles stay valid for
+an entity's whole life: despawned slots go on a free list and are reused,
+and the arrays double when they run out.  The systems (``move``, ``cull``,
+``overlapping``) run over every slot at once with an ``alive`` mask, so
+their cost barely depends on how many entities are on screen.
+"""
+import numpy as np
+
+# Entity kinds
+PIPE = 1
+POWER_UP = 2
+CLOUD = 3
+BOSS = 4
+
+
+class EntityStore:
+    def __init__(self, capacity=64):
+        self.capacity = 0
+        self.count = 0
+        self._free = []
+        self.alive = np.zeros(0, dtype=bool)
+        self.kind = np.zeros(0, dtype=np.int8)
+        self.x = np.zeros(0)
+        self.y = np.zeros(0)
+        self.vx = np.zeros(0)
+        self.vy = np.zeros(0)
+        self.w = np.zeros(0)
+        self.h = np.zeros(0)
+        self.data = np.zeros(0, dtype=np.int32)
+        self._grow(capacity)
+
+    def _grow(self, capacity):
+        old = self.capacity
+        for name in ("alive", "kind", "x", "y", "vx", "vy", "w", "h", "data"):
+            array = getattr(self, name)
+            grown = np.zeros(capacity, dtype=array.dtype)
+            grown[:old] = array
+            setattr(self, name, grown)
+        # Hand out low handles first
+        self._free.extend(range(capacity - 1, old - 1, -1))
+        self.capacity = capacity
+
+    def spawn(self, kind, x, y, w, h, vx=0.0, vy=0.0, data=0):
+        if not self._free:
+            self._grow(self.capacity * 2)
+        handle = self._free.pop()
+        self.alive[handle] = True
+        self.kind[handle] = kind
+        self.x[handle] = x
+        self.y[handle] = y
+        self.vx[handle] = vx
+        self.vy[handle] = vy
+        self.w[handle] = w
+        self.h[handle] = h
+        self.data[handle] = data
+        self.count += 1
+        return handle
+
+    def spawn_many(self, kind, x, y, w, h, vx=0.0, vy=0.0, data=0):
+        # Vectorised spawn; the position arguments are arrays of equal length.
+        count = len(x)
+        while len(self._free) < count:
+            self._grow(self.capacity * 2)
+        handles = np.array(self._free[-count:][::-1], dtype=np.intp)
+        del self._free[-count:]
+        self.alive[handles] = True
+        self.kind[handles] = kind
+        self.x[handles] = x
+        self.y[handles] = y
+        self.vx[handles] = vx
+        self.vy[handles] = vy
+        self.w[handles] = w
+        self.h[handles] = h
+        self.data[handles] = data
+        self.count += count
+        return handles
+
+    def despawn(self, handle):
+        if self.alive[handle]:
+            self.alive[handle] = False
+            self._free.append(int(handle))
+            self.count -= 1
+
+    def handles(self, kind=None):
+        # Live handles, optionally of one kind, in slot order
+        if kind is None:
+            return np.flatnonzero(self.alive)
+        return np.flatnonzero(self.alive & (self.kind == kind))
+
+    def move(self, scale=1.0, kind=None):
+        # Advance live entities by their velocity (times ``scale``).
+        moving = self.alive if kind is None else self.alive & (self.kind == kind)
+        self.x += np.where(moving, self.vx * scale, 0.0)
+        self.y += np.where(moving, self.vy * scale, 0.0)
+
+    def cull(self, left=0.0, kind=None):
+        # Despawn entities whose right edge is left of ``left``; returns the
+        # handles removed.
+        gone = self.alive & (self.x + self.w < left)
+        if kind is not None:
+            gone &= self.kind == kind
+        handles = np.flatnonzero(gone)
+        if handles.size:
+            self.alive[handles] = False
+            self._free.extend(handles.tolist())
+            self.count -= handles.size
+        return handles
+
+    def overlapping(self, left, top, width, height, kind=None):
+        # Handles of live entities whose box overlaps the given rectangle
+        hit = (self.alive & (self.x < left + width) & (self.x + self.w > left) &
+               (self.y < top + height) & (self.y + self.h > top))
+        if kind is not None:
+            hit &= self.kind == kind
+        return np.flatnonzero(hit)
+
+    def clear(self):
+        self.alive[:] = False
+        self.count = 0
+        self._free = list(range(self.capacity - 1, -1, -1))
@@ -0,0 +1,218 @@
+"""Neuro-evolution of bot policies on the game rules.
+
+A genome is the weights of a small fixed network: ``FEATURES`` inputs seen
+from the bird, one tanh hidden layer, and a jump output.  Each generation
+every genome plays the same ``episodes`` courses in a flappy_vec batch, so
+the rules (gravity, jump strength, pipe gaps, power-ups) are exactly the
+game's, and the whole population's networks run as one batched matrix
+product per step.  The population is split into one slice per process of a
+pool kept for the whole run; slices are independent games, so a generation
+takes about 1 / cores of the serial time once slices are large.
+
+Parents are picked by tournament, children are uniform crossovers with
+Gaussian mutation, and the best ``elite`` genomes carry over unchanged.
+Fitness is the mean number of steps survived, capped at ``max_steps``.
+
+The trainer state (population, fitness, generation, generator state) is
+checkpointed to one .npz file, and a run resumes from it.  From the command
+line:
+
+    python evolve.py train 100                  # 100 generations
+    python evolve.py train 50 --resume          # 50 more from the checkpoint
+    python evolve.py watch                      # best genome in the game window
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+import flappy_vec
+from flappy_sim import WIDTH, HEIGHT, PowerUp
+
+CHECKPOINT = "evolve_checkpoint.npz"
+
+# Network inputs, all roughly in [-1, 1]
+FEATURES = ("above_gap_top", "above_gap_bottom", "velocity", "pipe_x", "pipe_speed", "immune", "slow_motion")
+HIDDEN = 8
+GENOME_SIZE = len(FEATURES) * HIDDEN + HIDDEN + HIDDEN + 1
+
+_IMMUNITY = PowerUp.IMMUNITY.value
+_SLOW_MOTION = PowerUp.SLOW_MOTION.value
+
+
+def features(bird_y, bird_velocity, pipe_x, pipe_height, pipe_gap, pipe_speed, power_up):
+    # (..., len(FEATURES)) network inputs from per-bird arrays or scalars
+    return np.stack(np.broadcast_arrays(
+        (bird_y - pipe_height) / HEIGHT, (pipe_height + pipe_gap - bird_y) / HEIGHT, bird_velocity / 10.0,
+        pipe_x / WIDTH, pipe_speed / 10.0, power_up == _IMMUNITY, power_up == _SLOW_MOTION), axis=-1).astype(float)
+
+
+def forward(genomes, inputs):
+    # Jump decisions for a batch of genomes (P, GENOME_SIZE) on inputs
+    # (P, E, len(FEATURES)); returns (P, E) booleans
+    f = len(FEATURES)
+    w1 = genomes[:, :f * HIDDEN].reshape(-1, f, HIDDEN)
+    b1 = genomes[:, f * HIDDEN:f * HIDDEN + HIDDEN]
+    w2 = genomes[:, f * HIDDEN + HIDDEN:-1]
+    b2 = genomes[:, -1]
+    hidden = np.tanh(np.einsum("pef,pfh->peh", inputs, w1) + b1[:, None, :])
+    return np.einsum("peh,ph->pe", hidden, w2) + b2[:, None] > 0
+
+
+def evaluate(genomes, seeds, max_steps=3000):
+    # Mean steps survived and mean score per genome, each playing every
+    # course in ``seeds`` once
+    genomes = np.asarray(genomes)
+    p, e = len(genomes), len(seeds)
+    env = flappy_vec.BatchEnv(p * e)
+    env.reset(seeds=np.tile(seeds, p))
+    steps = np.zeros(p * e, dtype=np.int64)
+    scores = np.zeros(p * e, dtype=np.int64)
+    playing = np.ones(p * e, dtype=bool)
+    for _ in range(max_steps):
+        inputs = features(env.bird_y, env.bird_velocity, env.pipe_x, env.pipe_height, env.pipe_gap,
+                          env.pipe_speed, env.power_up)
+        actions = forward(genomes, inputs.reshape(p, e, -1)).ravel()
+        _, _, dones, final_scores = env.step(actions)
+        steps += playing
+        scores = np.where(playing & dones, final_scores, scores)
+        playing &= ~dones
+        if not playing.any():
+            break
+    scores = np.where(playing, env.score, scores)  # Still alive at the cap
+    return steps.reshape(p, e).mean(axis=1), scores.reshape(p, e).mean(axis=1)
+
+
+def _evaluate(args):
+    return evaluate(*args)
+
+
+class Policy:
+    # One genome driving a flappy_sim state; has the Planner's decide()
+    def __init__(self, genome):
+        self.genome = np.asarray(genome, dtype=float)[None]
+
+    def decide(self, state):
+        inputs = features(state.bird_y, state.bird_velocity, state.pipe_x, state.pipe_height, state.pipe_gap,
+                          state.pipe_speed, state.current_power_up.value)
+        return bool(forward(self.genome, inputs[None, None])[0, 0])
+
+
+class Trainer:
+    def __init__(self, population=128, episodes=4, elite=8, tournament=4, mutation_rate=0.1,
+                 mutation_scale=0.3, max_steps=3000, seed=None, processes=None):
+        self.population = population
+        self.episodes = episodes
+        self.elite = elite
+        self.tournament = tournament
+        self.mutation_rate = mutation_rate
+        self.mutation_scale = mutation_scale
+        self.max_steps = max_steps
+        self.processes = processes or os.cpu_count()
+        self.rng = np.random.default_rng(seed)
+        self.genomes = self.rng.normal(0.0, 1.0, (population, GENOME_SIZE))
+        self.fitness = np.zeros(population)
+        self.generation = 0
+        self.best = self.genomes[0].copy()
+        self.best_fitness = 0.0
+        self.history = []  # (generation, best, mean, best score, seconds) per generation
+        self._pool = None
+
+    def evaluate(self, seeds):
+        # Fitness and mean score of the whole population across the pool,
+        # one contiguous slice of genomes per process
+        slices = np.array_split(self.genomes, min(self.processes, self.population))
+        jobs = [(genomes, seeds, self.max_steps) for genomes in slices]
+        if self.processes == 1:
+            results = [_evaluate(job) for job in jobs]
+        else:
+            if self._pool is None:
+                self._pool = Pool(self.processes)
+            results = self._pool.map(_evaluate, jobs)
+        return np.concatenate([r[0] for r in results]), np.concatenate([r[1] for r in results])
+
+    def _select(self, count):
+        # Tournament winners' indices
+        entrants = self.rng.integers(0, self.population, (count, self.tournament))
+        return entrants[np.arange(count), self.fitness[entrants].argmax(axis=1)]
+
+    def _breed(self):
+        order = np.argsort(-self.fitness)
+        children = self.population - self.elite
+        a = self.genomes[self._select(children)]
+        b = self.genomes[self._select(children)]
+        child = np.where(self.rng.random(a.shape) < 0.5, a, b)
+        mutate = self.rng.random(child.shape) < self.mutation_rate
+        child += mutate * self.rng.normal(0.0, self.mutation_scale, child.shape)
+        self.genomes = np.concatenate([self.genomes[order[:self.elite]], child])
+
+    def step(self):
+        # Evaluate the current generation, then breed the next one
+        start = time.perf_counter()
+        seeds = self.rng.integers(0, 2 ** 63 - 1, self.episodes)
+        self.fitness, scores = self.evaluate(seeds)
+        top = int(self.fitness.argmax())
+        if self.fitness[top] >= self.best_fitness:
+            self.best, self.best_fitness = self.genomes[top].copy(), float(self.fitness[top])
+        record = (self.generation, float(self.fitness[top]), float(self.fitness.mean()), float(scores[top]),
+                  time.perf_counter() - start)
+        self.history.append(record)
+        self._breed()
+        self.generation += 1
+        return record
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def save(self, path=CHECKPOINT):
+        np.savez_compressed(path, genomes=self.genomes, fitness=self.fitness, generation=self.generation,
+                            best=self.best, best_fitness=self.best_fitness, history=np.array(self.history),
+                            rng=json.dumps(self.rng.bit_generator.state))
+        return path
+
+    def load(self, path=CHECKPOINT):
+        with np.load(path) as data:
+            if data["genomes"].shape[1] != GENOME_SIZE:
+                raise ValueError("checkpoint is for a different network")
+            self.genomes = data["genomes"]
+            self.population = len(self.genomes)
+            self.fitness = data["fitness"]
+            self.generation = int(data["generation"])
+            self.best = data["best"]
+            self.best_fitness = float(data["best_fitness"])
+            self.history = [tuple(row) for row in data["history"].tolist()]
+            self.rng.bit_generator.state = json.loads(str(data["rng"]))
+        return self
+
+
+def load_policy(path=CHECKPOINT):
+    with np.load(path) as data:
+        return Policy(data["best"])
+
+
+if __name__ == "__main__":
+    command = sys.argv[1]
+    if command == "train":
+        trainer = Trainer()
+        if "--resume" in sys.argv and os.path.exists(CHECKPOINT):
+            trainer.load()
+        try:
+            for _ in range(int(sys.argv[2])):
+                generation, best, mean, score, seconds = trainer.step()
+                print(f"generation {generation}: best {best:.0f} steps (score {score:.1f}), "
+                      f"mean {mean:.0f}, {seconds:.2f}s")
+                if trainer.generation % 10 == 0:
+                    trainer.save()
+        finally:
+            trainer.close()
+            print(f"checkpoint written to {trainer.save()}")
+    elif command == "watch":
+        path = sys.argv[2] if len(sys.argv) > 2 else CHECKPOINT
+        subprocess.run([sys.executable, "import_pygame.py", "--watch", path])
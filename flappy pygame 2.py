@@ -1,18 +1,53 @@
+import time
+startup_time = time.perf_counter()
+
+import asyncio
 import pygame
 import random
-import os
 from enum import Enum
 from datetime import datetime, timedelta
 
-# Initialize Pygame
-pygame.init()
-pygame.mixer.init()
-
+from achievement_rules import AchievementEngine, Rule, daily_challenge as challenge_rule, daily_target
+from assets import AssetManager
+from audio import SoundBank
+from background_io import BackgroundTasks, ScoreUploader
+from collision import MaskCache, SweepIndex, masks_overlap
+from course import Course, LEVELS
+from entities import EntityStore, PIPE, BOSS
+from frame_clock import FixedStepClock, lerp
+from particles import ParticleSystem
+from profiler import Profiler
+from run_history import RunHistory
+from save_data import SaveStore
+from text_cache import TextCache
+
+# Initialize only what the first frame needs; the mixer comes up in the
+# background with the sounds
+pygame.display.init()
+pygame.font.init()
+
+# Saves, sound decoding and cache writes run beside the frame (on threads,
+# or between frames under pygbag); finished runs go to the score server
+tasks = BackgroundTasks()
+uploader = ScoreUploader()
+
+
+# Frame pacing: the simulation steps STEP_RATE times a second (its speeds
+# are per step, tuned for 60) while frames are drawn at RENDER_FPS, 0 for
+# uncapped, or at the display's refresh rate with VSYNC
+STEP_RATE = 60
+RENDER_FPS = 60
+VSYNC = False
+
+# Main loop phase timings: F3 toggles them and their overlay, F12 exports
+# profile_trace.json (Chrome trace) and profile.csv
+PROFILE = False
+profiler = Profiler(enabled=PROFILE)
 
 # Set up the game window
 WIDTH = 400
 HEIGHT = 600
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
+screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.SCALED if VSYNC else 0, vsync=int(VSYNC))
 pygame.display.set_caption("Flappy Bird")
 
 # Colors
@@ -30,6 +65,7 @@ class GameState(Enum):
     GAME_OVER = 2
     SHOP = 3
     ACHIEVEMENTS = 4
+    LEADERBOARD = 5
 
 # Power-up types
 class PowerUp(Enum):
@@ -42,23 +78,26 @@ bird_x = 50
 bird_y = HEIGHT // 2
 bird_radius = 20
 bird_velocity = 0
+prev_bird_y = bird_y  # One step ago, for interpolated drawing
 gravity = 0.5
 jump_strength = -10
 
 # Pipe properties
 pipe_width = 50
-pipe_gap = 200
-pipe_x = WIDTH
-pipe_height = random.randint(100, 400)
 
 # Boss properties
 boss_width = 100
 boss_height = 100
-boss_x = WIDTH
-boss_y = HEIGHT // 2
-boss_health = 100
 boss_velocity = 2
 
+# Pipes and bosses live in the entity store: each pipe is two entities, its
+# top and bottom halves, and a boss's data is its health
+world = EntityStore()
+
+# Pipe heights and gaps, pipe speed and boss levels come from a seeded course
+course = Course(preset=LEVELS)
+pipe_index = 0  # Course index of the next pipe to spawn
+
 # Score and currency
 score = 0
 high_score = 0
@@ -69,39 +108,58 @@ level = 1
 font = pygame.font.Font(None, 36)
 big_font = pygame.font.Font(None, 72)
 
+# Rendered text, re-rasterised only when a string changes
+text_cache = TextCache()
+
 # Game state
 game_state = GameState.MENU
 
-# Load sounds
-jump_sound = pygame.mixer.Sound("jump.mp3")
-score_sound = pygame.mixer.Sound("score.mp3")
-game_over_sound = pygame.mixer.Sound("game_over.mp3")
-power_up_sound = pygame.mixer.Sound("power_up.mp3")
-boss_hit_sound = pygame.mixer.Sound("boss_hit.mp3")
-
-# Load images
-bg_img = pygame.image.load("background.png")
-bird_img = pygame.image.load("bird.png")
-pipe_img = pygame.image.load("pipe.png")
-boss_img = pygame.image.load("boss.png")
-
-# Scale images
-bg_img = pygame.transform.scale(bg_img, (WIDTH, HEIGHT))
-bird_img = pygame.transform.scale(bird_img, (bird_radius * 2, bird_radius * 2))
-pipe_img = pygame.transform.scale(pipe_img, (pipe_width, HEIGHT))
-boss_img = pygame.transform.scale(boss_img, (boss_width, boss_height))
+# Load sounds (decoded in the background, cached as PCM on disk)
+sounds = SoundBank()
+jump_sound = sounds.sound("jump.mp3", "player", max_voices=2)
+score_sound = sounds.sound("score.mp3", "ui")
+game_over_sound = sounds.sound("game_over.mp3", "ui")
+power_up_sound = sounds.sound("power_up.mp3", "ui")
+boss_hit_sound = sounds.sound("boss_hit.mp3", "boss", steal=False)  # Overlap fires every frame
+sounds.start(tasks)
+
+# Load and scale images (converted to the display format, cached on disk)
+assets = AssetManager(tasks=tasks)
+bg_img = assets.image("background.png", (WIDTH, HEIGHT), alpha=False)
+bird_img = assets.image("bird.png", (bird_radius * 2, bird_radius * 2))
+pipe_img = assets.image("pipe.png", (pipe_width, HEIGHT))
+boss_img = assets.image("boss.png", (boss_width, boss_height))
+
+# Pack the small sprites into one atlas
+sprites = assets.pack({"bird": bird_img, "boss": boss_img})
+bird_img = sprites["bird"]
+boss_img = sprites["boss"]
+
+# Pixel masks for collisions, and the broad phase over pipes and bosses:
+# one index each, since all pipes scroll together and so do all bosses,
+# kept sorted as they spawn, move and leave
+masks = MaskCache()
+pipe_boxes = SweepIndex()
+boss_boxes = SweepIndex()
 
 # Particle system
-particles = []
-
-# Achievements
-achievements = {
-    "Beginner": {"description": "Score 10 points", "achieved": False},
-    "Intermediate": {"description": "Score 50 points", "achieved": False},
-    "Expert": {"description": "Score 100 points", "achieved": False},
-    "Boss Slayer": {"description": "Defeat a boss", "achieved": False},
-    "Shopaholic": {"description": "Buy all items from the shop", "achieved": False}
-}
+particles = ParticleSystem()
+
+# Achievements: rules on stats the game reports to the engine when they
+# change; unlocks mark the table below, save and show a banner.  The daily
+# challenge is a rule in the same engine.
+achievement_rules = [
+    Rule("Beginner", "Score 10 points", [("score", ">=", 10)]),
+    Rule("Intermediate", "Score 50 points", [("score", ">=", 50)]),
+    Rule("Expert", "Score 100 points", [("score", ">=", 100)]),
+    Rule("Boss Slayer", "Defeat a boss", [("boss_kills", ">=", 1)]),
+]
+achievement_engine = AchievementEngine(achievement_rules)
+achievements = {rule.name: {"description": rule.description, "achieved": False} for rule in achievement_rules}
+# This game's shop has nothing to buy, so Shopaholic has no rule; it stays
+# listed (and locked) as before
+achievements["Shopaholic"] = {"description": "Buy all items from the shop", "achieved": False}
+unlock_banner = None  # (text surface, time to hide it)
 
 # Daily challenge
 daily_challenge = {
@@ -111,121 +169,157 @@ daily_challenge = {
     "date": None
 }
 
+def spawn_pipe():
+    global pipe_index
+    pipe_height, pipe_gap, _ = course.pipe(pipe_index)
+    vx = -course.speed(level)
+    top = world.spawn(PIPE, WIDTH, 0, pipe_width, pipe_height, vx=vx)
+    bottom = world.spawn(PIPE, WIDTH, pipe_height + pipe_gap, pipe_width, HEIGHT - pipe_height - pipe_gap, vx=vx)
+    for pipe in (top, bottom):
+        pipe_boxes.insert(pipe, world.x[pipe], world.y[pipe], world.w[pipe], world.h[pipe])
+    course.prefetch(pipe_index)
+    pipe_index += 1
+
+def spawn_boss():
+    boss = world.spawn(BOSS, WIDTH, HEIGHT // 2, boss_width, boss_height, vx=-boss_velocity,
+                       data=course.preset["boss_health"](level))
+    boss_boxes.insert(boss, world.x[boss], world.y[boss], boss_width, boss_height)
+    return boss
+
 def reset_game():
-    global bird_y, bird_velocity, pipe_x, pipe_height, score, game_state, level, boss_health, boss_x, boss_y
-    bird_y = HEIGHT // 2
+    global bird_y, prev_bird_y, bird_velocity, score, game_state, level, pipe_index, run_started, boss_kills
+    bird_y = prev_bird_y = HEIGHT // 2
     bird_velocity = 0
-    pipe_x = WIDTH
-    pipe_height = random.randint(100, 400)
+    world.clear()
+    pipe_boxes.clear()
+    boss_boxes.clear()
+    course.reset(random.getrandbits(63))
+    pipe_index = 0
+    spawn_pipe()
+    spawn_boss()
     score = 0
     game_state = GameState.PLAYING
     level = 1
-    boss_health = 100
-    boss_x = WIDTH
-    boss_y = HEIGHT // 2
-
-def save_game_data():
-    global high_score, coins, achievements, daily_challenge
-    with open("game_data.txt", "w") as f:
-        f.write(f"{high_score},{coins}\n")
-        for achievement, data in achievements.items():
-            f.write(f"{achievement},{data['achieved']}\n")
-        f.write(f"{daily_challenge['completed']},{daily_challenge['date']}\n")
+    run_started = time.time()
+    boss_kills = 0
+    achievement_engine.set(score=0, boss_kills=0, power_ups=0)
+
+# Saves are written in the background, debounced unless immediate
+save_store = SaveStore("game_data.txt", tasks=tasks)
+
+# Every finished run goes into the run history database; the leaderboard
+# screen reads it when opened
+history = RunHistory()
+run_started = 0.0
+boss_kills = 0
+leaderboard = {}
+
+def load_leaderboard():
+    leaderboard["best"] = history.leaderboard("flappy pygame 2", limit=8)
+    leaderboard["latest_day"] = (history.days("flappy pygame 2", limit=1) or [None])[0]
+    leaderboard["percentile"] = history.percentile("flappy pygame 2", score)
+
+def save_game_data(immediate=False):
+    with profiler.phase("save_game_data"):
+        save_store.update(high_score=high_score, coins=coins,
+                          achievements={achievement: data['achieved'] for achievement, data in achievements.items()},
+                          daily_challenge={"description": daily_challenge['description'],
+                                           "target": daily_challenge['target'],
+                                           "completed": daily_challenge['completed'],
+                                           "date": daily_challenge['date'].isoformat() if daily_challenge['date'] else None})
+        save_store.flush(immediate)
 
 def load_game_data():
     global high_score, coins, achievements, daily_challenge
-    if os.path.exists("game_data.txt"):
-        try:
-            with open("game_data.txt", "r") as f:
-                data = f.readlines()
-                if len(data) >= 1:
-                    high_score, coins = map(int, data[0].strip().split(','))
-                for i, (achievement, _) in enumerate(achievements.items()):
-                    if i + 1 < len(data):
-                        achievement_data = data[i+1].strip().split(',')
-                        if len(achievement_data) > 1:
-                            achievements[achievement]['achieved'] = achievement_data[1] == 'True'
-                if len(data) > len(achievements) + 1:
-                    daily_challenge_data = data[-1].strip().split(',')
-                    if len(daily_challenge_data) > 1:
-                        daily_challenge['completed'] = daily_challenge_data[0] == 'True'
-                        daily_challenge['date'] = datetime.strptime(daily_challenge_data[1], "%Y-%m-%d").date() if daily_challenge_data[1] != 'None' else None
-        except Exception as e:
-            print(f"Error loading game data: {e}")
-            print("Starting with default values.")
-            high_score = 0
-            coins = 0
-            for achievement in achievements:
-                achievements[achievement]['achieved'] = False
-            daily_challenge['completed'] = False
-            daily_challenge['date'] = None
-    else:
-        print("No save file found. Starting with default values.")
-        high_score = 0
-        coins = 0
-        for achievement in achievements:
-            achievements[achievement]['achieved'] = False
-        daily_challenge['completed'] = False
-        daily_challenge['date'] = None
+    data = save_store.load()
+    high_score = data["high_score"]
+    coins = data["coins"]
+    for achievement in achievements:
+        achievements[achievement]['achieved'] = data["achievements"].get(achievement, False)
+    achievement_engine.restore([name for name, data in achievements.items() if data['achieved']])
+    saved_challenge = data["daily_challenge"] or {}
+    daily_challenge['description'] = saved_challenge.get('description', daily_challenge['description'])
+    daily_challenge['target'] = saved_challenge.get('target', daily_challenge['target'])
+    daily_challenge['completed'] = saved_challenge.get('completed', False)
+    date = saved_challenge.get('date')
+    daily_challenge['date'] = datetime.strptime(date, "%Y-%m-%d").date() if date else None
 
         
-def update_achievements():
-    global achievements
-    if score >= 10:
-        achievements["Beginner"]["achieved"] = True
-    if score >= 50:
-        achievements["Intermediate"]["achieved"] = True
-    if score >= 100:
-        achievements["Expert"]["achieved"] = True
+def on_unlock(rule):
+    global coins, unlock_banner
+    if rule.kind == "challenge":
+        daily_challenge['completed'] = True
+        coins += rule.reward
+        text = f"Daily challenge done! +{rule.reward}"
+    else:
+        achievements[rule.name]['achieved'] = True
+        text = f"Achievement: {rule.name}"
+    unlock_banner = (text_cache.render(font, text, True, YELLOW), time.perf_counter() + 2.0)
+    save_game_data(immediate=True)
+
+achievement_engine.subscribe(on_unlock)
 
 def check_daily_challenge():
-    global daily_challenge
     today = datetime.now().date()
     if daily_challenge['date'] != today:
-        daily_challenge['description'] = f"Score {random.randint(10, 50)} points without using power-ups"
-        daily_challenge['target'] = int(daily_challenge['description'].split()[1])
+        daily_challenge['target'] = daily_target(today)
         daily_challenge['completed'] = False
         daily_challenge['date'] = today
+    challenge = challenge_rule(daily_challenge['target'])
+    daily_challenge['description'] = challenge.description
+    if not daily_challenge['completed']:
+        achievement_engine.add(challenge)
 
 def draw_menu():
     screen.blit(bg_img, (0, 0))
-    title = big_font.render("Flappy Bird", True, WHITE)
-    start = font.render("Press SPACE to Start", True, WHITE)
-    shop = font.render("Press S for Shop", True, WHITE)
-    achievements = font.render("Press A for Achievements", True, WHITE)
+    title = text_cache.render(big_font, "Flappy Bird", True, WHITE)
+    start = text_cache.render(font, "Press SPACE to Start", True, WHITE)
+    shop = text_cache.render(font, "Press S for Shop", True, WHITE)
+    achievements = text_cache.render(font, "Press A for Achievements", True, WHITE)
     screen.blit(title, (WIDTH // 2 - title.get_width() // 2, HEIGHT // 4))
     screen.blit(start, (WIDTH // 2 - start.get_width() // 2, HEIGHT // 2))
     screen.blit(shop, (WIDTH // 2 - shop.get_width() // 2, HEIGHT * 3 // 4 - 30))
     screen.blit(achievements, (WIDTH // 2 - achievements.get_width() // 2, HEIGHT * 3 // 4 + 30))
+    leaderboard_text = text_cache.render(font, "Press L for Leaderboard", True, WHITE)
+    screen.blit(leaderboard_text, (WIDTH // 2 - leaderboard_text.get_width() // 2, HEIGHT * 3 // 4 + 70))
 
 def draw_game():
+    # Moving things are drawn part way between their last two steps
+    behind = 1 - clock.alpha  # Steps back from the current positions
     screen.blit(bg_img, (0, 0))
-    screen.blit(bird_img, (bird_x - bird_radius, bird_y - bird_radius))
-    screen.blit(pipe_img, (pipe_x, 0), (0, 0, pipe_width, pipe_height))
-    screen.blit(pipe_img, (pipe_x, pipe_height + pipe_gap), (0, 0, pipe_width, HEIGHT - pipe_height - pipe_gap))
+    screen.blit(bird_img, (bird_x - bird_radius, lerp(prev_bird_y, bird_y, clock.alpha) - bird_radius))
+    pipes = world.handles(PIPE)
+    pipe_xs = world.x[pipes] - world.vx[pipes] * behind
+    for pipe_x, pipe_y, pipe_h in zip(pipe_xs.tolist(), world.y[pipes].tolist(), world.h[pipes].tolist()):
+        screen.blit(pipe_img, (pipe_x, pipe_y), (0, 0, pipe_width, pipe_h))
     
-    if level % 5 == 0:  # Boss level
-        screen.blit(boss_img, (boss_x, boss_y))
-        pygame.draw.rect(screen, RED, (boss_x, boss_y - 20, boss_width * (boss_health / 100), 10))
-
-    score_text = font.render(f"Score: {score}", True, WHITE)
-    level_text = font.render(f"Level: {level}", True, WHITE)
-    coins_text = font.render(f"Coins: {coins}", True, YELLOW)
+    if course.boss_health(level):  # Boss level
+        bosses = world.handles(BOSS)
+        boss_xs = world.x[bosses] - world.vx[bosses] * behind
+        for boss_x, boss_y, boss_health in zip(boss_xs.tolist(), world.y[bosses].tolist(), world.data[bosses].tolist()):
+            screen.blit(boss_img, (boss_x, boss_y))
+            pygame.draw.rect(screen, RED, (boss_x, boss_y - 20, boss_width * (boss_health / 100), 10))
+
+    score_text = text_cache.render(font, f"Score: {score}", True, WHITE)
+    level_text = text_cache.render(font, f"Level: {level}", True, WHITE)
+    coins_text = text_cache.render(font, f"Coins: {coins}", True, YELLOW)
     screen.blit(score_text, (10, 10))
     screen.blit(level_text, (10, 50))
     screen.blit(coins_text, (10, 90))
 
     # Draw particles
-    for particle in particles:
-        pygame.draw.circle(screen, particle[3], (int(particle[0]), int(particle[1])), int(particle[2]))
+    particles.draw(screen)
+
+    if unlock_banner and time.perf_counter() < unlock_banner[1]:
+        screen.blit(unlock_banner[0], (WIDTH // 2 - unlock_banner[0].get_width() // 2, 140))
 
 def draw_game_over():
     screen.blit(bg_img, (0, 0))
-    game_over_text = big_font.render("Game Over", True, WHITE)
-    final_score = font.render(f"Score: {score}", True, WHITE)
-    high_score_text = font.render(f"High Score: {high_score}", True, WHITE)
-    restart_text = font.render("Press SPACE to restart", True, WHITE)
-    menu_text = font.render("Press M for Menu", True, WHITE)
+    game_over_text = text_cache.render(big_font, "Game Over", True, WHITE)
+    final_score = text_cache.render(font, f"Score: {score}", True, WHITE)
+    high_score_text = text_cache.render(font, f"High Score: {high_score}", True, WHITE)
+    restart_text = text_cache.render(font, "Press SPACE to restart", True, WHITE)
+    menu_text = text_cache.render(font, "Press M for Menu", True, WHITE)
     screen.blit(game_over_text, (WIDTH // 2 - game_over_text.get_width() // 2, HEIGHT // 4))
     screen.blit(final_score, (WIDTH // 2 - final_score.get_width() // 2, HEIGHT // 2 - 30))
     screen.blit(high_score_text, (WIDTH // 2 - high_score_text.get_width() // 2, HEIGHT // 2 + 30))
@@ -234,124 +328,203 @@ def draw_game_over():
 
 def draw_achievements():
     screen.blit(bg_img, (0, 0))
-    title = big_font.render("Achievements", True, WHITE)
+    title = text_cache.render(big_font, "Achievements", True, WHITE)
     screen.blit(title, (WIDTH // 2 - title.get_width() // 2, 20))
 
     for i, (achievement, data) in enumerate(achievements.items()):
         color = GREEN if data['achieved'] else RED
-        text = font.render(f"{achievement}: {data['description']}", True, color)
+        text = text_cache.render(font, f"{achievement}: {data['description']}", True, color)
         screen.blit(text, (20, 100 + i * 40))
 
-    back_text = font.render("Press B to go back", True, WHITE)
+    back_text = text_cache.render(font, "Press B to go back", True, WHITE)
     screen.blit(back_text, (WIDTH // 2 - back_text.get_width() // 2, HEIGHT - 50))
 
-def create_particle(x, y, color):
-    particles.append([x, y, 5, color, 0.5])  # x, y, size, color, shrink_rate
+def draw_leaderboard():
+    screen.blit(bg_img, (0, 0))
+    title = text_cache.render(big_font, "Leaderboard", True, WHITE)
+    screen.blit(title, (WIDTH // 2 - title.get_width() // 2, 20))
+
+    for i, run in enumerate(leaderboard["best"]):
+        text = text_cache.render(font, f"{i + 1}. {run['score']}  level {run['level']}  {run['day']}", True,
+                                 YELLOW if i == 0 else WHITE)
+        screen.blit(text, (20, 100 + i * 36))
+
+    day = leaderboard["latest_day"]
+    if day:
+        text = text_cache.render(font, f"{day['day']}: {day['runs']} runs, best {day['best']}", True, GREEN)
+        screen.blit(text, (20, HEIGHT - 140))
+        text = text_cache.render(font, f"Last score beat {leaderboard['percentile']:.0f}% of runs", True, GREEN)
+        screen.blit(text, (20, HEIGHT - 105))
+
+    back_text = text_cache.render(font, "Press B to go back", True, WHITE)
+    screen.blit(back_text, (WIDTH // 2 - back_text.get_width() // 2, HEIGHT - 50))
 
-def update_particles():
-    for particle in particles:
-        particle[0] += random.uniform(-1, 1)
-        particle[1] += random.uniform(-1, 1)
-        particle[2] -= particle[4]
-        if particle[2] <= 0:
-            particles.remove(particle)
+def create_particles(x, y, color, count, spread):
+    particles.emit(x, y, color, count, spread, size=5, shrink=0.5)
 
-# Game loop
-clock = pygame.time.Clock()
+# Game loop: a coroutine, so it runs under pygbag as well as on the desktop
+clock = FixedStepClock(STEP_RATE, RENDER_FPS)
 running = True
 
 load_game_data()
 check_daily_challenge()
 
-while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_SPACE:
-                if game_state == GameState.MENU:
-                    reset_game()
-                elif game_state == GameState.PLAYING:
-                    bird_velocity = jump_strength
-                    jump_sound.play()
-                    create_particle(bird_x, bird_y, BLUE)
-                elif game_state == GameState.GAME_OVER:
-                    game_state = GameState.MENU
-            elif event.key == pygame.K_s and game_state == GameState.MENU:
-                game_state = GameState.SHOP
-            elif event.key == pygame.K_a and game_state == GameState.MENU:
-                game_state = GameState.ACHIEVEMENTS
-            elif event.key == pygame.K_b and (game_state == GameState.SHOP or game_state == GameState.ACHIEVEMENTS):
-                game_state = GameState.MENU
-            elif event.key == pygame.K_m and game_state == GameState.GAME_OVER:
-                game_state = GameState.MENU
-
-    if game_state == GameState.PLAYING:
-        # Update bird position
-        bird_velocity += gravity
-        bird_y += bird_velocity
-
-        # Move pipe
-        pipe_x -= 3 + level * 0.5  # Increase speed with level
-
-        if pipe_x < -pipe_width:
-            pipe_x = WIDTH
-            pipe_height = random.randint(100, 400)
-            score += 1
-            coins += 1
-            level += 1
-            score_sound.play()
-
-        # Boss logic
-        if level % 5 == 0:  # Boss level
-            boss_x -= boss_velocity
-            if boss_x < -boss_width:
-                boss_x = WIDTH
-                boss_health = 100
-
-            # Boss collision
-            if (bird_x + bird_radius > boss_x and bird_x - bird_radius < boss_x + boss_width and
-                bird_y + bird_radius > boss_y and bird_y - bird_radius < boss_y + boss_height):
-                boss_health -= 10
-                boss_hit_sound.play()
-                create_particle(bird_x, bird_y, RED)
-                if boss_health <= 0:
-                    coins += 50
-                    achievements["Boss Slayer"]["achieved"] = True
-
-        # Check for collisions
-        if (bird_y < 0 or bird_y > HEIGHT or
-            (pipe_x < bird_x + bird_radius < pipe_x + pipe_width and
-             (bird_y < pipe_height or bird_y > pipe_height + pipe_gap))):
-            game_state = GameState.GAME_OVER
-            game_over_sound.play()
-            if score > high_score:
-                high_score = score
-            save_game_data()
-
-        update_achievements()
-        update_particles()
-
-        # Check daily challenge
-        if not daily_challenge['completed'] and score >= daily_challenge['target']:
-            daily_challenge['completed'] = True
-            coins += 100  # Reward for completing daily challenge
-
-    # Draw the appropriate screen based on game state
-    if game_state == GameState.MENU:
-        draw_menu()
-    elif game_state == GameState.PLAYING:
-        draw_game()
-    elif game_state == GameState.GAME_OVER:
-        draw_game_over()
-    elif game_state == GameState.ACHIEVEMENTS:
-        draw_achievements()
-
-    # Update display
-    pygame.display.flip()
-
-    # Cap the frame rate
-    clock.tick(60)
-
-save_game_data()
-pygame.quit()
\ No newline at end of file
+async def main():
+    global running, game_state, bird_y, bird_velocity, prev_bird_y, score, high_score, coins, level, startup_time, \
+        boss_kills
+    tasks.start()
+    while running:
+        with profiler.phase("clock.tick"):
+            steps = await clock.tick_async()
+        with profiler.phase("events"):
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_SPACE:
+                        if game_state == GameState.MENU:
+                            reset_game()
+                        elif game_state == GameState.PLAYING:
+                            bird_velocity = jump_strength
+                            jump_sound.play()
+                            create_particles(bird_x, bird_y, BLUE, 8, 6)
+                        elif game_state == GameState.GAME_OVER:
+                            game_state = GameState.MENU
+                    elif event.key == pygame.K_s and game_state == GameState.MENU:
+                        game_state = GameState.SHOP
+                    elif event.key == pygame.K_a and game_state == GameState.MENU:
+                        game_state = GameState.ACHIEVEMENTS
+                    elif event.key == pygame.K_l and game_state == GameState.MENU:
+                        load_leaderboard()
+                        game_state = GameState.LEADERBOARD
+                    elif event.key == pygame.K_b and game_state in (GameState.SHOP, GameState.ACHIEVEMENTS,
+                                                                   GameState.LEADERBOARD):
+                        game_state = GameState.MENU
+                    elif event.key == pygame.K_m and game_state == GameState.GAME_OVER:
+                        game_state = GameState.MENU
+                    elif event.key == pygame.K_F3:
+                        profiler.toggle()
+                    elif event.key == pygame.K_F12:
+                        print(f"Profile written to {profiler.export_trace()} and {profiler.export_csv()}")
+
+        if game_state == GameState.PLAYING:
+            # Run the simulation steps owed since the last frame
+            for _ in range(steps):
+                with profiler.phase("simulation"):
+                    # Update bird position
+                    prev_bird_y = bird_y
+                    bird_velocity += gravity
+                    bird_y += bird_velocity
+
+                    # Move pipes
+                    pipe_speed = course.speed(level)  # Increase speed with level
+                    world.vx[world.handles(PIPE)] = -pipe_speed
+                    world.move(kind=PIPE)
+                    pipe_boxes.scroll(-pipe_speed)
+
+                    gone = world.cull(kind=PIPE)
+                    if gone.size:
+                        pipe_boxes.remove(gone)
+                    for _ in range(len(gone) // 2):  # Both halves leave together
+                        spawn_pipe()
+                        score += 1
+                        achievement_engine.set(score=score)
+                        coins += 1
+                        level += 1
+                        score_sound.play()
+
+                    # Boss logic
+                    if course.boss_health(level):  # Boss level
+                        world.move(kind=BOSS)
+                        boss_boxes.scroll(-boss_velocity)
+                        gone = world.cull(kind=BOSS)
+                        if gone.size:
+                            boss_boxes.remove(gone)
+                        for _ in gone:
+                            spawn_boss()
+
+                with profiler.phase("collision"):
+                    # Broad phase: pipes and bosses whose boxes overlap the bird's
+                    bird_pos = (bird_x - bird_radius, bird_y - bird_radius)
+                    bird_mask = masks.mask(bird_img)
+
+                    if course.boss_health(level):  # Boss level
+                        # Boss collision
+                        for boss in boss_boxes.query(bird_pos[0], bird_pos[1], bird_radius * 2, bird_radius * 2):
+                            if not masks_overlap(bird_mask, bird_pos, masks.mask(boss_img),
+                                                 (world.x[boss], world.y[boss])):
+                                continue
+                            world.data[boss] -= 10
+                            boss_hit_sound.play()
+                            create_particles(bird_x, bird_y, RED, 16, 10)
+                            if world.data[boss] <= 0 < world.data[boss] + 10:  # Just killed
+                                boss_kills += 1
+                                achievement_engine.set(boss_kills=boss_kills)
+                            if world.data[boss] <= 0:
+                                coins += 50
+
+                    # Check for collisions: pixel masks against the pipe halves,
+                    # each the part of pipe_img it is drawn with
+                    hit_pipe = False
+                    for pipe in pipe_boxes.query(bird_pos[0], bird_pos[1], bird_radius * 2, bird_radius * 2):
+                        if masks_overlap(bird_mask, bird_pos, masks.crop_mask(pipe_img, pipe_width, int(world.h[pipe])),
+                                         (world.x[pipe], world.y[pipe])):
+                            hit_pipe = True
+
+                if bird_y < 0 or bird_y > HEIGHT or hit_pipe:
+                    game_state = GameState.GAME_OVER
+                    game_over_sound.play()
+                    if score > high_score:
+                        high_score = score
+                    save_game_data(immediate=True)
+                    uploader.submit({"game": "flappy pygame 2", "score": score, "level": level, "seed": course.seed,
+                                     "date": datetime.now().isoformat(timespec="seconds")})
+                    history.record("flappy pygame 2", score, seed=course.seed, level=level, boss_kills=boss_kills,
+                                   duration=time.time() - run_started, started=run_started,
+                                   cause="pipe" if hit_pipe else "ceiling" if bird_y < 0 else "ground")
+
+                with profiler.phase("particles"):
+                    particles.update()
+
+                if game_state != GameState.PLAYING:
+                    break
+
+        # Draw the appropriate screen based on game state
+        if game_state == GameState.MENU:
+            with profiler.phase("draw_menu"):
+                draw_menu()
+        elif game_state == GameState.PLAYING:
+            with profiler.phase("draw_game"):
+                draw_game()
+        elif game_state == GameState.GAME_OVER:
+            with profiler.phase("draw_game_over"):
+                draw_game_over()
+        elif game_state == GameState.ACHIEVEMENTS:
+            with profiler.phase("draw_achievements"):
+                draw_achievements()
+        elif game_state == GameState.LEADERBOARD:
+            with profiler.phase("draw_leaderboard"):
+                draw_leaderboard()
+        profiler.draw(screen)
+
+        # Update display
+        with profiler.phase("display.flip"):
+            pygame.display.flip()
+        profiler.end_frame()
+        if startup_time is not None:
+            print(f"Time to first frame: {(time.perf_counter() - startup_time) * 1000:.0f} ms")
+            startup_time = None
+
+    pacing = clock.stats()
+    print(f"Frame pacing: {pacing['fps']:.0f} FPS, {pacing['steps_per_frame']:.2f} steps/frame, "
+          f"jitter {pacing['jitter_ms']:.2f} ms, {pacing['dropped_frames']} dropped frames, "
+          f"{pacing['dropped_steps']} steps dropped")
+    save_game_data(immediate=True)
+    await uploader.drain()
+    await tasks.drain()
+    save_store.close()
+    history.close()
+    pygame.quit()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,192 @@
+"""Headless simulation core for the import_pygame.py rules.
+
+Nothing in here touches pygame, so it runs without a display or mixer and can
+be stepped as fast as Python allows.  The game drives the same ``step()`` once
+per frame; bots and balance sweeps drive it in a tight loop.  Clouds are
+scenery with no effect on play, so the game keeps them itself.
+
+Pipes, their gaps, power-up placements and the speed ramp come from a
+seeded ``course.Course``, so a seed fixes the whole run.
+"""
+import random
+from enum import Enum
+
+from course import Course, CLASSIC
+
+# Playfield
+WIDTH = 400
+HEIGHT = 600
+
+# Game states
+class GameState(Enum):
+    MENU = 0
+    PLAYING = 1
+    GAME_OVER = 2
+    SHOP = 3
+
+# Power-up types
+class PowerUp(Enum):
+    NONE = 0
+    IMMUNITY = 1
+    SLOW_MOTION = 2
+
+# Bird properties
+bird_x = 50
+bird_radius = 20
+gravity = 0.5
+jump_strength = -10
+
+# Pipe properties (heights, gaps and speeds are in the course preset)
+pipe_width = 50
+
+# Power-up properties
+immunity_duration = 300  # 5 seconds at 60 FPS
+slow_motion_duration = 300
+slow_motion_factor = 0.5
+
+# step() result flags
+EVENT_SCORE = 1
+EVENT_POWER_UP = 2
+EVENT_DEATH = 4
+
+_NONE = PowerUp.NONE
+_IMMUNITY = PowerUp.IMMUNITY
+_SLOW_MOTION = PowerUp.SLOW_MOTION
+_POWER_UP_TYPES = [PowerUp.IMMUNITY, PowerUp.SLOW_MOTION]
+_BIRD_HALF = bird_radius  # The bird sprite is bird_radius * 2 square
+
+
+class SimState:
+    __slots__ = (
+        "course", "bird_y", "bird_velocity", "pipe_x", "pipe_height", "pipe_gap",
+        "pipe_index", "score", "pipe_speed", "current_power_up",
+        "power_up_duration", "active_power_ups", "alive", "frame",
+    )
+
+    def __init__(self, seed=None, preset=CLASSIC):
+        self.course = Course(random.getrandbits(63) if seed is None else seed, preset)
+        reset(self)
+
+    @property
+    def seed(self):
+        return self.course.seed
+
+
+def reset(state, seed=None):
+    # A new seed starts a new course; without one the same course is
+    # replayed from its first pipe.
+    if seed is not None:
+        state.course.reset(seed)
+    state.bird_y = HEIGHT // 2
+    state.bird_velocity = 0
+    state.pipe_x = WIDTH
+    state.pipe_index = 0
+    state.score = 0
+    state.pipe_speed = state.course.speed(0)
+    state.current_power_up = _NONE
+    state.power_up_duration = 0
+    state.active_power_ups = []  # [type, x, y]
+    state.alive = True
+    state.frame = 0
+    _next_pipe(state)
+    return state
+
+
+def _next_pipe(state):
+    # Take pipe state.pipe_index from the course, with its power-up
+    course = state.course
+    state.pipe_height, state.pipe_gap, power_up = course.pipe(state.pipe_index)
+    if power_up is not None:
+        kind, offset, y = power_up
+        state.active_power_ups.append([_POWER_UP_TYPES[kind], WIDTH + offset, y])
+    course.prefetch(state.pipe_index)
+
+
+def collides(bird_y, pipe_x, pipe_height, pipe_gap):
+    # Same test as the bird_rect check in import_pygame.py: a bird_radius * 2
+    # square centred on the truncated bird position against the screen
+    # bounds and the pipe gap.
+    top = int(bird_y) - _BIRD_HALF
+    bottom = top + 2 * _BIRD_HALF
+    left = bird_x - _BIRD_HALF
+    return (top < 0 or bottom > HEIGHT or
+            (left + 2 * _BIRD_HALF > pipe_x and left < pipe_x + pipe_width and
+             (top < pipe_height or bottom > pipe_height + pipe_gap)))
+
+
+def death_cause(bird_y):
+    # "ceiling", "ground" or "pipe" for a bird that collides() at bird_y
+    top = int(bird_y) - _BIRD_HALF
+    if top < 0:
+        return "ceiling"
+    if top + 2 * _BIRD_HALF > HEIGHT:
+        return "ground"
+    return "pipe"
+
+
+def step(state, action=False):
+    """Advance one frame.  ``action`` is a jump; returns EVENT_* flags."""
+    if not state.alive:
+        return 0
+    events = 0
+    state.frame += 1
+
+    # Update bird position
+    if action:
+        state.bird_velocity = jump_strength
+    state.bird_velocity += gravity
+    bird_y = state.bird_y + state.bird_velocity
+    state.bird_y = bird_y
+
+    pipe_speed = state.pipe_speed
+
+    # Move and collect power-ups
+    if state.active_power_ups:
+        for power_up in state.active_power_ups[:]:
+            power_up[1] -= pipe_speed
+            if power_up[1] < -30:
+                state.active_power_ups.remove(power_up)
+            elif abs(bird_x - power_up[1]) < 20 and abs(bird_y - power_up[2]) < 20:
+                state.current_power_up = power_up[0]
+                state.power_up_duration = (immunity_duration if power_up[0] is _IMMUNITY
+                                           else slow_motion_duration)
+                state.active_power_ups.remove(power_up)
+                events |= EVENT_POWER_UP
+
+    # Move pipe
+    if state.current_power_up is _SLOW_MOTION:
+        state.pipe_x -= pipe_speed * slow_motion_factor
+    else:
+        state.pipe_x -= pipe_speed
+
+    if state.pipe_x < -pipe_width:
+        state.pipe_x = WIDTH
+        state.pipe_index += 1
+        _next_pipe(state)
+        state.score += 1
+        events |= EVENT_SCORE
+
+        # Difficulty follows the course's speed curve
+        state.pipe_speed = state.course.speed(state.score)
+
+    # Check for collisions
+    if collides(bird_y, state.pipe_x, state.pipe_height, state.pipe_gap) and state.current_power_up is not _IMMUNITY:
+        state.alive = False
+        events |= EVENT_DEATH
+
+    # Update power-up duration
+    if state.current_power_up is not _NONE:
+        state.power_up_duration -= 1
+        if state.power_up_duration <= 0:
+            state.current_power_up = _NONE
+
+    return events
+
+
+def run(state, policy, max_steps=None):
+    # Play until death (or max_steps); ``policy(state)`` returns the action.
+    steps = 0
+    while state.alive and (max_steps is None or steps < max_steps):
+        step(state, policy(state))
+        steps += 1
+    return steps
@@ -0,0 +1,173 @@
+"""NumPy batch environment: N independent flappy_sim games stepped in lockstep.
+
+Every per-bird quantity is a length-N array and each rule is one whole-array
+expression, so the Python overhead of a step is paid once for the batch
+rather than once per bird.  The rules and constants are the ones in
+flappy_sim, and each game's pipes come from its course seed through
+``course.generate_many``, so a game here plays out exactly as flappy_sim
+does with the same seed and inputs.  Episode seeds are drawn from ``seed``.  Clouds are cosmetic and are
+not simulated here.
+"""
+import numpy as np
+
+import flappy_sim
+from course import CLASSIC, generate_many
+from flappy_sim import (WIDTH, HEIGHT, bird_x, bird_radius, gravity, jump_strength,
+                        pipe_width, immunity_duration, slow_motion_duration, slow_motion_factor)
+
+# Power-up codes stored in the int8 arrays (PowerUp.value)
+NONE = flappy_sim.PowerUp.NONE.value
+IMMUNITY = flappy_sim.PowerUp.IMMUNITY.value
+SLOW_MOTION = flappy_sim.PowerUp.SLOW_MOTION.value
+
+# Columns of the observation matrix returned by reset() and step()
+OBS_FIELDS = ("bird_y", "bird_velocity", "pipe_x", "pipe_height",
+              "pipe_speed", "power_up", "power_up_duration")
+
+# Rewards
+SCORE_REWARD = 1.0
+DEATH_REWARD = -1.0
+
+
+def collides(bird_y, pipe_x, pipe_height, pipe_gap):
+    # Vectorised flappy_sim.collides(): the bird_rect against the screen
+    # bounds and the pipe gap.
+    top = np.trunc(bird_y) - bird_radius
+    bottom = top + 2 * bird_radius
+    left = bird_x - bird_radius
+    in_pipe = (left + 2 * bird_radius > pipe_x) & (left < pipe_x + pipe_width)
+    return (top < 0) | (bottom > HEIGHT) | (in_pipe & ((top < pipe_height) | (bottom > pipe_height + pipe_gap)))
+
+
+class BatchEnv:
+    def __init__(self, num_envs, seed=None, max_power_ups=4, preset=CLASSIC):
+        self.num_envs = num_envs
+        self.max_power_ups = max_power_ups
+        self.preset = preset
+        self.rng = np.random.default_rng(seed)
+
+        n = num_envs
+        self.seeds = np.zeros(n, dtype=np.int64)
+        self.bird_y = np.zeros(n)
+        self.bird_velocity = np.zeros(n)
+        self.pipe_x = np.zeros(n)
+        self.pipe_height = np.zeros(n, dtype=np.int32)
+        self.pipe_gap = np.zeros(n)
+        self.pipe_index = np.zeros(n, dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.int32)
+        self.pipe_speed = np.zeros(n)
+        self.power_up = np.zeros(n, dtype=np.int8)
+        self.power_up_duration = np.zeros(n, dtype=np.int32)
+        self.frame = np.zeros(n, dtype=np.int64)
+
+        # Floating power-ups: a fixed number of slots per game; a spawn that
+        # finds every slot taken is dropped.
+        k = max_power_ups
+        self.item_type = np.zeros((n, k), dtype=np.int8)  # NONE marks a free slot
+        self.item_x = np.zeros((n, k))
+        self.item_y = np.zeros((n, k))
+        self.reset()
+
+    def reset(self, mask=None, seeds=None):
+        # Start new episodes where ``mask`` is set, on ``seeds`` or fresh
+        # ones from the env's generator
+        if mask is None:
+            mask = np.ones(self.num_envs, dtype=bool)
+        rows = np.flatnonzero(mask)
+        self.seeds[rows] = self.rng.integers(0, 2 ** 63 - 1, rows.size) if seeds is None else seeds
+        self.bird_y[mask] = HEIGHT // 2
+        self.bird_velocity[mask] = 0
+        self.pipe_x[mask] = WIDTH
+        self.pipe_index[mask] = 0
+        self.score[mask] = 0
+        self.pipe_speed[mask] = self.preset["pipe_speed"](0)
+        self.power_up[mask] = NONE
+        self.power_up_duration[mask] = 0
+        self.frame[mask] = 0
+        self.item_type[mask] = NONE
+        self._next_pipes(rows)
+        return self.observe()
+
+    def _next_pipes(self, rows):
+        # Take the listed games' next pipe, and its power-up into the first
+        # free slot, from their courses
+        height, gap, kind, offset, y = generate_many(self.preset, self.seeds[rows], self.pipe_index[rows])
+        self.pipe_height[rows] = height
+        self.pipe_gap[rows] = gap
+        placed = kind >= 0
+        if placed.any():
+            rows, kind, offset, y = rows[placed], kind[placed], offset[placed], y[placed]
+            free = self.item_type[rows] == NONE
+            room = free.any(axis=1)
+            rows, slots = rows[room], free[room].argmax(axis=1)
+            self.item_type[rows, slots] = IMMUNITY + kind[room]
+            self.item_x[rows, slots] = WIDTH + offset[room]
+            self.item_y[rows, slots] = y[room]
+
+    def observe(self):
+        return np.stack([self.bird_y, self.bird_velocity, self.pipe_x, self.pipe_height,
+                         self.pipe_speed, self.power_up, self.power_up_duration],
+                        axis=1).astype(np.float32)
+
+    def step(self, actions):
+        """Advance every game one frame.
+
+        Returns ``(obs, rewards, dones, final_scores)``.  Games that die are
+        reset before returning, so ``obs`` rows for them are fresh episodes;
+        ``final_scores`` holds the score each finished game ended on (0
+        elsewhere).
+        """
+        actions = np.asarray(actions, dtype=bool)
+        self.frame += 1
+
+        # Update bird position
+        self.bird_velocity[actions] = jump_strength
+        self.bird_velocity += gravity
+        self.bird_y += self.bird_velocity
+
+        # Move and collect power-ups
+        live = self.item_type != NONE
+        if live.any():
+            self.item_x -= self.pipe_speed[:, None]
+            gone = live & (self.item_x < -30)
+            picked = (live & ~gone &
+                      (np.abs(bird_x - self.item_x) < 20) &
+                      (np.abs(self.bird_y[:, None] - self.item_y) < 20))
+            got = picked.any(axis=1)
+            if got.any():
+                rows = np.flatnonzero(got)
+                last = picked.shape[1] - 1 - picked[rows, ::-1].argmax(axis=1)
+                kinds = self.item_type[rows, last]
+                self.power_up[rows] = kinds
+                self.power_up_duration[rows] = np.where(kinds == IMMUNITY, immunity_duration, slow_motion_duration)
+            self.item_type[gone | picked] = NONE
+
+        # Move pipe
+        slow = self.power_up == SLOW_MOTION
+        self.pipe_x -= np.where(slow, self.pipe_speed * slow_motion_factor, self.pipe_speed)
+
+        scored = self.pipe_x < -pipe_width
+        if scored.any():
+            self.pipe_x[scored] = WIDTH
+            self.pipe_index += scored
+            self._next_pipes(np.flatnonzero(scored))
+            self.score += scored
+
+            # Difficulty follows the course's speed curve
+            self.pipe_speed[scored] = self.preset["pipe_speed"].many(self.score[scored])
+
+        # Check for collisions
+        dones = collides(self.bird_y, self.pipe_x, self.pipe_height, self.pipe_gap) & (self.power_up != IMMUNITY)
+
+        # Update power-up duration
+        powered = self.power_up != NONE
+        self.power_up_duration -= powered
+        self.power_up[powered & (self.power_up_duration <= 0)] = NONE
+
+        rewards = np.where(scored, SCORE_REWARD, 0.0)
+        rewards[dones] = DEATH_REWARD
+        final_scores = np.where(dones, self.score, 0)
+
+        if dones.any():
+            return self.reset(dones), rewards, dones, final_scores
+        return self.observe(), rewards, dones, final_scores
@@ -0,0 +1,107 @@
+"""Fixed-timestep game clock.
+
+The simulation advances in whole steps of ``1 / step_rate`` seconds however
+fast frames are drawn.  Each frame, ``tick()`` adds the real time since the
+previous frame to an accumulator and returns how many steps are owed;
+``alpha`` is how far into the next step the frame falls, for drawing moving
+things part way between their last two positions.  After a hitch at most
+``max_steps`` are run and the rest of the backlog is dropped, so a stall
+slows the game for a moment instead of freezing it while it catches up.
+
+``render_fps`` caps the frame rate with pygame's clock; 0 draws as fast as
+the display lets it, which is uncapped, or paced by the display when the
+window was opened with vsync.  ``tick_async()`` is the same for a main loop
+that is a coroutine: it waits out the cap with ``asyncio.sleep`` so
+background tasks (and, under pygbag, the browser) run in the gap, and it
+yields at least once a frame even when uncapped.
+"""
+import asyncio
+import statistics
+import time
+from collections import deque
+
+import pygame
+
+
+def lerp(previous, current, alpha):
+    return previous + (current - previous) * alpha
+
+
+class FixedStepClock:
+    def __init__(self, step_rate=60, render_fps=0, max_steps=5, history=600):
+        self.step_time = 1.0 / step_rate
+        self.render_fps = render_fps
+        self.max_steps = max_steps
+        self.alpha = 0.0
+        self._clock = pygame.time.Clock()
+        self._accumulator = 0.0
+        self._last = None
+        self._frame_times = deque(maxlen=history)  # Seconds, most recent frames
+
+        # Stats
+        self.frames = 0
+        self.steps = 0
+        self.dropped_frames = 0  # Frames that took over 1.5 frame intervals
+        self.capped_frames = 0  # Frames that hit max_steps
+        self.dropped_steps = 0  # Steps skipped by those frames
+
+    def tick(self):
+        # Wait out the render cap, then return the number of steps to run
+        self._clock.tick(self.render_fps)
+        return self._advance(time.perf_counter())
+
+    async def tick_async(self):
+        # tick() for a coroutine main loop.  Sleeps until shortly before the
+        # frame is due (the event loop's timer is only good to a millisecond
+        # or so), then yields until it is.
+        if self.render_fps and self._last is not None:
+            due = self._last + 1.0 / self.render_fps
+            remaining = due - time.perf_counter()
+            if remaining > 0.002:
+                await asyncio.sleep(remaining - 0.002)
+            while time.perf_counter() < due:
+                await asyncio.sleep(0)
+        else:
+            await asyncio.sleep(0)
+        return self._advance(time.perf_counter())
+
+    def _advance(self, now):
+        frame_time = self.step_time if self._last is None else now - self._last
+        self._last = now
+        self._frame_times.append(frame_time)
+        self.frames += 1
+        if frame_time > 1.5 * (1.0 / self.render_fps if self.render_fps else self.step_time):
+            self.dropped_frames += 1
+
+        self._accumulator += frame_time
+        steps = int(self._accumulator / self.step_time)
+        if steps > self.max_steps:
+            self.capped_frames += 1
+            self.dropped_steps += steps - self.max_steps
+            steps = self.max_steps
+            self._accumulator %= self.step_time
+        else:
+            self._accumulator -= steps * self.step_time
+        self.steps += steps
+        self.alpha = self._accumulator / self.step_time
+        return steps
+
+    def reset(self):
+        # Forget time spent away (loading, a paused window) so it is not
+        # counted as a hitch
+        self._last = None
+        self._accumulator = 0.0
+        self.alpha = 0.0
+
+    def stats(self):
+        times = [t * 1000 for t in self._frame_times]
+        mean = statistics.fmean(times) if times else 0.0
+        return {"frames": self.frames, "steps": self.steps,
+                "steps_per_frame": self.steps / self.frames if self.frames else 0.0,
+                "fps": 1000 / mean if mean else 0.0,
+                "frame_ms": mean,
+                "jitter_ms": statistics.pstdev(times) if len(times) > 1 else 0.0,
+                "max_frame_ms": max(times, default=0.0),
+                "dropped_frames": self.dropped_frames,
+                "capped_frames": self.capped_frames,
+                "dropped_steps": self.dropped_steps}
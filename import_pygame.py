@@ -1,23 +1,61 @@
+import time
+startup_time = time.perf_counter()
+
+import asyncio
 import pygame
 import random
-import os
-#import speech_recognition as sr
-from enum import Enum
+import sys
 from datetime import datetime
 
-
-# Initialize Pygame
-pygame.init()
-pygame.mixer.init()
-
-#recognizer = sr.Recognizer()
+import flappy_sim
+import replay
+from assets import AssetManager
+from achievement_rules import AchievementEngine, Rule
+from audio import SoundBank
+from autopilot import Planner
+from background_io import BackgroundTasks, ScoreUploader
+from dirty_render import DirtyRenderer
+from entities import EntityStore, CLOUD
+from frame_clock import FixedStepClock, lerp
+from parallax import Layer, ParallaxBackground, make_strip, shaded
+from profiler import Profiler
+from run_history import RunHistory
+from save_data import SaveStore
+from sprite_cache import RotationCache
+from text_cache import TextCache
+from flappy_sim import GameState, PowerUp, WIDTH, HEIGHT, bird_x, bird_radius, pipe_width
+
+
+# Initialize only what the first frame needs; the mixer comes up in the
+# background with the sounds
+pygame.display.init()
+pygame.font.init()
+
+# Saves, sound decoding and cache writes run beside the frame (on threads,
+# or between frames under pygbag); finished runs go to the score server
+tasks = BackgroundTasks()
+uploader = ScoreUploader()
+
+# Frame pacing: the simulation steps STEP_RATE times a second (its speeds
+# are per step, tuned for 60) while frames are drawn at RENDER_FPS, 0 for
+# uncapped, or at the display's refresh rate with VSYNC
+STEP_RATE = 60
+RENDER_FPS = 60
+VSYNC = False
 
 # Set up the game window
-WIDTH = 400
-HEIGHT = 600
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
+screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.SCALED if VSYNC else 0, vsync=int(VSYNC))
 pygame.display.set_caption("Flappy Bird")
 
+# Main loop phase timings: F3 toggles them and their overlay, F12 exports
+# profile_trace.json (Chrome trace) and profile.csv
+PROFILE = False
+profiler = Profiler(enabled=PROFILE)
+
+# Only redraw and push the regions that changed during gameplay
+DIRTY_RECTS = True
+renderer = DirtyRenderer(screen, enabled=DIRTY_RECTS)
+
 # Colors
 WHITE = (255, 255, 255)
 BLUE = (0, 0, 255)
@@ -26,88 +64,140 @@ BLACK = (0, 0, 0)
 RED = (255, 0, 0)
 YELLOW = (255, 255, 0)
 
-# Game states
-class GameState(Enum):
-    MENU = 0
-    PLAYING = 1
-    GAME_OVER = 2
-    SHOP = 3
-
-# Power-up types 
-class PowerUp(Enum):
-    NONE = 0
-    IMMUNITY = 1
-    SLOW_MOTION = 2
-
-# Game variables
-high_score = 0
-coins = 0
-power_up_spawn_chance = 0.005  # 0.5% chance per frame
-active_power_ups = []
-
-# Bird properties
-bird_x = 50
-bird_y = HEIGHT // 2
-bird_radius = 20
-bird_velocity = 0
-gravity = 0.5
-jump_strength = -10
-
-# Pipe properties
-pipe_width = 50
-pipe_gap = 200
-pipe_x = WIDTH
-pipe_height = random.randint(100, 400)
+# Simulation state (bird, pipe, power-ups, score) on a seeded course
+sim = flappy_sim.SimState()
+prev_bird_y = sim.bird_y  # Positions one step ago, for interpolated drawing
+prev_pipe_x = sim.pipe_x
+
+# Every run is recorded as its seed and inputs into replay.REPLAY_DIR
+recorder = replay.Recorder()
+
+# Demo mode: P hands the bird to the search autopilot, which also starts the
+# next run by itself.  ``--watch CHECKPOINT`` starts in demo mode with the
+# best genome from an evolve.py run flying instead.
+AUTOPILOT = False
+autopilot = Planner()
+if "--watch" in sys.argv:
+    import evolve  # Here, not at the top: it brings multiprocessing and the trainer
+    autopilot = evolve.load_policy(sys.argv[sys.argv.index("--watch") + 1])
+    AUTOPILOT = True
+
+# Voice control: ``--voice`` listens to the microphone (PyAudio) on its own
+# thread and jumps on each clap or word, ``--voice FILE.wav`` plays a
+# recording through the same detector instead; ``--keywords WAV`` only
+# accepts sounds like the ones in an example recording.
+voice = None
+if "--voice" in sys.argv:
+    import voice_input
+    matcher = None
+    if "--keywords" in sys.argv:
+        matcher = voice_input.KeywordMatcher.from_wavs([sys.argv[sys.argv.index("--keywords") + 1]])
+    recording = sys.argv[sys.argv.index("--voice") + 1:][:1]
+    try:
+        if recording and recording[0].endswith(".wav"):
+            source = voice_input.WavSource(recording[0], realtime=True)
+        else:
+            source = voice_input.MicrophoneSource()
+        voice = voice_input.VoiceTrigger(source, matcher=matcher)
+        voice.start()
+    except (RuntimeError, OSError) as e:
+        print(f"Voice input unavailable: {e}")
+
+# Racing: ``--join HOST[:PORT]`` flies each race of a netplay.py server, on
+# its course, with the other players and ghosts drawn translucent
+net = None
+net_race = None  # Race the game last started
+if "--join" in sys.argv:
+    import netplay
+    net_host, net_port = (sys.argv[sys.argv.index("--join") + 1].split(":") + [netplay.PORT])[:2]
+    net = netplay.NetClient(sim)
 
 # Cloud properties
 cloud_width = 80
 cloud_height = 40
-clouds = []
+
+# Scenery entities (clouds)
+world = EntityStore()
 
 # Score and currency
-score = 0
 high_score = 0
 coins = 0
-difficulty = 1
-pipe_speed = 3
-
-# Achievements
-achievements = {
-    "First Flight": {"description": "Score your first point", "achieved": False},
-    "High Flyer": {"description": "Reach a score of 50", "achieved": False},
-    "Night Owl": {"description": "Play during night time", "achieved": False},
-    "Shopaholic": {"description": "Make a purchase from the shop", "achieved": False},
-    "Power Player": {"description": "Use a power-up", "achieved": False}
-}
+
+# Achievements: rules on stats the game reports to the engine when they
+# change; unlocks mark the table below, save and show a banner
+achievement_rules = [
+    Rule("First Flight", "Score your first point", [("score", ">=", 1)]),
+    Rule("High Flyer", "Reach a score of 50", [("score", ">=", 50)]),
+    Rule("Night Owl", "Play during night time", [("is_day", "==", False)]),
+    Rule("Shopaholic", "Make a purchase from the shop", [("purchases", ">=", 1)]),
+    Rule("Power Player", "Use a power-up", [("power_ups", ">=", 1)]),
+]
+achievement_engine = AchievementEngine(achievement_rules)
+achievements = {rule.name: {"description": rule.description, "achieved": False} for rule in achievement_rules}
+unlock_banner = None  # (text surface, time to hide it)
 
 # Fonts
 font = pygame.font.Font(None, 36)
 big_font = pygame.font.Font(None, 72)
 
+# Rendered text, re-rasterised only when a string changes
+text_cache = TextCache()
+
 # Game state
 game_state = GameState.MENU
 
-# Load sounds
-jump_sound = pygame.mixer.Sound("jump.mp3")
-score_sound = pygame.mixer.Sound("score.mp3")
-game_over_sound = pygame.mixer.Sound("game_over.mp3")
-power_up_sound = pygame.mixer.Sound("power_up.mp3")
+# Load sounds (decoded in the background, cached as PCM on disk)
+sounds = SoundBank()
+jump_sound = sounds.sound("jump.mp3", "player", max_voices=2)
+score_sound = sounds.sound("score.mp3", "ui")
+game_over_sound = sounds.sound("game_over.mp3", "ui")
+power_up_sound = sounds.sound("power_up.mp3", "ui")
+sounds.start(tasks)
+
+# Images are scaled, converted to the display format and cached on disk
+assets = AssetManager(tasks=tasks)
 
 # Load bird images
 bird_images = {
-    "blue": pygame.image.load("bird_blue.png"),
-    
+    "blue": assets.image("bird_blue.png", (bird_radius * 2, bird_radius * 2)),
+
 }
 
-# Scale bird images if necessary
-for color in bird_images:
-    bird_images[color] = pygame.transform.scale(bird_images[color], (bird_radius * 2, bird_radius * 2))
+# Pack the bird sprites into one atlas
+bird_images = assets.pack(bird_images)
+
+# Bird tilt, pre-rotated in 2 degree steps
+bird_rotations = {color: RotationCache(image) for color, image in bird_images.items()}
+
+# Other racers and ghosts
+remote_bird = bird_images["blue"].copy()
+remote_bird.set_alpha(140)
+ghost_bird = bird_images["blue"].copy()
+ghost_bird.set_alpha(70)
 
 # Load and scale background images
-bg_day = pygame.image.load("bg_day.png")
-bg_day = pygame.transform.scale(bg_day, (WIDTH, HEIGHT))
-bg_night = pygame.image.load("bg_night.png")
-bg_night = pygame.transform.scale(bg_night, (WIDTH, HEIGHT))
+bg_day = assets.image("bg_day.png", (WIDTH, HEIGHT), alpha=False)
+bg_night = assets.image("bg_night.png", (WIDTH, HEIGHT), alpha=False)
+
+# Gameplay background: dunes and ground bands scrolling at a fraction of the
+# pipe speed below the day/night sky, clouds (entities) drawn over them.  The
+# sky stays still, so it is the dirty-rect renderer's background and only the
+# moving bands are redrawn and presented each frame.  With PARALLAX off the
+# whole day/night background is static.
+PARALLAX = True
+HORIZON = 380  # Sky above, dunes below
+GROUND_Y = 540
+NIGHT_SHADE = (90, 100, 150)
+sand = pygame.Surface((48, HEIGHT - GROUND_Y))
+sand.fill((222, 184, 135))
+pygame.draw.rect(sand, (160, 120, 70), (0, 0, 48, 6))
+pygame.draw.line(sand, (200, 160, 110), (0, 30), (24, 18), 4)
+dunes = make_strip(assets.image("bg_far.png", alpha=False), WIDTH, GROUND_Y - HORIZON, (0, 150, 438, 116))
+ground = make_strip(sand, WIDTH, HEIGHT - GROUND_Y)
+parallax = ParallaxBackground(WIDTH, [
+    Layer([dunes, shaded(dunes, NIGHT_SHADE)], HORIZON, 0.25),
+    Layer([ground, shaded(ground, NIGHT_SHADE)], GROUND_Y, 1.0),
+])
 
 # Day/Night cycle
 day_night_cycle = 0
@@ -118,13 +208,6 @@ bird_colors = [BLUE, RED, YELLOW, GREEN]
 current_bird_color = 0
 unlocked_colors = [True, False, False, False]
 
-# Power-up properties
-current_power_up = PowerUp.NONE
-power_up_duration = 0
-immunity_duration = 300  # 5 seconds at 60 FPS
-slow_motion_duration = 300
-slow_motion_factor = 0.5
-
 # Shop items
 shop_items = [
     {"name": "Red Bird", "cost": 50, "type": "color", "index": 1},
@@ -136,117 +219,157 @@ shop_items = [
 
 
 
-def reset_game():
-    global bird_y, bird_velocity, pipe_x, pipe_height, score, game_state, difficulty, pipe_speed, current_power_up, power_up_duration, clouds
-    bird_y = HEIGHT // 2
-    bird_velocity = 0
-    pipe_x = WIDTH
-    pipe_height = random.randint(100, 400)
-    score = 0
+def reset_game(seed=None):
+    global game_state, prev_bird_y, prev_pipe_x, run_started, run_power_ups
+    # Seed each run explicitly so its replay can reproduce it
+    seed = random.getrandbits(63) if seed is None else seed
+    flappy_sim.reset(sim, seed)
+    recorder.start(seed)
+    prev_bird_y, prev_pipe_x = sim.bird_y, sim.pipe_x
+    world.clear()
     game_state = GameState.PLAYING
-    difficulty = 1
-    pipe_speed = 3
-    current_power_up = PowerUp.NONE
-    power_up_duration = 0
-    clouds = []
+    run_started = time.time()
+    run_power_ups = 0
+    achievement_engine.set(score=0, power_ups=0)
 
 def update_high_score():
     global high_score
-    if score > high_score:
-        high_score = score
-    save_game_data()
+    if sim.score > high_score:
+        high_score = sim.score
+    save_game_data(immediate=True)
 
 # Load high score
 
+# Saves are written in the background, debounced unless immediate
+save_store = SaveStore("game_data.txt", tasks=tasks)
+
+# Every finished run goes into the run history database
+history = RunHistory()
+run_started = 0.0
+run_power_ups = 0
 
-def save_game_data():
-    global high_score, coins, achievements
-    with open("game_data.txt", "w") as f:
-        f.write(f"{high_score},{coins}\n")
-        for achievement, data in achievements.items():
-            f.write(f"{achievement},{data['achieved']}\n")
+def save_game_data(immediate=False):
+    with profiler.phase("save_game_data"):
+        save_store.update(high_score=high_score, coins=coins,
+                          achievements={achievement: data['achieved'] for achievement, data in achievements.items()},
+                          unlocked_colors=unlocked_colors)
+        save_store.flush(immediate)
 
 def load_game_data():
-    global high_score, coins, achievements
-    if os.path.exists("game_data.txt"):
-        with open("game_data.txt", "r") as f:
-            data = f.readlines()
-            high_score, coins = map(int, data[0].strip().split(','))
-            for i, (achievement, _) in enumerate(achievements.items()):
-                if i + 1 < len(data):
-                    achievements[achievement]['achieved'] = data[i+1].strip().split(',')[1] == 'True'
+    global high_score, coins, achievements, unlocked_colors
+    data = save_store.load()
+    high_score = data["high_score"]
+    coins = data["coins"]
+    for achievement in achievements:
+        if achievement in data["achievements"]:
+            achievements[achievement]['achieved'] = data["achievements"][achievement]
+    if data["unlocked_colors"] is not None:
+        unlocked_colors = data["unlocked_colors"]
+    achievement_engine.restore([name for name, data in achievements.items() if data['achieved']])
+
+def on_unlock(rule):
+    global unlock_banner
+    achievements[rule.name]['achieved'] = True
+    unlock_banner = (text_cache.render(font, f"Achievement: {rule.name}", True, YELLOW), time.perf_counter() + 2.0)
+    save_game_data(immediate=True)
+
+achievement_engine.subscribe(on_unlock)
 
 load_game_data()
 
 def draw_menu():
     screen.blit(bg_day if is_day else bg_night, (0, 0))
-    title = big_font.render("Flappy Bird", True, WHITE)
-    start = font.render("Press SPACE to Start", True, WHITE)
-    shop = font.render("Press S for Shop", True, WHITE)
+    title = text_cache.render(big_font, "Flappy Bird", True, WHITE)
+    start = text_cache.render(font, "Waiting for the next race" if net else "Press SPACE to Start", True, WHITE)
+    shop = text_cache.render(font, "Press S for Shop", True, WHITE)
     screen.blit(title, (WIDTH // 2 - title.get_width() // 2, HEIGHT // 4))
     screen.blit(start, (WIDTH // 2 - start.get_width() // 2, HEIGHT // 2))
     screen.blit(shop, (WIDTH // 2 - shop.get_width() // 2, HEIGHT * 3 // 4))
-    voice_control = font.render("Say 'Jump' or 'Up' to control", True, WHITE)
+    voice_control = text_cache.render(font, "Clap or say 'Up' to jump" if voice else "--voice: clap or say 'Up'",
+                                      True, WHITE)
     screen.blit(voice_control, (WIDTH // 2 - voice_control.get_width() // 2, HEIGHT * 3 // 4 + 30))
-
-def spawn_power_up():
-    global active_power_ups
-    power_up_type = random.choice([PowerUp.IMMUNITY, PowerUp.SLOW_MOTION])
-    power_up_x = WIDTH
-    power_up_y = random.randint(50, HEIGHT - 50)
-    active_power_ups.append({"type": power_up_type, "x": power_up_x, "y": power_up_y})
+    demo = text_cache.render(font, "Press P for autopilot demo", True, WHITE)
+    screen.blit(demo, (WIDTH // 2 - demo.get_width() // 2, HEIGHT * 3 // 4 + 60))
 
 def draw_game():
-    screen.blit(bg_day if is_day else bg_night, (0, 0))
+    # Draw moving things part way between their last two steps
+    alpha = clock.alpha
+    renderer.begin(bg_day if is_day else bg_night)
+    mark = renderer.mark
+    if PARALLAX:
+        for rect in parallax.draw(screen, alpha, 0 if is_day else 1):
+            mark(rect, restore=False)
+
+    bird_y = lerp(prev_bird_y, sim.bird_y, alpha)
+    pipe_x = lerp(prev_pipe_x, sim.pipe_x, alpha) if sim.pipe_x <= prev_pipe_x else sim.pipe_x  # Not across a respawn
+    behind = 1 - alpha  # Steps back from the current positions
 
     # Draw clouds
-    for cloud in clouds:
-        pygame.draw.ellipse(screen, WHITE, cloud)
+    clouds = world.handles(CLOUD)
+    cloud_xs = world.x[clouds] - world.vx[clouds] * behind
+    for cloud_x, cloud_y in zip(cloud_xs.tolist(), world.y[clouds].tolist()):
+        mark(pygame.draw.ellipse(screen, WHITE, (cloud_x, cloud_y, cloud_width, cloud_height)))
 
-    # Draw bird
-    bird_image = bird_images[list(bird_images.keys())[current_bird_color]]
-    bird_rect = bird_image.get_rect(center=(int(bird_x), int(bird_y)))
-    if current_power_up == PowerUp.IMMUNITY:
-        pygame.draw.circle(screen, WHITE, (int(bird_x), int(bird_y)), bird_radius + 5)
-    screen.blit(bird_image, bird_rect)
+    # Draw immunity shield
+    if sim.current_power_up == PowerUp.IMMUNITY:
+        mark(pygame.draw.circle(screen, WHITE, (int(bird_x), int(bird_y)), bird_radius + 5))
 
     # Draw pipes
-    pygame.draw.rect(screen, GREEN, (pipe_x, 0, pipe_width, pipe_height))
-    pygame.draw.rect(screen, GREEN, (pipe_x, pipe_height + pipe_gap, pipe_width, HEIGHT - pipe_height - pipe_gap))
+    mark(pygame.draw.rect(screen, GREEN, (pipe_x, 0, pipe_width, sim.pipe_height)))
+    mark(pygame.draw.rect(screen, GREEN, (pipe_x, sim.pipe_height + sim.pipe_gap, pipe_width, HEIGHT - sim.pipe_height - sim.pipe_gap)))
 
     # Draw score and coins
-    score_text = font.render(f"Score: {score}", True, WHITE)
-    coins_text = font.render(f"Coins: {coins}", True, YELLOW)
-    screen.blit(score_text, (10, 10))
-    screen.blit(coins_text, (10, 50))
+    score_text = text_cache.render(font, f"Score: {sim.score}", True, WHITE)
+    coins_text = text_cache.render(font, f"Coins: {coins}", True, YELLOW)
+    mark(screen.blit(score_text, (10, 10)))
+    mark(screen.blit(coins_text, (10, 50)))
 
     # Draw power-up indicator
-    if current_power_up != PowerUp.NONE:
-        power_up_text = font.render(f"{current_power_up.name}: {power_up_duration // 60}s", True, WHITE)
-        screen.blit(power_up_text, (WIDTH - power_up_text.get_width() - 10, 10))
+    if sim.current_power_up != PowerUp.NONE:
+        power_up_text = text_cache.render(font, f"{sim.current_power_up.name}: {sim.power_up_duration // 60}s", True, WHITE)
+        mark(screen.blit(power_up_text, (WIDTH - power_up_text.get_width() - 10, 10)))
 
     # Draw high score
-    high_score_text = font.render(f"High Score: {high_score}", True, WHITE)
-    screen.blit(high_score_text, (WIDTH - high_score_text.get_width() - 10, 50))
-
-    #draw bird velocity
-    angle = -bird_velocity * 2  # Adjust multiplier for desired rotation speed
-    rotated_bird = pygame.transform.rotate(bird_image, angle)
+    high_score_text = text_cache.render(font, f"High Score: {high_score}", True, WHITE)
+    mark(screen.blit(high_score_text, (WIDTH - high_score_text.get_width() - 10, 50)))
+
+    if AUTOPILOT:
+        autopilot_text = text_cache.render(font, "AUTOPILOT", True, YELLOW)
+        mark(screen.blit(autopilot_text, (WIDTH // 2 - autopilot_text.get_width() // 2, HEIGHT - 40)))
+
+    if unlock_banner and time.perf_counter() < unlock_banner[1]:
+        mark(screen.blit(unlock_banner[0], (WIDTH // 2 - unlock_banner[0].get_width() // 2, 90)))
+
+    # Draw the other racers where they are on the course relative to us
+    if net:
+        for other_y, offset, ghost, alive in net.others():
+            if alive and -bird_radius < bird_x + offset < WIDTH + bird_radius:
+                image = ghost_bird if ghost else remote_bird
+                mark(screen.blit(image, image.get_rect(center=(int(bird_x + offset), int(other_y)))))
+        countdown = net.countdown()
+        if countdown:
+            countdown_text = text_cache.render(big_font, str(int(countdown) + 1), True, WHITE)
+            mark(screen.blit(countdown_text, (WIDTH // 2 - countdown_text.get_width() // 2, HEIGHT // 3)))
+
+    # Draw bird, tilted by velocity
+    angle = -sim.bird_velocity * 2  # Adjust multiplier for desired rotation speed
+    rotated_bird = bird_rotations[list(bird_images.keys())[current_bird_color]].get(angle)
     bird_rect = rotated_bird.get_rect(center=(int(bird_x), int(bird_y)))
-    screen.blit(rotated_bird, bird_rect)
+    mark(screen.blit(rotated_bird, bird_rect))
 
     # Draw power-ups
-    for power_up in active_power_ups:
-        pygame.draw.circle(screen, YELLOW, (int(power_up["x"]), int(power_up["y"])), 15)
-        power_up_text = font.render(power_up["type"].name[0], True, BLACK)
-        screen.blit(power_up_text, (power_up["x"] - 5, power_up["y"] - 10))
+    for power_up_type, power_up_x, power_up_y in sim.active_power_ups:
+        power_up_x += sim.pipe_speed * behind
+        mark(pygame.draw.circle(screen, YELLOW, (int(power_up_x), int(power_up_y)), 15))
+        power_up_text = text_cache.render(font, power_up_type.name[0], True, BLACK)
+        mark(screen.blit(power_up_text, (power_up_x - 5, power_up_y - 10)))
 
 def draw_game_over():
     screen.blit(bg_day if is_day else bg_night, (0, 0))
-    game_over_text = big_font.render("Game Over", True, WHITE)
-    final_score = font.render(f"Score: {score}", True, WHITE)
-    restart_text = font.render("Press SPACE to restart", True, WHITE)
-    menu_text = font.render("Press M for Menu", True, WHITE)
+    game_over_text = text_cache.render(big_font, "Game Over", True, WHITE)
+    final_score = text_cache.render(font, f"Score: {sim.score}", True, WHITE)
+    restart_text = text_cache.render(font, "Press SPACE to restart", True, WHITE)
+    menu_text = text_cache.render(font, "Press M for Menu", True, WHITE)
     screen.blit(game_over_text, (WIDTH // 2 - game_over_text.get_width() // 2, HEIGHT // 4))
     screen.blit(final_score, (WIDTH // 2 - final_score.get_width() // 2, HEIGHT // 2))
     screen.blit(restart_text, (WIDTH // 2 - restart_text.get_width() // 2, HEIGHT * 3 // 4 - 30))
@@ -254,14 +377,14 @@ def draw_game_over():
 
 def draw_shop():
     screen.blit(bg_day if is_day else bg_night, (0, 0))
-    shop_title = big_font.render("Shop", True, WHITE)
+    shop_title = text_cache.render(big_font, "Shop", True, WHITE)
     screen.blit(shop_title, (WIDTH // 2 - shop_title.get_width() // 2, 20))
 
-    coins_text = font.render(f"Coins: {coins}", True, YELLOW)
+    coins_text = text_cache.render(font, f"Coins: {coins}", True, YELLOW)
     screen.blit(coins_text, (10, 10))
 
     for i, item in enumerate(shop_items):
-        item_text = font.render(f"{item['name']}: {item['cost']} coins", True, WHITE)
+        item_text = text_cache.render(font, f"{item['name']}: {item['cost']} coins", True, WHITE)
         if (item['type'] == 'color' and unlocked_colors[item['index']]) or \
            (item['type'] == 'power_up' and coins >= item['cost']):
             pygame.draw.rect(screen, GREEN, (WIDTH // 2 - 100, 100 + i * 50, 200, 40))
@@ -269,157 +392,204 @@ def draw_shop():
             pygame.draw.rect(screen, RED, (WIDTH // 2 - 100, 100 + i * 50, 200, 40))
         screen.blit(item_text, (WIDTH // 2 - item_text.get_width() // 2, 105 + i * 50))
 
-    back_text = font.render("Press B to go back", True, WHITE)
+    back_text = text_cache.render(font, "Press B to go back", True, WHITE)
     screen.blit(back_text, (WIDTH // 2 - back_text.get_width() // 2, HEIGHT - 50))
 
 
 
 def handle_shop_purchase(mouse_pos):
-    global coins, current_bird_color, unlocked_colors, current_power_up
+    global coins, current_bird_color, unlocked_colors
     for i, item in enumerate(shop_items):
         if WIDTH // 2 - 100 <= mouse_pos[0] <= WIDTH // 2 + 100 and 100 + i * 50 <= mouse_pos[1] <= 140 + i * 50:
             if item['type'] == 'color' and not unlocked_colors[item['index']] and coins >= item['cost']:
                 coins -= item['cost']
                 unlocked_colors[item['index']] = True
+                achievement_engine.increment("purchases")
+                achievement_engine.set(coins=coins)
+                save_game_data(immediate=True)
             elif item['type'] == 'power_up' and coins >= item['cost']:
                 coins -= item['cost']
-                current_power_up = item['power_up']
+                sim.current_power_up = item['power_up']
                 power_up_sound.play()
+                achievement_engine.increment("purchases")
+                achievement_engine.set(coins=coins)
+                save_game_data(immediate=True)
 
 
-def update_achievements():
-    global achievements, score, is_day
-    if score >= 1:
-        achievements["First Flight"]["achieved"] = True
-    if score >= 50:
-        achievements["High Flyer"]["achieved"] = True
-    if not is_day:
-        achievements["Night Owl"]["achieved"] = True
-    # "Shopaholic" and "Power Player" will be updated in their respective functions
-
 def spawn_cloud():
     cloud_x = WIDTH
     cloud_y = random.randint(0, HEIGHT // 2)
-    clouds.append(pygame.Rect(cloud_x, cloud_y, cloud_width, cloud_height))
+    world.spawn(CLOUD, cloud_x, cloud_y, cloud_width, cloud_height, vx=-1)
 
-# Game loop
-clock = pygame.time.Clock()
+# Game loop: a coroutine, so it runs under pygbag (see main.py) as well as
+# on the desktop
+clock = FixedStepClock(STEP_RATE, RENDER_FPS)
 running = True
-
-while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_SPACE:
-                if game_state == GameState.MENU:
-                    reset_game()
-                elif game_state == GameState.PLAYING:
-                    bird_velocity = jump_strength
-                    jump_sound.play()
-                elif game_state == GameState.GAME_OVER:
-                    game_state = GameState.MENU
-            elif event.key == pygame.K_s and game_state == GameState.MENU:
-                game_state = GameState.SHOP
-            elif event.key == pygame.K_b and game_state == GameState.SHOP:
-                game_state = GameState.MENU
-            elif event.key == pygame.K_m and game_state == GameState.GAME_OVER:
-                game_state = GameState.MENU
-        if event.type == pygame.MOUSEBUTTONDOWN and game_state == GameState.SHOP:
-            handle_shop_purchase(event.pos)
-
-    if game_state == GameState.PLAYING:
-        # Update bird position
-        bird_velocity += gravity
-        bird_y += bird_velocity
-
-        # Spawn power-ups
-        if random.random() < power_up_spawn_chance:
-            spawn_power_up()
-
-        # Move and collect power-ups
-        for power_up in active_power_ups[:]:
-            power_up["x"] -= pipe_speed
-            if power_up["x"] < -30:
-                active_power_ups.remove(power_up)
-            elif abs(bird_x - power_up["x"]) < 20 and abs(bird_y - power_up["y"]) < 20:
-                current_power_up = power_up["type"]
-                power_up_duration = immunity_duration if current_power_up == PowerUp.IMMUNITY else slow_motion_duration
-                active_power_ups.remove(power_up)
-                power_up_sound.play()
-                achievements["Power Player"]["achieved"] = True
-
-        # Update achievements
-        update_achievements()
-
-        # Move pipe
-        if current_power_up == PowerUp.SLOW_MOTION:
-            pipe_x -= pipe_speed * slow_motion_factor
+jump = False  # Held until the next simulation step takes it
+
+async def main():
+    global running, jump, game_state, AUTOPILOT, prev_bird_y, prev_pipe_x, coins, day_night_cycle, is_day, \
+        startup_time, run_power_ups, net_race
+    tasks.start()
+    if net:
+        await net.connect(net_host, int(net_port))
+    while running:
+        with profiler.phase("clock.tick"):
+            steps = await clock.tick_async()
+        with profiler.phase("events"):
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                if voice and event.type == voice_input.VOICE_JUMP:
+                    if game_state == GameState.MENU and not net:
+                        reset_game()
+                    elif game_state == GameState.PLAYING:
+                        jump = True
+                        jump_sound.play()
+                if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_SPACE:
+                        if game_state == GameState.MENU and not net:
+                            reset_game()
+                        elif game_state == GameState.PLAYING:
+                            jump = True
+                            jump_sound.play()
+                        elif game_state == GameState.GAME_OVER:
+                            game_state = GameState.MENU
+                    elif event.key == pygame.K_s and game_state == GameState.MENU:
+                        game_state = GameState.SHOP
+                    elif event.key == pygame.K_b and game_state == GameState.SHOP:
+                        game_state = GameState.MENU
+                    elif event.key == pygame.K_m and game_state == GameState.GAME_OVER:
+                        game_state = GameState.MENU
+                    elif event.key == pygame.K_p:
+                        AUTOPILOT = not AUTOPILOT
+                    elif event.key == pygame.K_F3:
+                        profiler.toggle()
+                    elif event.key == pygame.K_F12:
+                        print(f"Profile written to {profiler.export_trace()} and {profiler.export_csv()}")
+                if event.type == pygame.MOUSEBUTTONDOWN and game_state == GameState.SHOP:
+                    recorder.click(event.pos)
+                    handle_shop_purchase(event.pos)
+
+        if net:
+            # Each race the server starts begins a run on its course
+            if net.race != net_race and net.racing and game_state in (GameState.MENU, GameState.GAME_OVER):
+                net_race = net.race
+                reset_game(net.seed)
+        elif AUTOPILOT and game_state in (GameState.MENU, GameState.GAME_OVER):
+            reset_game()
+
+        if game_state == GameState.PLAYING:
+            # Run the simulation steps owed since the last frame
+            for _ in range(steps):
+                if net and net.countdown():
+                    break
+                if AUTOPILOT:
+                    with profiler.phase("autopilot"):
+                        jump = autopilot.decide(sim)
+                    if jump:
+                        jump_sound.play()
+
+                # Bird, power-ups, pipe and collisions
+                prev_bird_y, prev_pipe_x = sim.bird_y, sim.pipe_x
+                recorder.record(jump)
+                with profiler.phase("simulation"):
+                    events = net.step(jump) if net else flappy_sim.step(sim, jump)
+                jump = False  # One step's input, however many steps this frame runs
+
+                if events & flappy_sim.EVENT_POWER_UP:
+                    power_up_sound.play()
+                    run_power_ups += 1
+                    achievement_engine.set(power_ups=run_power_ups)
+
+                if events & flappy_sim.EVENT_SCORE:
+                    coins += 1
+                    score_sound.play()
+                    achievement_engine.set(score=sim.score, coins=coins)
+
+                if events & (flappy_sim.EVENT_SCORE | flappy_sim.EVENT_POWER_UP):
+                    save_game_data()
+
+                if events & flappy_sim.EVENT_DEATH:
+                    game_state = GameState.GAME_OVER
+                    game_over_sound.play()
+                    run = recorder.finish(sim.score)
+                    replay.save(run)
+                    uploader.submit({"game": "import_pygame", "score": sim.score, "seed": run.seed,
+                                     "date": datetime.now().isoformat(timespec="seconds")})
+                    history.record("import_pygame", sim.score, seed=run.seed, power_ups=run_power_ups,
+                                   duration=time.time() - run_started, cause=flappy_sim.death_cause(sim.bird_y),
+                                   started=run_started)
+                    update_high_score()
+                    break
+
+                # Scroll the background with the pipe (at its slowed speed
+                # on the step it respawns, too), and move clouds
+                if sim.pipe_x <= prev_pipe_x:
+                    parallax.scroll(prev_pipe_x - sim.pipe_x)
+                elif sim.current_power_up == PowerUp.SLOW_MOTION:
+                    parallax.scroll(sim.pipe_speed * flappy_sim.slow_motion_factor)
+                else:
+                    parallax.scroll(sim.pipe_speed)
+                world.move(kind=CLOUD)
+                world.cull(kind=CLOUD)
+
+                # Spawn new cloud
+                if random.random() < 0.01:
+                    spawn_cloud()
+
+                # Day/Night cycle
+                day_night_cycle += 1
+                if day_night_cycle >= 1800:  # Change every 30 seconds
+                    day_night_cycle = 0
+                    is_day = not is_day
+                    achievement_engine.set(is_day=is_day)
+
+        if net:
+            net.flush()
+
+        # Draw the appropriate screen based on game state
+        if game_state == GameState.PLAYING:
+            with profiler.phase("draw_game"):
+                draw_game()
         else:
-            pipe_x -= pipe_speed
-
-        if pipe_x < -pipe_width:
-            pipe_x = WIDTH
-            pipe_height = random.randint(100, 400)
-            score += 1
-            coins += 1
-            score_sound.play()
-
-            # Increase difficulty
-            if score % 5 == 0:
-                difficulty += 1
-                pipe_speed = min(3 + difficulty * 0.5, 10)  # Cap speed at 10
-
-        # Move clouds
-        for cloud in clouds:
-            cloud.x -= 1
-        clouds = [cloud for cloud in clouds if cloud.right > 0]
-
-        # Spawn new cloud
-        if random.random() < 0.01:
-            spawn_cloud()
-
-        # Check for collisions
-        bird_rect = bird_images[list(bird_images.keys())[current_bird_color]].get_rect(center=(int(bird_x), int(bird_y)))
-        collision = (bird_rect.top < 0 or bird_rect.bottom > HEIGHT or
-                        (bird_rect.right > pipe_x and bird_rect.left < pipe_x + pipe_width and
-                            (bird_rect.top < pipe_height or bird_rect.bottom > pipe_height + pipe_gap)))
-
-        if collision and current_power_up != PowerUp.IMMUNITY:
-            game_state = GameState.GAME_OVER
-            game_over_sound.play()
-            update_high_score()
-        
-        
-
-        # Update power-up duration
-        if current_power_up != PowerUp.NONE:
-            power_up_duration -= 1
-            if power_up_duration <= 0:
-                current_power_up = PowerUp.NONE
-
-        # Day/Night cycle
-        day_night_cycle += 1
-        if day_night_cycle >= 1800:  # Change every 30 seconds
-            day_night_cycle = 0
-            is_day = not is_day
-
-    # Draw the appropriate screen based on game state
-    if game_state == GameState.MENU:
-        draw_menu()
-    elif game_state == GameState.PLAYING:
-        draw_game()
-    elif game_state == GameState.GAME_OVER:
-        draw_game_over()
-    elif game_state == GameState.SHOP:
-        draw_shop()
-
-    # Update display
-    pygame.display.flip()
-
-    # Cap the frame rate
-    clock.tick(60)
-
-    save_game_data()
-
-pygame.quit()
\ No newline at end of file
+            if game_state == GameState.MENU:
+                with profiler.phase("draw_menu"):
+                    draw_menu()
+            elif game_state == GameState.GAME_OVER:
+                with profiler.phase("draw_game_over"):
+                    draw_game_over()
+            elif game_state == GameState.SHOP:
+                with profiler.phase("draw_shop"):
+                    draw_shop()
+            renderer.invalidate()  # Full-screen draws; the next frame starts clean
+        overlay = profiler.draw(screen)
+        if overlay:
+            renderer.mark(overlay)
+
+        # Update display
+        with profiler.phase("display"):
+            renderer.present()
+        profiler.end_frame()
+        if startup_time is not None:
+            print(f"Time to first frame: {(time.perf_counter() - startup_time) * 1000:.0f} ms")
+            startup_time = None
+
+    pacing = clock.stats()
+    print(f"Frame pacing: {pacing['fps']:.0f} FPS, {pacing['steps_per_frame']:.2f} steps/frame, "
+          f"jitter {pacing['jitter_ms']:.2f} ms, {pacing['dropped_frames']} dropped frames, "
+          f"{pacing['dropped_steps']} steps dropped")
+    save_game_data(immediate=True)
+    await uploader.drain()
+    await tasks.drain()
+    save_store.close()
+    history.close()
+    if voice:
+        voice.stop()
+    if net:
+        net.close()
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
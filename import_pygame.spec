@@ -16,12 +16,13 @@ a = Analysis(
 )
 pyz = PYZ(a.pure)
 
+# One-folder build: a one-file EXE unpacks itself to a temp dir on every
+# launch, which dominated cold start.
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='import_pygame',
     debug=False,
     bootloader_ignore_signals=False,
@@ -36,3 +37,12 @@ exe = EXE(
     codesign_identity=None,
     entitlements_file=None,
 )
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=True,
+    upx_exclude=[],
+    name='import_pygame',
+)
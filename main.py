@@ -0,0 +1,10 @@
+"""pygbag entry point: ``pygbag .`` packages this folder and runs main.py.
+
+The game's loop is a coroutine that yields every frame, which is what pygbag
+needs to hand control back to the browser.
+"""
+import asyncio
+
+import import_pygame
+
+asyncio.run(import_pygame.main())
@@ -0,0 +1,596 @@
+"""Races over UDP: an authoritative server, predicting clients and ghosts.
+
+``NetServer`` runs the race.  Every player flies their own flappy_sim bird
+(the import_pygame.py rules) on one seeded course, so everyone meets the
+same pipes and power-ups.  A race starts ``countdown`` ticks after the
+first player joins and lasts until every player has died; players who join
+mid-race wait for the next one.  Recorded runs on the race's seed fly
+alongside as ghosts, stepped from their replay's jumps.
+
+Clients send inputs, not positions.  Each INPUT packet carries every jump
+decision the server has not yet used, as a bitmask, so a lost packet costs
+nothing once the next one arrives.  The server steps each bird as far as
+its inputs reach.  A bird whose inputs are more than ``allowance`` frames
+late is stepped without a jump, and the client is corrected.
+
+Every ``snapshot_every`` ticks each client gets a snapshot of all the birds.
+Only the fields that changed since the last snapshot that client
+acknowledged are sent, so idle and dead birds cost two bytes each.
+
+``NetClient`` predicts its own bird, stepping it straight away on the local
+jump.  It keeps its predicted state for each frame.  When a snapshot
+disagrees with the prediction for that frame, it restarts from the
+server's state and steps its newer inputs again.  Other birds and ghosts
+come from the snapshots, placed by how far along the course they are.
+
+``LinkSimulator`` sits under both ends to drop and delay packets, so all
+of this can be tried on one machine:
+
+    python netplay.py server [port] [--seed N] [--ghosts DIR] [--loss 0.05] [--latency 0.05]
+    python import_pygame.py --join 127.0.0.1:8766
+
+Desktop only: pygbag builds have no UDP sockets.
+"""
+import asyncio
+import os
+import random
+import struct
+import sys
+import time
+
+import flappy_sim
+import replay
+from flappy_sim import PowerUp, WIDTH, pipe_width
+
+PORT = 8766
+MAX_PLAYERS = 48  # Ghosts included; a full snapshot stays under one Ethernet frame
+TIMEOUT = 5.0  # Seconds without a packet before a player is dropped
+
+# Packet types
+HELLO = 1
+WELCOME = 2
+INPUT = 3
+SNAPSHOT = 4
+BYE = 5
+
+_TYPE = struct.Struct("<B")
+_WELCOME = struct.Struct("<BBQH")  # type, player id, seed, tick rate
+_INPUT = struct.Struct("<BHIIBQ")  # type, race, acked snapshot, first frame, frames, jump bits
+_SNAPSHOT = struct.Struct("<BIIHiB")  # type, tick, baseline tick, race, race frame, birds
+_BIRD = struct.Struct("<BB")  # id, changed fields
+MAX_INPUTS = 64  # Jump bits per INPUT packet
+
+# Snapshot fields per bird, in mask bit order
+_FIELDS = [struct.Struct(fmt) for fmt in ("<I", "<f", "<f", "<f", "<H", "<H", "<B", "<BH")]
+FRAME, BIRD_Y, VELOCITY, PIPE_X, PIPE_INDEX, SCORE, FLAGS, POWER_UP = range(len(_FIELDS))
+ALIVE = 1
+GHOST = 2
+RACING = 4
+
+_POWER_UPS = list(PowerUp)
+
+
+def distance(pipe_index, pipe_x):
+    # How far along the course a bird is, in pixels
+    return pipe_index * (WIDTH + pipe_width) + WIDTH - pipe_x
+
+
+def _fields(state, flags):
+    # A bird's snapshot fields, packed
+    return (_FIELDS[0].pack(state.frame), _FIELDS[1].pack(state.bird_y), _FIELDS[2].pack(state.bird_velocity),
+            _FIELDS[3].pack(state.pipe_x), _FIELDS[4].pack(state.pipe_index), _FIELDS[5].pack(state.score),
+            _FIELDS[6].pack(flags | (ALIVE if state.alive else 0)),
+            _FIELDS[7].pack(state.current_power_up.value, max(0, min(state.power_up_duration, 0xFFFF))))
+
+
+def copy_state(state, into=None):
+    # Copy a SimState (sharing its course, which only depends on the seed)
+    if into is None:
+        into = object.__new__(flappy_sim.SimState)
+    for name in flappy_sim.SimState.__slots__:
+        setattr(into, name, getattr(state, name))
+    into.active_power_ups = [list(power_up) for power_up in state.active_power_ups]
+    return into
+
+
+class LinkSimulator:
+    def __init__(self, loss=0.0, latency=0.0, jitter=0.0, seed=None):
+        self.loss = loss
+        self.latency = latency
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._transport = None
+        self._loop = None
+
+        # Stats
+        self.sent = 0
+        self.dropped = 0
+
+    def attach(self, transport):
+        self._transport = transport
+        self._loop = asyncio.get_running_loop()
+
+    def sendto(self, data, addr=None):
+        # Send a datagram, or drop it, or send it late
+        self.sent += 1
+        if self.loss and self._rng.random() < self.loss:
+            self.dropped += 1
+            return
+        delay = self.latency + self._rng.random() * self.jitter
+        if delay > 0:
+            self._loop.call_later(delay, self._send, data, addr)
+        else:
+            self._send(data, addr)
+
+    def _send(self, data, addr):
+        if not self._transport.is_closing():
+            self._transport.sendto(data, addr)
+
+
+class _Player:
+    def __init__(self, player_id, addr, seed, jumps=None):
+        self.id = player_id
+        self.addr = addr  # None for a ghost
+        self.sim = flappy_sim.SimState(seed)
+        self.sim.alive = False
+        self.jumps = jumps  # A ghost's replay jump frames
+        self.inputs = {}  # Frame -> jump, received but not yet stepped
+        self.racing = False
+        self.acked = 0  # Latest snapshot tick the client has
+        self.last_seen = time.perf_counter()
+
+        # Stats
+        self.joined = self.last_seen
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.forced = 0  # Frames stepped without the client's input
+
+
+class NetServer(asyncio.DatagramProtocol):
+    def __init__(self, seed=None, tick_rate=60, snapshot_every=2, allowance=30, countdown=180, ghosts=(),
+                 link=None):
+        self.seed = random.getrandbits(63) if seed is None else seed
+        self.tick_rate = tick_rate
+        self.snapshot_every = snapshot_every
+        self.allowance = allowance
+        self.countdown = countdown
+        self.link = link or LinkSimulator()
+        self.players = {}  # id -> _Player, ghosts included
+        self._by_addr = {}
+        self.tick = 0
+        self.race = 0
+        self.race_start = None  # Tick the current race starts on; None between races
+        self._snapshots = {}  # Tick -> {id: fields}, for delta baselines
+        self._transport = None
+        self._task = None
+        for ghost in ghosts:
+            if ghost.seed == self.seed and len(self.players) < MAX_PLAYERS:
+                player = _Player(self._free_id(), None, self.seed, set(ghost.jumps))
+                self.players[player.id] = player
+
+        # Stats
+        self.ticks = 0
+        self.tick_time = 0.0
+        self.max_tick_time = 0.0
+        self.snapshot_bytes = 0
+        self.full_bytes = 0  # What the snapshots would have been without deltas
+
+    async def start(self, host="127.0.0.1", port=PORT):
+        loop = asyncio.get_running_loop()
+        await loop.create_datagram_endpoint(lambda: self, local_addr=(host, port))
+        self._task = loop.create_task(self._run())
+        return self._transport.get_extra_info("sockname")[1]
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    def connection_made(self, transport):
+        self._transport = transport
+        self.link.attach(transport)
+
+    async def _run(self):
+        # Tick on a fixed schedule; after a long stall, carry on from now
+        # rather than running the missed ticks back to back
+        loop = asyncio.get_running_loop()
+        due = loop.time()
+        while True:
+            self.step()
+            due += 1.0 / self.tick_rate
+            delay = due - loop.time()
+            if delay < -0.25:
+                due -= delay
+            await asyncio.sleep(max(0.0, delay))
+
+    def _free_id(self):
+        player_id = 1
+        while player_id in self.players:
+            player_id += 1
+        return player_id
+
+    def datagram_received(self, data, addr):
+        if not data:
+            return
+        kind = data[0]
+        player = self._by_addr.get(addr)
+        if player is not None:
+            player.last_seen = time.perf_counter()
+            player.bytes_in += len(data)
+        if kind == HELLO:
+            if player is None:
+                if len(self.players) >= MAX_PLAYERS:
+                    return
+                player = _Player(self._free_id(), addr, self.seed)
+                self.players[player.id] = player
+                self._by_addr[addr] = player
+                if self.race_start is not None and self.tick < self.race_start:
+                    flappy_sim.reset(player.sim)  # Still counting down: join this race
+                    player.racing = True
+            self._send(player, _WELCOME.pack(WELCOME, player.id, self.seed, self.tick_rate))
+        elif kind == INPUT and player is not None and len(data) == _INPUT.size:
+            _, race, acked, first, count, bits = _INPUT.unpack(data)
+            if acked in self._snapshots and acked > player.acked:
+                player.acked = acked
+            if race != self.race or not player.racing:
+                return
+            frame = player.sim.frame
+            for i in range(max(0, frame - first), min(count, MAX_INPUTS)):
+                player.inputs.setdefault(first + i, bool(bits >> i & 1))
+        elif kind == BYE and player is not None:
+            self._remove(player)
+
+    def _remove(self, player):
+        del self.players[player.id]
+        del self._by_addr[player.addr]
+
+    def _send(self, player, data):
+        player.bytes_out += len(data)
+        self.link.sendto(data, player.addr)
+
+    def step(self):
+        start = time.perf_counter()
+        self.tick += 1
+        humans = [player for player in self.players.values() if player.addr is not None]
+        if self.race_start is None and humans:
+            self._start_race()
+        if self.race_start is not None:
+            frame = self.tick - self.race_start
+            if frame > 0:
+                for player in self.players.values():
+                    if player.racing:
+                        self._advance(player, frame)
+                if not any(player.racing and player.sim.alive for player in humans):
+                    self.race_start = None  # Everyone is out; the next countdown starts next tick
+        if self.tick % self.snapshot_every == 0:
+            self._send_snapshots()
+        for player in humans:
+            if start - player.last_seen > TIMEOUT:
+                self._remove(player)
+        elapsed = time.perf_counter() - start
+        self.ticks += 1
+        self.tick_time += elapsed
+        self.max_tick_time = max(self.max_tick_time, elapsed)
+
+    def _start_race(self):
+        self.race = (self.race + 1) & 0xFFFF
+        self.race_start = self.tick + self.countdown
+        for player in self.players.values():
+            flappy_sim.reset(player.sim)
+            player.inputs.clear()
+            player.racing = True
+
+    def _advance(self, player, frame):
+        # Step a bird up to the race frame: a ghost from its replay, a player
+        # from their inputs, without a jump where those are too late
+        sim = player.sim
+        step = flappy_sim.step
+        if player.jumps is not None:
+            while sim.alive and sim.frame < frame:
+                step(sim, sim.frame in player.jumps)
+            return
+        inputs = player.inputs
+        while sim.alive and sim.frame in inputs and sim.frame < frame + self.allowance:
+            step(sim, inputs.pop(sim.frame))
+        while sim.alive and sim.frame < frame - self.allowance:
+            step(sim, inputs.pop(sim.frame, False))
+            player.forced += 1
+        if not sim.alive:
+            inputs.clear()
+
+    def _send_snapshots(self):
+        snapshot = {player_id: _fields(player.sim, (GHOST if player.jumps is not None else 0) |
+                                       (RACING if player.racing else 0))
+                    for player_id, player in self.players.items()}
+        self._snapshots[self.tick] = snapshot
+        self._snapshots.pop(self.tick - 32 * self.snapshot_every, None)
+        race_frame = self.tick - self.race_start if self.race_start is not None else -self.countdown
+        full = _SNAPSHOT.size + sum(_BIRD.size + sum(map(len, fields)) for fields in snapshot.values())
+        for player in self.players.values():
+            if player.addr is None:
+                continue
+            baseline = self._snapshots.get(player.acked)
+            parts = [_SNAPSHOT.pack(SNAPSHOT, self.tick, player.acked if baseline else 0, self.race, race_frame,
+                                    len(snapshot))]
+            for player_id, fields in snapshot.items():
+                base = baseline.get(player_id) if baseline else None
+                mask = 0
+                changed = []
+                for i, field in enumerate(fields):
+                    if base is None or base[i] != field:
+                        mask |= 1 << i
+                        changed.append(field)
+                parts.append(_BIRD.pack(player_id, mask))
+                parts.extend(changed)
+            data = b"".join(parts)
+            self._send(player, data)
+            self.snapshot_bytes += len(data)
+            self.full_bytes += full
+
+    def stats(self):
+        now = time.perf_counter()
+        humans = [player for player in self.players.values() if player.addr is not None]
+        seconds = [max(now - player.joined, 1e-9) for player in humans]
+        return {"players": len(humans), "ghosts": len(self.players) - len(humans), "ticks": self.ticks,
+                "mean_tick_ms": self.tick_time / self.ticks * 1000 if self.ticks else 0.0,
+                "max_tick_ms": self.max_tick_time * 1000,
+                "out_bytes_per_client": (sum(p.bytes_out / s for p, s in zip(humans, seconds)) / len(humans)
+                                         if humans else 0.0),
+                "in_bytes_per_client": (sum(p.bytes_in / s for p, s in zip(humans, seconds)) / len(humans)
+                                        if humans else 0.0),
+                "delta_ratio": self.snapshot_bytes / self.full_bytes if self.full_bytes else 1.0,
+                "forced_frames": sum(player.forced for player in humans), "dropped": self.link.dropped}
+
+
+class NetClient(asyncio.DatagramProtocol):
+    def __init__(self, sim=None, link=None):
+        self.sim = sim or flappy_sim.SimState()
+        self.link = link or LinkSimulator()
+        self.id = None
+        self.seed = None
+        self.tick_rate = 60
+        self.race = None
+        self.racing = False
+        self.starts_at = 0.0  # Event loop time the current race starts
+        self.birds = {}  # id -> fields of the other birds, from the latest snapshot
+        self._transport = None
+        self._loop = None
+        self._hello = None
+        self._tick = 0  # Latest snapshot tick
+        self._received = {}  # Tick -> {id: fields}, baselines for deltas
+        self._history = {}  # Frame -> predicted state after that frame
+        self._inputs = {}  # Frame -> jump, not yet used by the server
+        self._confirmed = 0  # Latest frame the server has stepped
+        self._alive = False
+
+        # Stats
+        self.snapshots = 0
+        self.undecodable = 0  # Snapshots whose baseline had already been dropped
+        self.corrections = 0
+        self.replayed_frames = 0
+        self.bytes_in = 0
+
+    async def connect(self, host, port=PORT):
+        # Say hello until the server answers; returns at once
+        self._loop = asyncio.get_running_loop()
+        await self._loop.create_datagram_endpoint(lambda: self, remote_addr=(host, port))
+        self._hello = self._loop.create_task(self._greet())
+
+    async def _greet(self):
+        while self.id is None:
+            self.link.sendto(_TYPE.pack(HELLO))
+            await asyncio.sleep(0.5)
+
+    def close(self):
+        if self._hello is not None:
+            self._hello.cancel()
+        if self._transport is not None:
+            self._transport.sendto(_TYPE.pack(BYE))
+            self._transport.close()
+            self._transport = None
+
+    def connection_made(self, transport):
+        self._transport = transport
+        self.link.attach(transport)
+
+    def datagram_received(self, data, addr):
+        if not data:
+            return
+        self.bytes_in += len(data)
+        kind = data[0]
+        if kind == WELCOME and len(data) == _WELCOME.size and self.id is None:
+            _, self.id, self.seed, self.tick_rate = _WELCOME.unpack(data)
+        elif kind == SNAPSHOT and self.id is not None:
+            self._snapshot(data)
+
+    def _snapshot(self, data):
+        _, tick, baseline, race, race_frame, count = _SNAPSHOT.unpack_from(data)
+        if tick <= self._tick:
+            return  # Late or duplicate
+        base = self._received.get(baseline, {}) if baseline else {}
+        if baseline and baseline not in self._received:
+            self.undecodable += 1
+            return
+        birds = {}
+        pos = _SNAPSHOT.size
+        for _ in range(count):
+            bird_id, mask = _BIRD.unpack_from(data, pos)
+            pos += _BIRD.size
+            fields = list(base.get(bird_id) or [None] * len(_FIELDS))
+            for i, codec in enumerate(_FIELDS):
+                if mask >> i & 1:
+                    value = codec.unpack_from(data, pos)
+                    fields[i] = value if len(value) > 1 else value[0]
+                    pos += codec.size
+            birds[bird_id] = fields
+        self._tick = tick
+        self._received[tick] = birds
+        for old in [old for old in self._received if old < tick - 64]:
+            del self._received[old]
+        self.snapshots += 1
+
+        self.birds = {bird_id: fields for bird_id, fields in birds.items() if bird_id != self.id}
+        own = birds.get(self.id)
+        if own is None or not own[FLAGS] & RACING:
+            return
+        if race != self.race:
+            self._start(race, race_frame)
+        elif race_frame <= 0:
+            self.starts_at = min(self.starts_at, self._loop.time() - race_frame / self.tick_rate)
+        self._reconcile(own)
+
+    def _start(self, race, race_frame):
+        # A new race: the bird goes back to the start of the course
+        self.race = race
+        self.racing = True
+        self.starts_at = self._loop.time() - race_frame / self.tick_rate
+        flappy_sim.reset(self.sim, self.seed)
+        self._history = {0: copy_state(self.sim)}
+        self._inputs = {}
+        self._confirmed = 0
+        self._alive = True
+
+    def _reconcile(self, fields):
+        frame = fields[FRAME]
+        if frame <= self._confirmed:
+            return
+        self._confirmed = frame
+        for old in [old for old in self._history if old < frame]:
+            del self._history[old]
+        for old in [old for old in self._inputs if old < frame]:
+            del self._inputs[old]
+        predicted = self._history.get(frame)
+        if predicted is not None and not self._differs(predicted, fields):
+            return
+        # The prediction was wrong (or the server is ahead): take the
+        # server's state and step the inputs it has not used yet again
+        self.corrections += 1
+        latest = self.sim.frame
+        if predicted is not None:
+            copy_state(predicted, self.sim)
+        self._apply(fields)
+        self._history = {frame: copy_state(self.sim)}
+        while self.sim.alive and self.sim.frame < latest:
+            flappy_sim.step(self.sim, self._inputs.get(self.sim.frame, False))
+            self._history[self.sim.frame] = copy_state(self.sim)
+            self.replayed_frames += 1
+
+    @staticmethod
+    def _differs(state, fields):
+        kind, duration = fields[POWER_UP]
+        return (abs(state.bird_y - fields[BIRD_Y]) > 0.01 or abs(state.bird_velocity - fields[VELOCITY]) > 0.01 or
+                abs(state.pipe_x - fields[PIPE_X]) > 0.01 or state.pipe_index != fields[PIPE_INDEX] or
+                state.score != fields[SCORE] or state.alive != bool(fields[FLAGS] & ALIVE) or
+                state.current_power_up.value != kind or state.power_up_duration != duration)
+
+    def _apply(self, fields):
+        # Overwrite the bird with the server's fields.  Power-ups still on
+        # the course are not in snapshots, so the local ones stay.
+        sim = self.sim
+        kind, duration = fields[POWER_UP]
+        sim.frame = fields[FRAME]
+        sim.bird_y = fields[BIRD_Y]
+        sim.bird_velocity = fields[VELOCITY]
+        sim.pipe_x = fields[PIPE_X]
+        if sim.pipe_index != fields[PIPE_INDEX]:
+            sim.pipe_index = fields[PIPE_INDEX]
+            sim.pipe_height, sim.pipe_gap, _ = sim.course.pipe(sim.pipe_index)
+        sim.score = fields[SCORE]
+        sim.pipe_speed = sim.course.speed(sim.score)
+        sim.alive = bool(fields[FLAGS] & ALIVE)
+        sim.current_power_up = _POWER_UPS[kind]
+        sim.power_up_duration = duration
+
+    def countdown(self):
+        # Seconds until the race starts, 0 once it has
+        return max(0.0, self.starts_at - self._loop.time()) if self.racing else 0.0
+
+    def step(self, jump=False):
+        # Predict one frame of the local bird; returns flappy_sim EVENT_*
+        # flags, including a death the server decided on
+        sim = self.sim
+        if not self.racing or self._loop.time() < self.starts_at:
+            return 0
+        if not sim.alive:
+            events = flappy_sim.EVENT_DEATH if self._alive else 0
+            self._alive = False
+            return events
+        self._inputs[sim.frame] = jump
+        events = flappy_sim.step(sim, jump)
+        self._history[sim.frame] = copy_state(sim)
+        self._alive = sim.alive
+        return events
+
+    def flush(self):
+        # Send the inputs the server has not used, and the snapshot ack;
+        # once a frame
+        if self._transport is None or self.id is None:
+            return
+        first = max(self._confirmed, self.sim.frame - MAX_INPUTS)
+        bits = 0
+        for i in range(self.sim.frame - first):
+            if self._inputs.get(first + i):
+                bits |= 1 << i
+        self.link.sendto(_INPUT.pack(INPUT, self.race or 0, self._tick, first, self.sim.frame - first, bits))
+
+    def others(self):
+        # (bird_y, x offset from the local bird, ghost, alive) for every
+        # other racing bird, compared with the local bird on the same frame
+        for fields in self.birds.values():
+            if None in fields or not fields[FLAGS] & RACING:
+                continue
+            own = self._history.get(fields[FRAME], self.sim)
+            offset = (distance(fields[PIPE_INDEX], fields[PIPE_X]) -
+                      distance(own.pipe_index, own.pipe_x))
+            yield fields[BIRD_Y], offset, bool(fields[FLAGS] & GHOST), bool(fields[FLAGS] & ALIVE)
+
+    def stats(self):
+        return {"snapshots": self.snapshots, "undecodable": self.undecodable, "corrections": self.corrections,
+                "replayed_frames": self.replayed_frames, "bytes_in": self.bytes_in, "dropped": self.link.dropped}
+
+
+def load_ghosts(directory=replay.REPLAY_DIR, seed=None, count=3):
+    # The best ``count`` replays in ``directory`` on ``seed`` (by default
+    # the seed of the best replay there); returns (seed, replays)
+    runs = []
+    for name in os.listdir(directory):
+        if name.endswith(".fbr"):
+            try:
+                runs.append(replay.load(os.path.join(directory, name)))
+            except (OSError, ValueError, struct.error):
+                pass
+    runs.sort(key=lambda run: -run.score)
+    if seed is None and runs:
+        seed = runs[0].seed
+    return seed, [run for run in runs if run.seed == seed][:count]
+
+
+async def serve(port, seed, ghost_dir, link):
+    ghosts = []
+    if ghost_dir:
+        seed, ghosts = load_ghosts(ghost_dir, seed)
+    server = NetServer(seed, ghosts=ghosts, link=link)
+    port = await server.start("0.0.0.0", port)
+    print(f"Race server on UDP port {port}, seed {server.seed}, {len(ghosts)} ghosts")
+    while True:
+        await asyncio.sleep(5)
+        stats = server.stats()
+        print(f"{stats['players']} players: tick {stats['mean_tick_ms']:.3f} ms mean / "
+              f"{stats['max_tick_ms']:.3f} ms max, {stats['out_bytes_per_client'] / 1024:.1f} KB/s out and "
+              f"{stats['in_bytes_per_client'] / 1024:.1f} KB/s in per client, "
+              f"deltas {stats['delta_ratio']:.0%} of full snapshots")
+
+
+def _option(name, default, kind=str):
+    return kind(sys.argv[sys.argv.index(name) + 1]) if name in sys.argv else default
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["server"]:
+        port = int(sys.argv[2]) if len(sys.argv) > 2 and sys.argv[2].isdigit() else PORT
+        link = LinkSimulator(_option("--loss", 0.0, float), _option("--latency", 0.0, float),
+                             _option("--jitter", 0.0, float))
+        asyncio.run(serve(port, _option("--seed", None, int), _option("--ghosts", None), link))
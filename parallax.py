@@ -0,0 +1,80 @@
+"""Scrolling parallax background.
+
+Each layer is a horizontal band of the screen that scrolls at its own
+fraction of the world's speed.  Its strip is prepared once: cropped, scaled
+to the band height, tiled side by side with its mirror image (so the wrap
+has no seam) and converted to the display format.  The strip is one
+repeat of the pattern plus a screen width more, so any scroll offset within
+the repeat is a single screen-wide blit from the strip: no second blit at
+the wrap, and no scaling or new surfaces per frame.
+
+Opaque layers stacked as bands cover each pixel exactly once, so a frame of
+the whole background blits as many pixels as one full-screen background
+blit.  A layer can hold several strips of the same size, such as day and
+night versions; ``draw()`` picks one with ``variant``.
+
+A band that barely moves (a distant sky) is better left out and kept in a
+static background: then only the moving bands are redrawn, and ``draw()``
+returns their rects so that a dirty-rect renderer presents just those.
+"""
+import pygame
+
+
+def make_strip(image, width, height, area=None):
+    # ``area`` of ``image`` scaled to ``height`` and tiled with its mirror
+    # image: one repeat of the pair plus ``width`` pixels
+    if area is not None:
+        image = image.subsurface(area)
+    scale = height / image.get_height()
+    tile = pygame.transform.smoothscale(image, (max(1, round(image.get_width() * scale)), height))
+    tiles = [tile, pygame.transform.flip(tile, True, False)]
+    alpha = bool(image.get_flags() & pygame.SRCALPHA)
+    strip = pygame.Surface((2 * tile.get_width() + width, height), pygame.SRCALPHA if alpha else 0)
+    for i in range(strip.get_width() // tile.get_width() + 1):
+        strip.blit(tiles[i % 2], (i * tile.get_width(), 0))
+    return strip.convert_alpha() if alpha else strip.convert()
+
+
+def shaded(strip, color):
+    # A copy of ``strip`` multiplied by ``color``, e.g. a night version
+    strip = strip.copy()
+    strip.fill(color, special_flags=pygame.BLEND_RGB_MULT)
+    return strip
+
+
+class Layer:
+    def __init__(self, strips, y, factor):
+        self.strips = strips
+        self.y = y
+        self.factor = factor  # Fraction of the scroll distance this layer moves
+        self.offset = 0.0
+        self.prev_offset = 0.0
+
+
+class ParallaxBackground:
+    def __init__(self, width, layers):
+        self.width = width
+        self.layers = layers
+
+    def scroll(self, distance):
+        # Move every layer on by ``distance`` pixels of world movement
+        for layer in self.layers:
+            layer.prev_offset = layer.offset
+            layer.offset = (layer.offset + distance * layer.factor) % (layer.strips[0].get_width() - self.width)
+
+    def reset(self):
+        for layer in self.layers:
+            layer.offset = layer.prev_offset = 0.0
+
+    def draw(self, surface, alpha=1.0, variant=0):
+        # Draw every layer ``alpha`` of the way from its previous offset to
+        # its current one; returns the rects drawn
+        width = self.width
+        rects = []
+        for layer in self.layers:
+            strip = layer.strips[min(variant, len(layer.strips) - 1)]
+            strip_width, height = strip.get_size()
+            repeat = strip_width - width
+            x = int(layer.prev_offset + (layer.offset - layer.prev_offset) % repeat * alpha) % repeat
+            rects.append(surface.blit(strip, (0, layer.y), (x, 0, width, height)))
+        return rects
@@ -0,0 +1,167 @@
+"""Struct-of-arrays particle engine.
+
+Live particles sit packed at the front of preallocated NumPy arrays, so an
+update is a handful of whole-array operations and dead particles are
+dropped by compacting the survivors in place.  Emission past ``capacity`` is
+dropped.
+
+Drawing never calls ``pygame.draw.circle`` per particle.  A few particles
+are stamped with pre-rendered discs in one ``Surface.blits`` call.  Past
+``raster_threshold`` the cost of even that per-particle Python work adds
+up, so the centres are scattered into a boolean image per colour and
+radius, dilated into discs with shifted ORs, and written straight into the
+surface's pixels; that costs the same for ten thousand particles as for a
+hundred thousand.
+"""
+import numpy as np
+import pygame
+
+
+class ParticleSystem:
+    def __init__(self, capacity=50000, max_size=5, seed=None, raster_threshold=2000):
+        self.capacity = capacity
+        self.max_size = max_size
+        self.raster_threshold = raster_threshold
+        self.count = 0
+        self.rng = np.random.default_rng(seed)
+
+        self.x = np.zeros(capacity, dtype=np.float32)
+        self.y = np.zeros(capacity, dtype=np.float32)
+        self.size = np.zeros(capacity, dtype=np.float32)
+        self.shrink = np.zeros(capacity, dtype=np.float32)
+        self.color = np.zeros(capacity, dtype=np.int32)  # Index into palette
+
+        self.palette = []
+        self._color_index = {}
+        self._stamps = []  # palette index * (max_size + 1) + radius -> Surface
+        self._mask = None  # Raster path scratch images, padded by max_size
+        self._discs = None
+        self._half_widths = [[int((radius * radius - dy * dy) ** 0.5) for dy in range(-radius, radius + 1)]
+                             for radius in range(max_size + 1)]
+
+        # Stats
+        self.dropped = 0
+
+    def _palette_index(self, color):
+        index = self._color_index.get(color)
+        if index is None:
+            index = len(self.palette)
+            self.palette.append(color)
+            self._color_index[color] = index
+            key = (0, 0, 0) if color != (0, 0, 0) else (255, 0, 255)
+            for radius in range(self.max_size + 1):
+                # Same disc as the raster path: rows of half-width
+                # floor(sqrt(r^2 - dy^2)) around the centre
+                stamp = pygame.Surface((radius * 2 + 1, radius * 2 + 1))
+                stamp.fill(key)
+                stamp.set_colorkey(key, pygame.RLEACCEL)
+                if radius:
+                    for dy, half in enumerate(self._half_widths[radius]):
+                        stamp.fill(color, (radius - half, dy, half * 2 + 1, 1))
+                self._stamps.append(stamp)
+        return index
+
+    def emit(self, x, y, color, count=1, spread=0.0, size=5, shrink=0.5):
+        # Add ``count`` particles around (x, y), ``spread`` pixels either way.
+        # Particles that do not fit are counted in ``dropped``.
+        requested = count
+        count = max(0, min(count, self.capacity - self.count))
+        self.dropped += requested - count
+        if not count:
+            return 0
+        start, end = self.count, self.count + count
+        if spread:
+            self.x[start:end] = x + self.rng.uniform(-spread, spread, count)
+            self.y[start:end] = y + self.rng.uniform(-spread, spread, count)
+        else:
+            self.x[start:end] = x
+            self.y[start:end] = y
+        self.size[start:end] = min(size, self.max_size)
+        self.shrink[start:end] = shrink
+        self.color[start:end] = self._palette_index(color)
+        self.count = end
+        return count
+
+    def update(self):
+        n = self.count
+        if not n:
+            return
+        self.x[:n] += self.rng.uniform(-1, 1, n).astype(np.float32)
+        self.y[:n] += self.rng.uniform(-1, 1, n).astype(np.float32)
+        self.size[:n] -= self.shrink[:n]
+
+        alive = self.size[:n] > 0
+        live = int(np.count_nonzero(alive))
+        if live != n:
+            for array in (self.x, self.y, self.size, self.shrink, self.color):
+                array[:live] = array[:n][alive]
+            self.count = live
+
+    def draw(self, surface):
+        n = self.count
+        if not n:
+            return
+        if n >= self.raster_threshold and surface.get_bytesize() == 4:
+            self._draw_raster(surface)
+            return
+        radius = self.size[:n].astype(np.int32)
+        visible = radius > 0
+        radius = radius[visible]
+        keys = (self.color[:n][visible] * (self.max_size + 1) + radius).tolist()
+        left = (self.x[:n][visible].astype(np.int32) - radius).tolist()
+        top = (self.y[:n][visible].astype(np.int32) - radius).tolist()
+        stamps = self._stamps
+        surface.blits([(stamps[key], (px, py)) for key, px, py in zip(keys, left, top)], doreturn=False)
+
+    def _draw_raster(self, surface):
+        n = self.count
+        pad = self.max_size
+        width, height = surface.get_size()
+        if self._mask is None or self._mask.shape != (width + 2 * pad, height + 2 * pad):
+            self._mask = np.zeros((width + 2 * pad, height + 2 * pad), dtype=bool)
+            self._discs = np.zeros_like(self._mask)
+        mask, discs = self._mask, self._discs
+
+        radius = self.size[:n].astype(np.int32)
+        px = self.x[:n].astype(np.int32) + pad
+        py = self.y[:n].astype(np.int32) + pad
+        onscreen = (radius > 0) & (px >= 0) & (px < width + 2 * pad) & (py >= 0) & (py < height + 2 * pad)
+        color = self.color[:n]
+
+        pixels = pygame.surfarray.pixels2d(surface)
+        try:
+            for index, rgb in enumerate(self.palette):
+                in_color = onscreen & (color == index)
+                if not in_color.any():
+                    continue
+                discs.fill(False)
+                for r in range(1, pad + 1):
+                    group = in_color & (radius == r)
+                    if not group.any():
+                        continue
+                    mask.fill(False)
+                    mask[px[group], py[group]] = True
+                    self._dilate_into(discs, mask, r)
+                pixels[discs[pad:pad + width, pad:pad + height]] = surface.map_rgb(rgb)
+        finally:
+            del pixels
+
+    def _dilate_into(self, out, centres, radius):
+        # out |= centres dilated by the disc of ``radius``: widen each row by
+        # every half-width the disc needs, then OR those rows in vertically.
+        widened = [centres]
+        for half in range(1, radius + 1):
+            row = widened[-1].copy()
+            row[half:, :] |= centres[:-half, :]
+            row[:-half, :] |= centres[half:, :]
+            widened.append(row)
+        for dy, half in zip(range(-radius, radius + 1), self._half_widths[radius]):
+            if dy < 0:
+                out[:, :dy] |= widened[half][:, -dy:]
+            elif dy > 0:
+                out[:, dy:] |= widened[half][:, :-dy]
+            else:
+                out |= widened[half]
+
+    def clear(self):
+        self.count = 0
@@ -0,0 +1,137 @@
+"""Per-phase timing of the main loop.
+
+Wrap a phase in ``with profiler.phase("name"):``.  Each phase keeps its last
+``capacity`` samples (start, duration, frame number) in preallocated ring
+buffers, so memory stays fixed however long the game runs.  While the
+profiler is disabled ``phase()`` hands back one shared do-nothing context
+manager and nothing is timed.
+
+``draw()`` paints rolling p50/p95/p99 per phase in the corner of the screen,
+re-rendered twice a second rather than every frame.  ``export_trace()``
+writes the buffered samples as Chrome trace events (open them in
+chrome://tracing or Perfetto); ``export_csv()`` writes one row per sample.
+"""
+import csv
+import json
+from contextlib import nullcontext
+from time import perf_counter
+
+import numpy as np
+import pygame
+
+_DISABLED = nullcontext()
+
+
+class _Phase:
+    __slots__ = ("name", "start_times", "durations", "frames", "count", "_profiler", "_start")
+
+    def __init__(self, name, capacity, profiler):
+        self.name = name
+        self.start_times = [0.0] * capacity
+        self.durations = [0.0] * capacity
+        self.frames = [0] * capacity
+        self.count = 0
+        self._profiler = profiler
+
+    def __enter__(self):
+        self._start = perf_counter()
+
+    def __exit__(self, *exc_info):
+        end = perf_counter()
+        i = self.count % len(self.durations)
+        self.start_times[i] = self._start
+        self.durations[i] = end - self._start
+        self.frames[i] = self._profiler.frame
+        self.count += 1
+
+    def samples(self):
+        # Buffered samples, oldest first
+        n = min(self.count, len(self.durations))
+        order = np.arange(self.count - n, self.count) % len(self.durations)
+        return np.array(self.start_times)[order], np.array(self.durations)[order], np.array(self.frames)[order]
+
+
+class Profiler:
+    def __init__(self, enabled=False, capacity=1200, refresh=30):
+        self.enabled = enabled
+        self.capacity = capacity
+        self.refresh = refresh  # Frames between overlay updates
+        self.frame = 0
+        self._phases = {}
+        self._origin = perf_counter()
+        self._font = None
+        self._overlay = None
+        self._overlay_frame = -refresh
+
+    def phase(self, name):
+        if not self.enabled:
+            return _DISABLED
+        phase = self._phases.get(name)
+        if phase is None:
+            phase = self._phases[name] = _Phase(name, self.capacity, self)
+        return phase
+
+    def end_frame(self):
+        self.frame += 1
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self._overlay = None
+
+    def percentiles(self):
+        # {phase: (p50, p95, p99)} in milliseconds over the buffered samples
+        result = {}
+        for name, phase in self._phases.items():
+            durations = phase.samples()[1]
+            if durations.size:
+                result[name] = tuple(np.percentile(durations, (50, 95, 99)) * 1000)
+        return result
+
+    def draw(self, surface, pos=(10, 130)):
+        # Overlay of the rolling percentiles; returns the rect drawn
+        if not self.enabled:
+            return None
+        if self._font is None:
+            self._font = pygame.font.SysFont("monospace", 14)  # Looked up only once the overlay is shown
+        if self._overlay is None or self.frame - self._overlay_frame >= self.refresh:
+            self._overlay = self._render_overlay(self._font)
+            self._overlay_frame = self.frame
+        return surface.blit(self._overlay, pos)
+
+    def _render_overlay(self, font):
+        lines = [f"{'phase':<16}{'p50':>7}{'p95':>7}{'p99':>7} ms"]
+        lines += [f"{name:<16}{p50:7.2f}{p95:7.2f}{p99:7.2f}" for name, (p50, p95, p99) in self.percentiles().items()]
+        rendered = [font.render(line, True, (255, 255, 255)) for line in lines]
+        width = max(text.get_width() for text in rendered) + 8
+        height = sum(text.get_height() for text in rendered) + 8
+        overlay = pygame.Surface((width, height), pygame.SRCALPHA)
+        overlay.fill((0, 0, 0, 160))
+        y = 4
+        for text in rendered:
+            overlay.blit(text, (4, y))
+            y += text.get_height()
+        return overlay
+
+    def export_trace(self, path="profile_trace.json"):
+        events = []
+        for name, phase in self._phases.items():
+            starts, durations, frames = phase.samples()
+            for start, duration, frame in zip(((starts - self._origin) * 1e6).tolist(),
+                                              (durations * 1e6).tolist(), frames.tolist()):
+                events.append({"name": name, "ph": "X", "ts": start, "dur": duration,
+                               "pid": 1, "tid": 1, "args": {"frame": frame}})
+        events.sort(key=lambda event: event["ts"])
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return path
+
+    def export_csv(self, path="profile.csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["phase", "frame", "start_ms", "duration_ms"])
+            for name, phase in self._phases.items():
+                starts, durations, frames = phase.samples()
+                for start, duration, frame in zip(((starts - self._origin) * 1000).tolist(),
+                                                  (durations * 1000).tolist(), frames.tolist()):
+                    writer.writerow([name, frame, f"{start:.3f}", f"{duration:.4f}"])
+        return path
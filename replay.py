@@ -0,0 +1,179 @@
+"""Compact run recordings and fast headless playback.
+
+A replay is the run's seed plus the frames on which the player jumped, which
+is all flappy_sim needs to reproduce the run exactly.  Jumps are stored as
+varint gaps between jump frames and the payload is zlib-compressed, so a
+few thousand frames come to a few dozen to a few hundred bytes.  Shop clicks
+made before the run are kept too, for bug reports; they do not affect the
+run, since starting a game resets any shop power-up.
+
+Playback steps the simulation with no display at all, so verifying a replay
+takes milliseconds.  From the command line:
+
+    python replay.py verify replays/        # check every replay, all cores
+    python replay.py show replays/run.fbr
+"""
+import os
+import struct
+import sys
+import zlib
+
+import flappy_sim
+
+REPLAY_DIR = "replays"
+_HEADER = struct.Struct("<4sBQII")
+_MAGIC = b"FBRP"
+_VERSION = 2  # 2: pipes and power-ups from the seeded course
+
+
+class Replay:
+    __slots__ = ("seed", "frames", "score", "jumps", "clicks")
+
+    def __init__(self, seed, frames=0, score=0, jumps=None, clicks=None):
+        self.seed = seed
+        self.frames = frames
+        self.score = score
+        self.jumps = jumps if jumps is not None else []  # Frame numbers with a jump
+        self.clicks = clicks if clicks is not None else []  # Shop clicks (x, y)
+
+
+class Recorder:
+    def __init__(self):
+        self.replay = None
+        self._clicks = []
+
+    def click(self, pos):
+        # Shop clicks since the last run are attached to the next one
+        self._clicks.append((pos[0], pos[1]))
+
+    def start(self, seed):
+        self.replay = Replay(seed, clicks=self._clicks)
+        self._clicks = []
+
+    def record(self, jump):
+        if jump:
+            self.replay.jumps.append(self.replay.frames)
+        self.replay.frames += 1
+
+    def finish(self, score):
+        replay = self.replay
+        replay.score = score
+        self.replay = None
+        return replay
+
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def encode(replay):
+    payload = bytearray()
+    _write_varint(payload, len(replay.jumps))
+    last = 0
+    for frame in replay.jumps:
+        _write_varint(payload, frame - last)
+        last = frame
+    _write_varint(payload, len(replay.clicks))
+    for x, y in replay.clicks:
+        _write_varint(payload, x)
+        _write_varint(payload, y)
+    return _HEADER.pack(_MAGIC, _VERSION, replay.seed, replay.frames, replay.score) + zlib.compress(bytes(payload), 9)
+
+
+def decode(data):
+    magic, version, seed, frames, score = _HEADER.unpack_from(data)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError("not a replay file")
+    payload = zlib.decompress(data[_HEADER.size:])
+    count, pos = _read_varint(payload, 0)
+    jumps = []
+    frame = 0
+    for _ in range(count):
+        gap, pos = _read_varint(payload, pos)
+        frame += gap
+        jumps.append(frame)
+    count, pos = _read_varint(payload, pos)
+    clicks = []
+    for _ in range(count):
+        x, pos = _read_varint(payload, pos)
+        y, pos = _read_varint(payload, pos)
+        clicks.append((x, y))
+    return Replay(seed, frames, score, jumps, clicks)
+
+
+def save(replay, directory=REPLAY_DIR):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{replay.seed:016x}_{replay.score}.fbr")
+    with open(path, "wb") as f:
+        f.write(encode(replay))
+    return path
+
+
+def load(path):
+    with open(path, "rb") as f:
+        return decode(f.read())
+
+
+def play(replay):
+    # Re-run the recorded inputs; returns (score, frames played, died).
+    state = flappy_sim.SimState(replay.seed)
+    step = flappy_sim.step
+    jumps = set(replay.jumps)
+    for frame in range(replay.frames):
+        step(state, frame in jumps)
+        if not state.alive:
+            return state.score, frame + 1, True
+    return state.score, replay.frames, False
+
+
+def verify(replay):
+    # A replay checks out if it dies exactly on its last frame with the
+    # score it claims.
+    score, frames, died = play(replay)
+    return died and frames == replay.frames and score == replay.score
+
+
+def _verify_file(path):
+    try:
+        return path, verify(load(path))
+    except (OSError, ValueError, struct.error, zlib.error):
+        return path, False
+
+
+def verify_dir(directory=REPLAY_DIR, processes=None):
+    # Verify every replay in ``directory`` across a process pool; returns
+    # {path: ok}.
+    from multiprocessing import Pool  # Not imported with the game, which only records
+
+    paths = sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".fbr"))
+    with Pool(processes) as pool:
+        return dict(pool.map(_verify_file, paths, chunksize=max(1, len(paths) // 64)))
+
+
+if __name__ == "__main__":
+    command, target = sys.argv[1], sys.argv[2]
+    if command == "verify":
+        results = verify_dir(target) if os.path.isdir(target) else dict([_verify_file(target)])
+        for path, ok in results.items():
+            if not ok:
+                print(f"FAILED {path}")
+        print(f"{sum(results.values())}/{len(results)} replays verified")
+        sys.exit(0 if all(results.values()) else 1)
+    elif command == "show":
+        replay = load(target)
+        print(f"seed {replay.seed:#x}, {replay.frames} frames, score {replay.score}, "
+              f"{len(replay.jumps)} jumps, {len(replay.clicks)} shop clicks")
@@ -0,0 +1,221 @@
+"""Run history in SQLite.
+
+Every finished run is one row of ``runs``: the game, when it started, its
+seed, score, level reached, power-ups collected, bosses killed, duration
+and cause of death.  ``RunHistory.record()`` only queues the row; a writer
+thread inserts whatever has queued as one transaction when ``batch`` rows
+are waiting or ``interval`` seconds have passed, so the frame never waits on
+the database.  The database is in WAL mode, so queries from the game thread
+read alongside the writer.
+
+Queries stay fast as the table grows into millions of rows:
+
+* leaderboards read the top of an index on (game, score), or on
+  (game, day, score) for one day;
+* the same transaction keeps a score histogram per game and a summary row
+  per game and day, so percentiles and daily stats add up a few hundred
+  rows instead of scanning every run.
+
+Under pygbag, which has no threads, rows are written in batches from
+``record()`` instead.
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import date
+
+from background_io import THREADS
+
+HISTORY_FILE = "run_history.db"
+FIELDS = ("game", "started", "day", "seed", "score", "level", "power_ups", "boss_kills", "duration", "cause")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    game TEXT NOT NULL,
+    started REAL NOT NULL,
+    day TEXT NOT NULL,
+    seed INTEGER,
+    score INTEGER NOT NULL,
+    level INTEGER NOT NULL DEFAULT 0,
+    power_ups INTEGER NOT NULL DEFAULT 0,
+    boss_kills INTEGER NOT NULL DEFAULT 0,
+    duration REAL NOT NULL DEFAULT 0,
+    cause TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_by_score ON runs (game, score DESC);
+CREATE INDEX IF NOT EXISTS runs_by_day ON runs (game, day, score DESC);
+CREATE TABLE IF NOT EXISTS score_counts (
+    game TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    runs INTEGER NOT NULL,
+    PRIMARY KEY (game, score)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS daily (
+    game TEXT NOT NULL,
+    day TEXT NOT NULL,
+    runs INTEGER NOT NULL,
+    best INTEGER NOT NULL,
+    total_score INTEGER NOT NULL,
+    total_duration REAL NOT NULL,
+    PRIMARY KEY (game, day)
+) WITHOUT ROWID;
+"""
+
+
+def _connect(path):
+    connection = sqlite3.connect(path, timeout=10.0)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+class RunHistory:
+    def __init__(self, path=HISTORY_FILE, batch=256, interval=1.0):
+        self.path = path
+        self.batch = batch
+        self.interval = interval
+        with _connect(path) as connection:
+            connection.executescript(_SCHEMA)
+        connection.close()
+        self._reader = None  # Connection for queries, made by the thread that queries
+        self._queue = queue.Queue()
+        self._pending = []  # Rows queued without a writer thread
+        self._thread = None
+
+        # Stats
+        self.inserted = 0
+        self.batches = 0
+        self.write_time = 0.0
+        self.max_write_time = 0.0
+
+        if THREADS:
+            self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+            self._thread.start()
+
+    def record(self, game, score, seed=None, level=0, power_ups=0, boss_kills=0, duration=0.0, cause=None,
+               started=None):
+        # Queue one finished run
+        started = time.time() if started is None else started
+        row = (game, started, date.fromtimestamp(started).isoformat(), seed, score, level, power_ups, boss_kills,
+               duration, cause)
+        if self._thread is not None:
+            self._queue.put(row)
+        else:
+            self._pending.append(row)
+            if len(self._pending) >= self.batch:
+                self._write(self._connection(), self._pending)
+                self._pending = []
+
+    def close(self):
+        # Write everything still queued and stop the writer
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        if self._pending:
+            self._write(self._connection(), self._pending)
+            self._pending = []
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    def _run(self):
+        connection = _connect(self.path)
+        rows = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.perf_counter())
+            try:
+                row = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                row = False  # The oldest queued row has waited ``interval``
+            if row:
+                rows.append(row)
+                if deadline is None:
+                    deadline = time.perf_counter() + self.interval
+                if len(rows) < self.batch:
+                    continue
+            if rows:
+                self._write(connection, rows)
+                rows = []
+                deadline = None
+            if row is None:
+                connection.close()
+                return
+
+    def _write(self, connection, rows):
+        start = time.perf_counter()
+        days = {}
+        scores = {}
+        for game, _, day, _, score, _, _, _, duration, _ in rows:
+            runs, best, total, seconds = days.get((game, day), (0, score, 0, 0.0))
+            days[game, day] = (runs + 1, max(best, score), total + score, seconds + duration)
+            scores[game, score] = scores.get((game, score), 0) + 1
+        with connection:
+            connection.executemany(f"INSERT INTO runs ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))})",
+                                   rows)
+            connection.executemany("INSERT INTO score_counts VALUES (?, ?, ?) ON CONFLICT (game, score) DO UPDATE "
+                                   "SET runs = runs + excluded.runs",
+                                   [(game, score, runs) for (game, score), runs in scores.items()])
+            connection.executemany("INSERT INTO daily VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (game, day) DO UPDATE "
+                                   "SET runs = runs + excluded.runs, best = max(best, excluded.best), "
+                                   "total_score = total_score + excluded.total_score, "
+                                   "total_duration = total_duration + excluded.total_duration",
+                                   [(game, day, *summary) for (game, day), summary in days.items()])
+        elapsed = time.perf_counter() - start
+        self.inserted += len(rows)
+        self.batches += 1
+        self.write_time += elapsed
+        self.max_write_time = max(self.max_write_time, elapsed)
+
+    def _connection(self):
+        if self._reader is None:
+            self._reader = _connect(self.path)
+            self._reader.row_factory = sqlite3.Row
+        return self._reader
+
+    def leaderboard(self, game, limit=10, day=None):
+        # Best runs, all time or on ``day`` (a date or "YYYY-MM-DD")
+        if day is None:
+            rows = self._connection().execute("SELECT * FROM runs WHERE game = ? ORDER BY score DESC LIMIT ?",
+                                              (game, limit))
+        else:
+            rows = self._connection().execute("SELECT * FROM runs WHERE game = ? AND day = ? "
+                                              "ORDER BY score DESC LIMIT ?", (game, str(day), limit))
+        return [dict(row) for row in rows]
+
+    def percentile(self, game, score):
+        # Percentage of recorded runs that scored below ``score``
+        below, total = self._connection().execute(
+            "SELECT coalesce(sum(CASE WHEN score < ? THEN runs END), 0), coalesce(sum(runs), 0) "
+            "FROM score_counts WHERE game = ?", (score, game)).fetchone()
+        return 100.0 * below / total if total else 0.0
+
+    def score_at(self, game, percentile):
+        # Lowest score at or above ``percentile`` percent of the runs
+        counts = self._connection().execute("SELECT score, runs FROM score_counts WHERE game = ? ORDER BY score",
+                                            (game,)).fetchall()
+        target = sum(runs for _, runs in counts) * percentile / 100
+        seen = 0
+        for score, runs in counts:
+            seen += runs
+            if seen >= target:
+                return score
+        return 0
+
+    def days(self, game, limit=7):
+        # Runs, best and mean score and time played for the latest days
+        rows = self._connection().execute("SELECT * FROM daily WHERE game = ? ORDER BY day DESC LIMIT ?",
+                                          (game, limit))
+        return [{"day": row["day"], "runs": row["runs"], "best": row["best"],
+                 "mean": row["total_score"] / row["runs"], "seconds": row["total_duration"]} for row in rows]
+
+    def stats(self):
+        return {"inserted": self.inserted, "batches": self.batches,
+                "queued": self._queue.qsize() + len(self._pending),
+                "mean_batch_ms": self.write_time / self.batches * 1000 if self.batches else 0.0,
+                "max_batch_ms": self.max_write_time * 1000,
+                "size_mb": os.path.getsize(self.path) / 2 ** 20 if os.path.exists(self.path) else 0.0}
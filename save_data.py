@@ -0,0 +1,194 @@
+"""Write-behind persistence for game_data.txt.
+
+The games used to rewrite the save file synchronously (import_pygame.py did
+it every frame).  ``SaveStore`` keeps the saved fields in memory, notes which
+ones changed, and writes them from a background thread: after ``debounce``
+seconds for routine changes, straight away for ``flush(immediate=True)``,
+and once more, synchronously, on ``close()``.  Given a
+background_io.BackgroundTasks, the store schedules its writes there instead
+of running a thread of its own (the asyncio loop, which under pygbag has no
+threads).  Writes go to a temporary file
+that is renamed over the save, so a crash never leaves a half-written file.
+
+The file is a small versioned JSON document shared by both games; each game
+only touches its own achievements, so the other's survive.  The old
+comma-separated format is still read and is replaced on the next write.
+"""
+import json
+import os
+import threading
+import time
+
+SAVE_VERSION = 2
+
+
+def default_data():
+    return {
+        "version": SAVE_VERSION,
+        "high_score": 0,
+        "coins": 0,
+        "achievements": {},
+        "unlocked_colors": None,
+        "daily_challenge": None,
+    }
+
+
+def parse_legacy(lines):
+    # "high_score,coins", then "name,True/False" per achievement, then
+    # (flappy pygame 2.py only) "completed,date" for the daily challenge.
+    if not lines:
+        raise ValueError("save file is empty")
+    data = default_data()
+    data["high_score"], data["coins"] = map(int, lines[0].strip().split(','))
+    for line in lines[1:]:
+        fields = line.strip().split(',')
+        if len(fields) < 2:
+            continue
+        if fields[0] in ("True", "False"):
+            data["daily_challenge"] = {"completed": fields[0] == "True",
+                                       "date": None if fields[1] == "None" else fields[1]}
+        else:
+            data["achievements"][fields[0]] = fields[1] == "True"
+    return data
+
+
+class SaveStore:
+    def __init__(self, path="game_data.txt", debounce=2.0, tasks=None):
+        self.path = path
+        self.debounce = debounce
+        self.tasks = tasks
+        self.data = default_data()
+        self.dirty = set()
+
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._dirty_since = None
+        self._immediate = False
+        self._closed = False
+        self._thread = None
+        self._scheduled = False  # A write is queued on ``tasks``
+        self._write_lock = threading.Lock()
+
+        # Stats
+        self.writes = 0
+        self.write_time = 0.0
+        self.max_write_time = 0.0
+        self.max_latency = 0.0  # First change to durable write
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                text = f.read()
+            if not text.lstrip()[:1].isdigit():  # Legacy saves start with the high score
+                saved = json.loads(text)
+                if not isinstance(saved, dict):
+                    raise ValueError(f"save file holds a {type(saved).__name__}, not an object")
+                data = default_data()
+                data.update(saved)
+            else:
+                data = parse_legacy(text.splitlines())
+        except FileNotFoundError:
+            print("No save file found. Starting with default values.")
+            data = default_data()
+        except (OSError, ValueError) as e:
+            print(f"Error loading game data: {e}")
+            print("Starting with default values.")
+            data = default_data()
+        with self._lock:
+            self.data = data
+            self.dirty.clear()
+        return data
+
+    def update(self, **fields):
+        # Record new values; only fields that actually changed make the
+        # store dirty.  Dict fields are merged so each game keeps the
+        # other's keys.
+        with self._lock:
+            for name, value in fields.items():
+                old = self.data.get(name)
+                if isinstance(value, dict) and isinstance(old, dict):
+                    value = {**old, **value}
+                if isinstance(value, list):
+                    value = list(value)
+                if value != old:
+                    self.data[name] = value
+                    self.dirty.add(name)
+            if self.dirty and self._dirty_since is None:
+                self._dirty_since = time.perf_counter()
+
+    def flush(self, immediate=False):
+        # Ask the writer thread to save: now, or after the debounce interval.
+        with self._lock:
+            if not self.dirty:
+                return
+            if self.tasks is not None:
+                if immediate or not self._scheduled:
+                    delay = 0.0 if immediate else self._dirty_since + self.debounce - time.perf_counter()
+                    self._scheduled = True
+                    self.tasks.submit(self._write, delay=max(0.0, delay))
+                return
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="save-writer", daemon=True)
+                self._thread.start()
+            self._immediate = self._immediate or immediate
+            self._wake.notify()
+
+    def close(self):
+        # Stop the writer and make sure everything is on disk.
+        with self._lock:
+            self._closed = True
+            self._wake.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._write()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._closed:
+                    if self.dirty and self._immediate:
+                        break
+                    if self.dirty:
+                        remaining = self._dirty_since + self.debounce - time.perf_counter()
+                        if remaining <= 0:
+                            break
+                        self._wake.wait(remaining)
+                    else:
+                        self._wake.wait()
+                if self._closed:
+                    return
+            self._write()
+
+    def _write(self):
+        with self._write_lock:
+            with self._lock:
+                self._scheduled = False
+                if not self.dirty:
+                    return
+                text = json.dumps(self.data, indent=1)
+                dirty_since = self._dirty_since
+                self.dirty.clear()
+                self._dirty_since = None
+                self._immediate = False
+
+            start = time.perf_counter()
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            end = time.perf_counter()
+
+        self.writes += 1
+        self.write_time += end - start
+        self.max_write_time = max(self.max_write_time, end - start)
+        self.max_latency = max(self.max_latency, end - dirty_since)
+
+    def stats(self):
+        return {"writes": self.writes,
+                "mean_write_ms": self.write_time / self.writes * 1000 if self.writes else 0.0,
+                "max_write_ms": self.max_write_time * 1000,
+                "max_latency_ms": self.max_latency * 1000,
+                "dirty": sorted(self.dirty)}
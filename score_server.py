@@ -0,0 +1,91 @@
+"""Local stand-in for the online score server.
+
+A minimal HTTP server on asyncio streams: ``POST /scores`` with a JSON body
+appends the run to the list, ``GET /scores`` returns the top scores as JSON.
+Scores are kept in ``scores.json`` (rewritten on a thread so a slow disk
+never holds up a request).  Run it beside the game:
+
+    python score_server.py [port]
+"""
+import asyncio
+import json
+import os
+import sys
+
+PORT = 8765
+SCORES_FILE = "scores.json"
+_REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found"}
+
+
+class ScoreServer:
+    def __init__(self, path=SCORES_FILE, top=10):
+        self.path = path
+        self.top = top
+        self.scores = []
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.scores = json.load(f)
+        self._server = None
+        self._save_lock = asyncio.Lock()
+
+        # Stats
+        self.requests = 0
+
+    async def start(self, host="127.0.0.1", port=PORT):
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        try:
+            method, target, _ = (await reader.readline()).decode().split(" ", 2)
+            length = 0
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                name, _, value = line.decode().partition(":")
+                if name.strip().lower() == "content-length":
+                    length = int(value)
+            body = await reader.readexactly(length)
+            status, reply = await self._route(method, target, body)
+        except (ValueError, asyncio.IncompleteReadError):
+            status, reply = 400, {"error": "bad request"}
+        data = json.dumps(reply).encode()
+        writer.write(f"HTTP/1.1 {status} {_REASONS[status]}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode() + data)
+        await writer.drain()
+        writer.close()
+
+    async def _route(self, method, target, body):
+        self.requests += 1
+        if target != "/scores":
+            return 404, {"error": "not found"}
+        if method == "GET":
+            return 200, sorted(self.scores, key=lambda run: -run.get("score", 0))[:self.top]
+        if method == "POST":
+            run = json.loads(body)
+            if not isinstance(run, dict):
+                raise ValueError("run must be an object")
+            self.scores.append(run)
+            if self.path:
+                async with self._save_lock:
+                    await asyncio.to_thread(self._save, list(self.scores))
+            return 201, {"rank": sum(r.get("score", 0) > run.get("score", 0) for r in self.scores) + 1}
+        return 404, {"error": "not found"}
+
+    def _save(self, scores):
+        with open(self.path + ".tmp", "w") as f:
+            json.dump(scores, f)
+        os.replace(self.path + ".tmp", self.path)
+
+
+async def main(port):
+    server = ScoreServer()
+    port = await server.start(port=port)
+    print(f"Score server on http://127.0.0.1:{port}/scores")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else PORT))
@@ -0,0 +1,66 @@
+"""Pre-rotated sprite cache.
+
+``pygame.transform.rotate`` allocates and resamples a new surface every
+call.  The bird tilt only needs a few dozen distinct angles, so
+``RotationCache`` quantises the angle to ``step`` degrees and hands back a
+surface rotated once, either up front for ``angle_range`` or lazily for
+angles outside it.  Angles are wrapped to a single turn first, so there are
+at most 360 / ``step`` keys, and past ``max_entries`` the least recently
+used surface is dropped.
+"""
+from collections import OrderedDict
+
+import pygame
+
+
+class RotationCache:
+    def __init__(self, image, step=2.0, angle_range=(-60, 30), max_entries=256):
+        self.image = image
+        self.step = step
+        self.max_entries = max_entries
+        self._surfaces = OrderedDict()  # quantised angle index -> surface
+
+        # Stats
+        self.hits = 0
+        self.misses = 0
+
+        if angle_range is not None:
+            low, high = angle_range
+            for index in range(round(low / step), round(high / step) + 1):
+                self._surfaces[index] = pygame.transform.rotate(image, index * step)
+
+    def _index(self, angle):
+        # Quantised angle, wrapped to [-180, 180) first
+        return round(((angle + 180) % 360 - 180) / self.step)
+
+    def get(self, angle):
+        index = self._index(angle)
+        surface = self._surfaces.get(index)
+        if surface is not None:
+            self.hits += 1
+            self._surfaces.move_to_end(index)
+            return surface
+
+        self.misses += 1
+        surface = pygame.transform.rotate(self.image, index * self.step)
+        self._surfaces[index] = surface
+        if len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False)
+        return surface
+
+    def error(self, angle):
+        # Fraction of opaque pixels that differ between the cached sprite and
+        # a live rotate at the exact angle, centres aligned.
+        live = pygame.mask.from_surface(pygame.transform.rotate(self.image, angle))
+        # Looks the bucket up directly rather than through get(), so that
+        # checking errors leaves the hit/miss counts alone.
+        index = self._index(angle)
+        surface = self._surfaces.get(index)
+        if surface is None:
+            surface = pygame.transform.rotate(self.image, index * self.step)
+        cached = pygame.mask.from_surface(surface)
+        offset = ((live.get_size()[0] - cached.get_size()[0]) // 2,
+                  (live.get_size()[1] - cached.get_size()[1]) // 2)
+        overlap = live.overlap_area(cached, offset)
+        total = live.count() + cached.count()
+        return (total - 2 * overlap) / total if total else 0.0
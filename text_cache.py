@@ -0,0 +1,49 @@
+"""LRU cache of rendered text surfaces.
+
+``font.render`` rasterises the glyphs every call, even when the HUD string
+has not changed since the last frame.  ``TextCache.render`` takes the same
+arguments and hands back the surface rendered the first time, so a string is
+only rasterised again when its value (or font, antialias or colour) changes.
+"""
+from collections import OrderedDict
+
+
+class TextCache:
+    def __init__(self, max_bytes=2 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._surfaces = OrderedDict()  # (font, text, antialias, color) -> surface
+
+        # Stats
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, font, text, antialias, color):
+        key = (font, text, antialias, color)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        size = surface.get_pitch() * surface.get_height()
+        self._surfaces[key] = surface
+        self.bytes += size
+
+        # Evict least recently used, but never the surface just rendered
+        while self.bytes > self.max_bytes and len(self._surfaces) > 1:
+            _, old = self._surfaces.popitem(last=False)
+            self.bytes -= old.get_pitch() * old.get_height()
+            self.evictions += 1
+        return surface
+
+    def clear(self):
+        self._surfaces.clear()
+        self.bytes = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": len(self._surfaces), "bytes": self.bytes}
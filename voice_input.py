@@ -0,0 +1,391 @@
+"""Offline voice and clap input.
+
+The old voice control sent speech to an online recognizer, which needs the
+network and answers hundreds of milliseconds late.  Here microphone audio is
+read in 10 ms frames on a dedicated thread, kept in a ring buffer, and run
+through an onset detector: a frame whose energy jumps well above the
+adaptive noise floor (``method="energy"``), or whose log spectrum rises
+sharply across the band (``method="flux"``), is a clap or the start of a
+word.  Each onset posts ``VOICE_JUMP`` to the pygame event queue, which is
+safe from any thread, so the jump arrives one frame of audio plus the
+detection time after the sound starts.
+
+A ``KeywordMatcher`` can gate the onsets: it compares the band energies of
+the first few frames of the sound with templates learnt from example
+recordings (a clap, "up") and drops onsets that match none.  It needs its
+window of audio after the onset, so keep the window short (30 ms) to stay
+under 50 ms.
+
+The microphone is read with PyAudio, which is optional; without it voice
+input is unavailable and the game says so.  A ``WavSource`` feeds a WAV file
+through the same thread and detector instead, and ``evaluate()`` scores the
+detections against the labelled onsets of a recording:
+
+    python voice_input.py synth test.wav        # claps, "up"s and distractors
+    python voice_input.py eval test.wav         # labels from test.txt
+    python voice_input.py eval test.wav --keywords claps.wav
+"""
+import os
+import sys
+import threading
+import time
+import wave
+from collections import deque
+
+import numpy as np
+import pygame
+
+try:
+    import pyaudio
+except ImportError:
+    pyaudio = None
+
+RATE = 16000
+FRAME = 160  # 10 ms at RATE
+
+VOICE_JUMP = pygame.event.custom_type()
+
+
+class RingBuffer:
+    def __init__(self, capacity):
+        self.data = np.zeros(capacity, dtype=np.float32)
+        self.written = 0  # Samples written since the start
+
+    def write(self, samples):
+        n = len(samples)
+        capacity = len(self.data)
+        if n >= capacity:
+            self.data[:] = samples[-capacity:]
+            self.written += n
+            return
+        start = self.written % capacity
+        end = start + n
+        if end <= capacity:
+            self.data[start:end] = samples
+        else:
+            self.data[start:] = samples[:capacity - start]
+            self.data[:end - capacity] = samples[capacity - start:]
+        self.written += n
+
+    def latest(self, n):
+        # The last ``n`` samples written, oldest first
+        end = self.written % len(self.data)
+        return np.roll(self.data, -end)[len(self.data) - n:]
+
+
+def band_energies(frame, bands=8):
+    # Log energy in ``bands`` log-spaced bands of one frame's spectrum
+    spectrum = np.abs(np.fft.rfft(frame * np.hanning(len(frame)))) ** 2
+    edges = np.unique(np.geomspace(1, len(spectrum), bands + 1).astype(int))
+    return np.log(np.add.reduceat(spectrum, edges[:-1]) + 1e-9)
+
+
+class OnsetDetector:
+    def __init__(self, method="energy", rate=RATE, threshold_db=12.0, rise_db=9.0, min_db=-50.0,
+                 flux_threshold=2.0, refractory=0.15, floor_rate=0.05):
+        self.method = method
+        self.rate = rate
+        self.threshold_db = threshold_db  # Above the noise floor
+        self.rise_db = rise_db  # Over the last 30 ms, so swells don't count
+        self.min_db = min_db  # Absolute level (dBFS) an onset must reach
+        self.flux_threshold = flux_threshold
+        self.refractory = refractory  # Seconds after an onset with no other
+        self.floor_rate = floor_rate
+        self.reset()
+
+    def reset(self):
+        self.floor = None
+        self._recent = deque(maxlen=3)  # Levels of the previous frames
+        self._recent_bands = deque(maxlen=3)
+        self._quiet_until = 0
+        self._active = False
+        self.frames = 0
+
+    def process(self, frame):
+        # True if an onset ends in this frame
+        self.frames += 1
+        db = 10 * np.log10(float(np.mean(frame * frame)) + 1e-10)
+        if self.floor is None:
+            self.floor = db
+        if self.method == "flux":
+            bands = band_energies(frame, 16)
+            reference = np.min(self._recent_bands, axis=0) if self._recent_bands else bands
+            flux = float(np.maximum(bands - reference, 0).mean())
+            self._recent_bands.append(bands)
+            rising = flux > self.flux_threshold
+        else:
+            rising = db - min(self._recent, default=db) > self.rise_db
+        self._recent.append(db)
+
+        loud = db > self.floor + self.threshold_db and db > self.min_db
+        onset = loud and rising and not self._active and self.frames >= self._quiet_until
+        if onset:
+            self._active = True
+            self._quiet_until = self.frames + int(self.refractory * self.rate / len(frame))
+        elif self._active and db < self.floor + self.threshold_db / 2:
+            self._active = False
+        if not self._active:
+            # Track the background level (faster down than up)
+            rate = self.floor_rate if db > self.floor else 4 * self.floor_rate
+            self.floor += (db - self.floor) * rate
+        return onset
+
+
+class KeywordMatcher:
+    def __init__(self, templates=(), window=3, threshold=0.6):
+        self.templates = [np.asarray(t) for t in templates]
+        self.window = window  # Frames from the onset frame on
+        self.threshold = threshold  # Cosine similarity
+
+    @staticmethod
+    def features(samples, frame=FRAME):
+        # Mean-removed, unit-length band energies of consecutive frames
+        feature = np.concatenate([band_energies(samples[i:i + frame]) for i in range(0, len(samples), frame)])
+        feature -= feature.mean()
+        return feature / (np.linalg.norm(feature) + 1e-9)
+
+    def matches(self, samples):
+        if not self.templates:
+            return True
+        feature = self.features(samples)
+        return max(float(feature @ t) for t in self.templates) >= self.threshold
+
+    @classmethod
+    def from_wavs(cls, paths, window=3, threshold=0.6, detector=None):
+        # Templates from every onset the detector finds in example recordings
+        templates = []
+        for path in paths:
+            samples = read_wav(path)
+            detector = detector or OnsetDetector()
+            detector.reset()
+            for i in range(0, len(samples) - (window + 1) * FRAME, FRAME):
+                if detector.process(samples[i:i + FRAME]):
+                    templates.append(cls.features(samples[i:i + window * FRAME]))
+        return cls(templates, window, threshold)
+
+
+def read_wav(path, rate=RATE):
+    # Mono float32 samples in [-1, 1] at ``rate``
+    with wave.open(path, "rb") as f:
+        width, channels, source_rate = f.getsampwidth(), f.getnchannels(), f.getframerate()
+        raw = f.readframes(f.getnframes())
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    else:
+        samples = np.frombuffer(raw, dtype={2: "<i2", 4: "<i4"}[width]).astype(np.float32) / 2 ** (8 * width - 1)
+    samples = samples.reshape(-1, channels).mean(axis=1)
+    if source_rate != rate:
+        positions = np.arange(0, len(samples) - 1, source_rate / rate)
+        samples = np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+    return samples
+
+
+def write_wav(path, samples, rate=RATE):
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes((np.clip(samples, -1, 1) * 32767).astype("<i2").tobytes())
+
+
+class WavSource:
+    def __init__(self, path, realtime=False):
+        self.samples = read_wav(path)
+        self.realtime = realtime  # Pace reads like a microphone would
+        self._position = 0
+        self._start = None
+
+    def read(self):
+        # The next frame, or None at the end of the file
+        if self._position + FRAME > len(self.samples):
+            return None
+        if self.realtime:
+            if self._start is None:
+                self._start = time.perf_counter()
+            delay = self._start + (self._position + FRAME) / RATE - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        frame = self.samples[self._position:self._position + FRAME]
+        self._position += FRAME
+        return frame
+
+    def close(self):
+        pass
+
+
+class MicrophoneSource:
+    def __init__(self):
+        if pyaudio is None:
+            raise RuntimeError("voice input needs PyAudio")
+        self._audio = pyaudio.PyAudio()
+        self._stream = self._audio.open(format=pyaudio.paInt16, channels=1, rate=RATE, input=True,
+                                        frames_per_buffer=FRAME)
+
+    def read(self):
+        data = self._stream.read(FRAME, exception_on_overflow=False)
+        return np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768
+
+    def close(self):
+        self._stream.stop_stream()
+        self._stream.close()
+        self._audio.terminate()
+
+
+class VoiceTrigger:
+    def __init__(self, source, detector=None, matcher=None, post=None):
+        self.source = source
+        self.detector = detector or OnsetDetector()
+        self.matcher = matcher
+        self.post = post or (lambda position: pygame.event.post(pygame.event.Event(VOICE_JUMP, position=position)))
+        self.ring = RingBuffer(RATE)  # One second of history
+        self._stop = threading.Event()
+        self._thread = None
+
+        # Stats
+        self.onsets = []  # Sample positions of the detections
+        self.triggers = []  # Sample positions of the jumps posted
+        self.rejected = 0  # Onsets the matcher turned down
+        self.frame_time = 0.0
+        self.max_frame_time = 0.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="voice-input", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.source.close()
+
+    def run(self):
+        # Read and analyse frames until the source ends or stop()
+        pending = None  # Sample position of an onset awaiting the matcher
+        while not self._stop.is_set():
+            frame = self.source.read()
+            if frame is None:
+                return
+            start = time.perf_counter()
+            self.ring.write(frame)
+            position = self.ring.written
+            if self.detector.process(frame):
+                self.onsets.append(position)
+                pending = position - len(frame)
+            if pending is not None:
+                window = self.matcher.window * len(frame) if self.matcher else 0
+                if position - pending >= window:
+                    if not window or self.matcher.matches(self.ring.latest(position - pending)[:window]):
+                        self.triggers.append(position)
+                        self.post(position)
+                    else:
+                        self.rejected += 1
+                    pending = None
+            elapsed = time.perf_counter() - start
+            self.frame_time += elapsed
+            self.max_frame_time = max(self.max_frame_time, elapsed)
+
+    def stats(self):
+        frames = self.detector.frames
+        return {"frames": frames, "onsets": len(self.onsets), "triggers": len(self.triggers),
+                "rejected": self.rejected,
+                "mean_frame_us": self.frame_time / frames * 1e6 if frames else 0.0,
+                "max_frame_us": self.max_frame_time * 1e6}
+
+
+def load_labels(path):
+    # Onset times in seconds, one per line; "#" starts a comment
+    with open(path) as f:
+        return [float(line.split("#")[0]) for line in f if line.split("#")[0].strip()]
+
+
+def evaluate(path, labels=None, detector=None, matcher=None, tolerance=0.1):
+    # Run a WAV file through the trigger thread and score the jumps against
+    # labelled onsets (default: the .txt beside the file).  Latency is from
+    # the labelled onset to the end of the frame that posted the jump, plus
+    # the time spent analysing that frame.
+    if labels is None:
+        labels = load_labels(os.path.splitext(path)[0] + ".txt")
+    source = WavSource(path)
+    trigger = VoiceTrigger(source, detector, matcher, post=lambda position: None)
+    trigger.start()
+    trigger._thread.join()
+    trigger.stop()
+
+    times = [position / RATE for position in trigger.triggers]
+    latencies = []
+    false_triggers = 0
+    unmatched = sorted(labels)
+    for t in times:
+        hit = next((label for label in unmatched if -0.01 <= t - label <= tolerance), None)
+        if hit is None:
+            false_triggers += 1
+        else:
+            unmatched.remove(hit)
+            latencies.append(t - hit)
+    stats = trigger.stats()
+    duration = len(source.samples) / RATE
+    processing = stats["mean_frame_us"] / 1e6
+    return {"duration_s": duration, "events": len(labels), "hits": len(latencies), "misses": len(unmatched),
+            "false_triggers": false_triggers, "false_per_minute": false_triggers / duration * 60,
+            "mean_latency_ms": (float(np.mean(latencies)) + processing) * 1000 if latencies else 0.0,
+            "max_latency_ms": (max(latencies) + stats["max_frame_us"] / 1e6) * 1000 if latencies else 0.0,
+            **stats}
+
+
+def synthesize(path, seconds=30.0, seed=0, kinds=("clap", "up")):
+    # A test recording at RATE: room noise with a slow hum, claps and "up"
+    # vowels at labelled times, and slow swells between them that must not
+    # trigger.  Writes the onset labels to the .txt beside it.
+    rng = np.random.default_rng(seed)
+    n = int(seconds * RATE)
+    t = np.arange(n) / RATE
+    noise = rng.normal(0, 0.004, n) + np.convolve(rng.normal(0, 0.01, n), np.ones(8) / 8, "same")
+    samples = noise + 0.01 * np.sin(2 * np.pi * 50 * t) * (1 + 0.5 * np.sin(2 * np.pi * 0.2 * t))
+
+    labels = []
+    at = 1.0
+    while at < seconds - 1.5:
+        start = int(at * RATE)
+        kind = kinds[rng.integers(len(kinds))]
+        if kind == "clap":
+            length = int(0.08 * RATE)
+            envelope = np.exp(-np.arange(length) / (0.012 * RATE)) * np.minimum(1, np.arange(length) / 16)
+            sound = rng.normal(0, 0.3, length) * envelope
+        else:
+            length = int(0.25 * RATE)
+            tt = np.arange(length) / RATE
+            f0 = rng.uniform(110, 220)
+            sound = sum(np.sin(2 * np.pi * f0 * k * tt) * np.exp(-((f0 * k - 700) / 500) ** 2) for k in range(1, 20))
+            sound = 0.2 * sound / np.abs(sound).max() * np.minimum(1, tt / 0.015) * np.minimum(1, (0.25 - tt) / 0.05)
+        samples[start:start + length] += sound
+        labels.append(start / RATE)
+        at += rng.uniform(0.6, 1.4)
+
+        # A distractor between events now and then
+        if rng.random() < 0.3 and at < seconds - 2.5:
+            start = int(at * RATE)
+            length = int(0.8 * RATE)
+            tt = np.arange(length) / RATE
+            swell = 0.1 * np.sin(2 * np.pi * 300 * tt) * np.sin(np.pi * tt / 0.8) ** 2
+            samples[start:start + length] += swell
+            at += 1.2
+
+    write_wav(path, samples)
+    with open(os.path.splitext(path)[0] + ".txt", "w") as f:
+        f.writelines(f"{label:.4f}\n" for label in labels)
+    return labels
+
+
+if __name__ == "__main__":
+    command, path = sys.argv[1], sys.argv[2]
+    if command == "synth":
+        labels = synthesize(path)
+        print(f"{path}: {len(labels)} labelled onsets")
+    elif command == "eval":
+        matcher = None
+        if "--keywords" in sys.argv:
+            matcher = KeywordMatcher.from_wavs(sys.argv[sys.argv.index("--keywords") + 1:])
+        method = "flux" if "--flux" in sys.argv else "energy"
+        for name, value in evaluate(path, detector=OnsetDetector(method), matcher=matcher).items():
+            print(f"{name}: {value:.2f}" if isinstance(value, float) else f"{name}: {value}")